@@ -1,11 +1,15 @@
 import streamlit as st
 
+import image_assets
+import instrumentation
+
 # Page configuration
 st.set_page_config(
     page_title="CO₂ Emissions Explorer",
     layout="wide",
     initial_sidebar_state="expanded"
 )
+page_timer = instrumentation.start_span("page.home")
 
 # Title and introduction
 st.title("CO₂ Emissions Explorer")
@@ -24,11 +28,10 @@ st.markdown(
 st.write("")
 st.write("")
 
-# Display logo under introduction if available
+# Display logo under introduction if available (resized once, then cached)
 try:
-    from PIL import Image
-    logo = Image.open("assets/future.png")
-    st.image(logo, width=500)
+    with instrumentation.span("page.home.logo"):
+        st.image(image_assets.resized_png("assets/future.png", 500), width=500)
 except Exception:
     pass
 
@@ -37,3 +40,5 @@ st.sidebar.header("Navigation")
 st.sidebar.markdown(
     "Select a page from the top-left menu to begin."
 )
+
+page_timer.stop()
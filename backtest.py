@@ -0,0 +1,257 @@
+"""
+Rolling-origin and expanding-window backtests of the state models.
+
+For every cutoff year c the models are trained on years ≤ c (every earlier
+year for an expanding window, the last `window` years for a rolling one)
+and scored on the following `horizon` years. Each state is fitted with its
+configured model family (data_service.configure_models), tuning ridge and
+lasso penalties on the fold's training years only. Folds are stacked along
+the state axis, so all (fold, state) regressions of one family in a chunk
+of folds are solved by one ols_engine.batched_ols or regularized.fit call;
+chunks can also be spread over a process pool. Results are cached on disk under a hash of the panel and the
+configuration, so re-running with unchanged data is instant.
+
+Metrics per (fold, state):
+    rmse        root mean squared error (t CO₂ per capita)
+    range_rmse  rmse / (max − min) of the state's observed CO₂ per capita
+                up to the end of the test window
+    nrmse       rmse / mean observed CO₂ per capita over the test window
+
+Command line:
+    python backtest.py                         # expanding window, 4-year horizon
+    python backtest.py --cutoffs 2019          # the README's 1998–2019 / 2020–2023 split
+    python backtest.py --mode rolling --window 10 --workers 4
+    python backtest.py --method ridge          # backtest ridge instead of OLS
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import data_service
+import instrumentation
+import ols_engine
+import regularized
+from dataset_cache import cache_dir
+
+# Bump whenever the metric definitions or cached layout change
+_RESULT_FORMAT = 3
+
+# Upper bound on the stacked (folds × states × years × terms) design per solve
+_CHUNK_BYTES = 64 << 20
+
+_FOLD_COLUMNS = ["train_start", "cutoff", "test_end"]
+_METRIC_COLUMNS = ["n_train", "n_test", "rmse", "range_rmse", "nrmse"]
+
+
+def make_folds(
+    years,
+    mode: str = "expanding",
+    horizon: int = 4,
+    window: Optional[int] = None,
+    min_train: int = 10,
+    cutoffs=None,
+) -> np.ndarray:
+    """Build the (train_start, cutoff, test_end) year triple of every fold.
+
+    Args:
+        years (array-like of int): Years present in the panel.
+        mode (str): "expanding" (train from the first year) or "rolling"
+            (train on the last `window` years before each cutoff).
+        horizon (int): Number of years scored after each cutoff.
+        window (int): Training window length for rolling mode.
+        min_train (int): Fewest training years a fold may have.
+        cutoffs (array-like of int): Explicit cutoff years; by default every
+            year that leaves at least min_train training years and one test year.
+
+    Returns:
+        np.ndarray: (n_folds, 3) integer array.
+    """
+    if mode not in ("expanding", "rolling"):
+        raise ValueError(f"Unknown backtest mode {mode!r}; use 'expanding' or 'rolling'.")
+    if mode == "rolling" and not window:
+        raise ValueError("Rolling backtests need a training window length.")
+
+    first, last = int(np.min(years)), int(np.max(years))
+    if cutoffs is None:
+        span = window if mode == "rolling" else min_train
+        cutoffs = np.arange(first + max(span, min_train) - 1, last)
+    cutoffs = np.asarray(cutoffs, dtype=int)
+
+    starts = np.full(cutoffs.shape, first) if mode == "expanding" else cutoffs - window + 1
+    return np.column_stack([np.maximum(starts, first), cutoffs, np.minimum(cutoffs + horizon, last)])
+
+
+def _score_folds(X3, y2, mask, years2, folds, methods) -> dict:
+    """Fit and score every (fold, state) pair of a chunk, one batched solve per model family."""
+    F = len(folds)
+    G, T, k = X3.shape
+    start, cut, end = (folds[:, i, None, None] for i in range(3))
+
+    train = mask & (years2 >= start) & (years2 <= cut)
+    test = mask & (years2 > cut) & (years2 <= end)
+    X_all = np.broadcast_to(X3, (F, G, T, k)).reshape(F * G, T, k)
+    y_all = np.broadcast_to(y2, (F, G, T))
+
+    # All training problems of one family in this chunk, solved together;
+    # scales and penalties come from each fold's training rows only
+    train_rows = train.reshape(F * G, T)
+    y_rows = y_all.reshape(F * G, T)
+    families = np.tile(np.asarray(methods), F)
+    coef = np.empty((F * G, k))
+    for method in np.unique(families):
+        rows = slice(None) if (families == method).all() else np.flatnonzero(families == method)
+        if method == "ols":
+            scale = ols_engine.relative_scale(X_all[rows], train_rows[rows])
+            fit = ols_engine.batched_ols(X_all[rows], y_rows[rows], train_rows[rows], scale=scale)
+        else:
+            fit = regularized.fit(method, X_all[rows], y_rows[rows], train_rows[rows])
+        coef[rows] = fit.coef
+    pred = (X_all @ coef[..., None])[..., 0].reshape(F, G, T)
+
+    n_test = test.sum(axis=2)
+    err2 = np.where(test, (y_all - pred) ** 2, 0.0).sum(axis=2)
+    seen = mask & (years2 <= end)
+    y_max = np.where(seen, y_all, -np.inf).max(axis=2)
+    y_min = np.where(seen, y_all, np.inf).min(axis=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rmse = np.sqrt(err2 / n_test)
+        test_mean = np.where(test, y_all, 0.0).sum(axis=2) / n_test
+        return {
+            "n_train": train.sum(axis=2),
+            "n_test": n_test,
+            "rmse": rmse,
+            "range_rmse": rmse / (y_max - y_min),
+            "nrmse": rmse / test_mean,
+        }
+
+
+def _panel_key(states, X3, y2, mask, years2, config: dict) -> str:
+    digest = hashlib.sha256(json.dumps({"format": _RESULT_FORMAT, **config}, sort_keys=True).encode())
+    digest.update("|".join(states).encode())
+    for arr in (X3, y2, mask, years2):
+        digest.update(np.ascontiguousarray(arr).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(cache_dir(), "backtest", f"backtest-{key}.npz")
+
+
+@instrumentation.timed("backtest.run")
+def run_backtest(
+    mode: str = "expanding",
+    horizon: int = 4,
+    window: Optional[int] = None,
+    min_train: int = 10,
+    cutoffs=None,
+    workers: int = 1,
+    use_cache: bool = True,
+) -> pd.DataFrame:
+    """Backtest every state's model over every fold.
+
+    Args:
+        mode, horizon, window, min_train, cutoffs: Fold layout, see make_folds().
+        workers (int): Processes to spread chunks of folds over; 1 solves
+            them in this process.
+        use_cache (bool): Reuse/store results keyed by panel and configuration.
+
+    Returns:
+        pd.DataFrame: One row per (fold, state) with columns "train_start",
+                      "cutoff", "test_end", "State", "method" (the model
+                      family backtested), "n_train", "n_test", "rmse",
+                      "range_rmse" and "nrmse".
+    """
+    states, X3, y2, mask, years2 = data_service.stack_panel()
+    methods = data_service.state_methods(states)
+    folds = make_folds(years2[mask], mode, horizon, window, min_train, cutoffs)
+    config = {"mode": mode, "folds": folds.tolist(), "features": data_service._FEATURES, "methods": methods}
+
+    key = _panel_key(states, X3, y2, mask, years2, config)
+    if use_cache and os.path.exists(_cache_path(key)):
+        instrumentation.cache_hit("backtest")
+        with np.load(_cache_path(key), allow_pickle=False) as archive:
+            return pd.DataFrame({name: archive[name] for name in archive.files})
+    instrumentation.cache_miss("backtest")
+
+    # Split folds into chunks whose stacked design stays within _CHUNK_BYTES
+    per_fold = max(X3.nbytes, 1)
+    n_chunks = max(1, int(np.ceil(len(folds) * per_fold / _CHUNK_BYTES)), min(workers, len(folds)))
+    chunks = [c for c in np.array_split(folds, n_chunks) if len(c)]
+    args = [(X3, y2, mask, years2, chunk, methods) for chunk in chunks]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            scored = list(pool.map(_score_folds, *zip(*args)))
+    else:
+        scored = [_score_folds(*a) for a in args]
+
+    G = len(states)
+    results = {
+        name: np.repeat(folds[:, i], G) for i, name in enumerate(_FOLD_COLUMNS)
+    }
+    results["State"] = np.tile(np.asarray(states), len(folds))
+    results["method"] = np.tile(np.asarray(methods), len(folds))
+    for name in _METRIC_COLUMNS:
+        results[name] = np.concatenate([s[name] for s in scored]).reshape(-1)
+
+    if use_cache:
+        try:
+            os.makedirs(os.path.dirname(_cache_path(key)), exist_ok=True)
+            tmp = f"{_cache_path(key)}.tmp-{os.getpid()}"
+            with open(tmp, "wb") as fh:
+                np.savez(fh, **results)
+            os.replace(tmp, _cache_path(key))
+        except OSError:
+            pass
+    return pd.DataFrame(results)
+
+
+def summarize(results: pd.DataFrame, by: str = "State") -> pd.DataFrame:
+    """Average the fold metrics per state (by="State") or per fold (by="cutoff")."""
+    return results.groupby(by)[["rmse", "range_rmse", "nrmse"]].mean()
+
+
+# ────────────────────────────────────────────────────────
+# Command line
+# ────────────────────────────────────────────────────────
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backtest the state models.")
+    parser.add_argument("--mode", choices=["expanding", "rolling"], default="expanding")
+    parser.add_argument("--horizon", type=int, default=4)
+    parser.add_argument("--window", type=int, default=None)
+    parser.add_argument("--min-train", type=int, default=10)
+    parser.add_argument("--cutoffs", type=int, nargs="*", default=None)
+    parser.add_argument("--states", nargs="*", default=None)
+    parser.add_argument("--method", choices=["ols", "ridge", "lasso"], default=None,
+                        help="Model family for every state (default: the configured one).")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.method is not None:
+        data_service.configure_models(args.method)
+    results = run_backtest(
+        mode=args.mode,
+        horizon=args.horizon,
+        window=args.window,
+        min_train=args.min_train,
+        cutoffs=args.cutoffs,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+    )
+    if args.states:
+        results = results[results["State"].isin([s.upper() for s in args.states])]
+    print(f"Model family: {', '.join(sorted(set(results['method'])))}")
+    print(summarize(results).to_string(float_format=lambda v: f"{v:.3f}"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
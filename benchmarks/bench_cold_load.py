@@ -0,0 +1,57 @@
+"""
+Cold-start benchmark for loading the merged sheet.
+
+Each sample runs in a fresh interpreter so nothing is warm in memory:
+"excel" parses the workbook with openpyxl, "cache" reads the columnar
+store written by dataset_cache.
+
+Usage:
+    python benchmarks/bench_cold_load.py [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import dataset_cache  # noqa: E402
+
+_SNIPPET = (
+    "import time, dataset_cache as c; t = time.perf_counter(); "
+    "c.load_sheet(use_cache={use_cache}); print(time.perf_counter() - t)"
+)
+
+
+def _cold_load_seconds(use_cache: bool) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", _SNIPPET.format(use_cache=use_cache)],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    dataset_cache.main(["build"])
+
+    for label, use_cache in [("excel", False), ("cache", True)]:
+        samples = [_cold_load_seconds(use_cache) for _ in range(args.repeat)]
+        print(
+            f"{label:>6}: median {statistics.median(samples) * 1000:8.1f} ms  "
+            f"min {min(samples) * 1000:8.1f} ms  (n={args.repeat})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Benchmarks of the data and model paths on synthetic panels.
+
+Each panel has the merged sheet's schema, the 50 real state codes and 26,
+1,000 or 10,000 periods per state (up to 500k rows). It is written to a CSV
+and served through the normal registry → columnar cache → schema path, so
+the timings cover the same code the app runs.
+
+Usage (not part of the default test run):
+    python -m pytest benchmarks/bench_data.py benchmarks/bench_pages.py
+    python -m pytest benchmarks/bench_data.py --bench-max-periods 1000
+    python -m pytest benchmarks/bench_data.py benchmarks/bench_pages.py --bench-update
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import case_service
+import data_service
+import dataset_cache
+import dataset_registry
+import model_store
+import scenario_sweep
+
+PERIODS = [26, 1_000, 10_000]
+
+# Rows scored by the scalar-vs-batched prediction benchmark
+_PREDICT_ROWS = 2_000
+
+
+def make_panel(n_periods: int, seed: int = 0) -> pd.DataFrame:
+    """Build a synthetic 50-state panel with known linear structure."""
+    rng = np.random.default_rng(seed)
+    states = sorted(case_service.STATE_NAMES)
+    n = len(states) * n_periods
+    X = rng.lognormal(mean=[8.0, 15.0, 14.0, 10.0, 13.0], sigma=0.5, size=(n, 5))
+    beta = rng.normal(scale=1e-3, size=(len(states), 5)) / X.mean(axis=0)
+    group = np.repeat(np.arange(len(states)), n_periods)
+    y = 20.0 + np.abs(np.einsum("ij,ij->i", X, beta[group])) + rng.normal(scale=0.5, size=n)
+    return pd.DataFrame({
+        "State": np.asarray(states)[group],
+        "Year": np.tile(1998 + np.arange(n_periods), len(states)),
+        "co2 per capita": y,
+        **{name: X[:, j] for j, name in enumerate(data_service._FEATURES)},
+    })
+
+
+def _reset_models() -> None:
+    data_service._models = None
+    data_service._online = None
+
+
+@pytest.fixture(scope="module", params=PERIODS, ids=lambda t: f"50x{t}")
+def panel(request, tmp_path_factory, max_periods):
+    """Point the registry and model store at a synthetic panel of one size."""
+    n_periods = request.param
+    if n_periods > max_periods:
+        pytest.skip(f"panel length {n_periods} above --bench-max-periods")
+
+    tmp = tmp_path_factory.mktemp(f"panel-{n_periods}")
+    source = str(tmp / "panel.csv")
+    make_panel(n_periods).to_csv(source, index=False)
+
+    patch = pytest.MonkeyPatch()
+    patch.setenv("CO2_CACHE_DIR", str(tmp / "cache"))
+    patch.setenv("CO2_MODEL_DIR", str(tmp / "models"))
+    patch.delenv("CO2_DATA_CACHE", raising=False)
+    patch.setattr(dataset_registry, "WORKBOOK_PATH", source)
+    patch.setattr(model_store, "dataset_fingerprint", lambda path=source: dataset_cache.file_sha256(path))
+    dataset_registry.invalidate()
+    _reset_models()
+
+    yield {"source": source, "id": f"50x{n_periods}", "rows": 50 * n_periods}
+
+    patch.undo()
+    dataset_registry.invalidate()
+    _reset_models()
+
+
+def test_load_merged_data(bench, panel):
+    def from_source():
+        dataset_cache.clear(panel["source"], dataset_cache.SHEET_NAME)
+        dataset_registry.invalidate()
+
+    bench(f"load_merged_data[cold-source-{panel['id']}]", data_service.load_merged_data,
+          repeat=3, setup=from_source)
+    bench(f"load_merged_data[cold-cache-{panel['id']}]", data_service.load_merged_data,
+          repeat=5, setup=dataset_registry.invalidate)
+    bench(f"load_merged_data[warm-{panel['id']}]", data_service.load_merged_data)
+    assert len(data_service.load_merged_data()) == panel["rows"]
+
+
+def test_get_state_co2_series(bench, panel):
+    series = case_service.get_state_co2_series("WY")
+    assert len(series) == panel["rows"] // 50
+    bench(f"get_state_co2_series[{panel['id']}]", lambda: case_service.get_state_co2_series("WY"))
+
+
+def test_fit_state_models(bench, panel):
+    data_service.load_merged_data()
+
+    def cold():
+        model_store.clear()
+        _reset_models()
+
+    bench(f"fit_state_models[refit-{panel['id']}]", data_service.fit_state_models, repeat=3, setup=cold)
+    bench(f"fit_state_models[artifact-{panel['id']}]", data_service.fit_state_models, setup=_reset_models)
+    assert len(data_service.fit_state_models()) == 50
+
+
+@pytest.fixture(scope="module")
+def predict_rows(panel):
+    """_PREDICT_ROWS panel rows sampled with replacement, as (states, X), with the models loaded."""
+    frame = data_service.load_merged_data()
+    rows = frame.sample(_PREDICT_ROWS, replace=True, random_state=0)
+    data_service.fit_state_models()
+    return rows["State"].astype(str).to_numpy(), rows[data_service._FEATURES].to_numpy(dtype=float)
+
+
+@pytest.fixture(scope="module")
+def batch_seconds(bench, panel, predict_rows):
+    """Time predict_co2_batch on predict_rows once; the other prediction paths are compared with it."""
+    states, X = predict_rows
+    return bench(f"predict_co2_batch[{_PREDICT_ROWS}-{panel['id']}]",
+                 lambda: data_service.predict_co2_batch(states, X))
+
+
+def test_predict_scalar_vs_batched(bench, panel, predict_rows, batch_seconds):
+    states, X = predict_rows
+
+    def scalar():
+        return [data_service.predict_co2(s, *x) for s, x in zip(states, X)]
+
+    np.testing.assert_allclose(data_service.predict_co2_batch(states, X), scalar(), rtol=1e-12)
+    t_scalar = bench(f"predict_co2[scalar-{_PREDICT_ROWS}-{panel['id']}]", scalar, repeat=3)
+    assert batch_seconds < t_scalar
+
+
+def test_predict_intervals_batched(bench, panel, predict_rows, batch_seconds):
+    """Intervals cost a small constant factor over point predictions."""
+    states, X = predict_rows
+    t_intervals = bench(f"predict_co2_intervals[{_PREDICT_ROWS}-{panel['id']}]",
+                        lambda: data_service.predict_co2_intervals(states, X))
+    assert t_intervals < 5 * batch_seconds
+
+
+def test_explain_batched(bench, panel, predict_rows, batch_seconds):
+    """The driver contribution matrix costs about as much as the prediction."""
+    states, X = predict_rows
+    t_explain = bench(f"explain_co2_batch[{_PREDICT_ROWS}-{panel['id']}]",
+                      lambda: data_service.explain_co2_batch(states, X))
+    assert t_explain < 2 * batch_seconds
+
+
+def test_scenario_sweep_million_points(bench, panel):
+    """A 1000 × 1000 two-driver grid scores well within interactive latency."""
+    data_service.fit_state_models()
+    base = data_service.load_merged_data()[data_service._FEATURES].median().to_numpy()
+    axes = [
+        scenario_sweep.axis("Coal Electricity Consumption", 0, 5e7, 1000),
+        scenario_sweep.axis("Natural Gas Electricity Consumption", 0, 2e7, 1000),
+    ]
+    seconds = bench(f"scenario_sweep[1000x1000-{panel['id']}]",
+                    lambda: scenario_sweep.sweep("WY", base, axes), repeat=3)
+    assert seconds < 1.0
+
+
+def test_case_presentation(bench, panel):
+    """The presentation layer is built once; serving a comparison set is constant-time."""
+    dataset = dataset_registry.get_dataset()
+    bench(f"build_presentation[{panel['id']}]", lambda: case_service.build_presentation(dataset), repeat=3)
+    presentation = case_service.get_presentation()
+    seconds = bench(f"presentation.comparison[5-states-{panel['id']}]",
+                    lambda: presentation.comparison(["WY", "ND", "AK", "TX", "VT"]))
+    assert seconds < 0.01
+
+
+def test_national_ranking(bench, panel):
+    """Ranking every state in every year by six metrics is one argsort; lookups are O(k)."""
+    frame = data_service.load_merged_data()
+    bench(f"build_ranking[{panel['id']}]", lambda: case_service.build_ranking(frame), repeat=3)
+    ranking = case_service.get_ranking()
+    year = int(ranking.years[len(ranking.years) // 2])
+    seconds = bench(f"ranking.top_k[3-{panel['id']}]", lambda: ranking.top_k(year, 3))
+    assert seconds < 1e-3
@@ -0,0 +1,53 @@
+"""
+Benchmarks of full headless runs of every Streamlit page on the real dataset.
+
+Pages are executed with streamlit.testing's AppTest, which runs the script
+exactly as `streamlit run` would, minus the browser. The first run of each
+page is untimed (imports, st.cache_* fills); the timed runs are what a user
+sees on every interaction. See bench_data.py for usage.
+"""
+
+import os
+
+import pytest
+
+from conftest import ROOT
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+PAGES = [
+    "Home.py",
+    "pages/02_Case_Studies.py",
+    "pages/03_Prediction.py",
+    "pages/04_HASS_Reflection.py",
+    "pages/05_Diagnostics.py",
+]
+
+
+@pytest.fixture(autouse=True)
+def in_repo_root(monkeypatch):
+    # Pages open assets/ by relative path
+    monkeypatch.chdir(ROOT)
+
+
+def _run(page: str):
+    app = AppTest.from_file(os.path.join(ROOT, page), default_timeout=60).run()
+    assert not app.exception, [e.value for e in app.exception]
+    return app
+
+
+@pytest.mark.parametrize("page", PAGES)
+def test_page_run(bench, page):
+    _run(page)
+    bench(f"page[{page}]", lambda: _run(page), repeat=5)
+
+
+def test_prediction_click(bench):
+    app = _run("pages/03_Prediction.py")
+
+    def click():
+        app.sidebar.button[0].click().run()
+        assert app.metric
+
+    click()
+    bench("page[pages/03_Prediction.py:predict]", click, repeat=5)
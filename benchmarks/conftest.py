@@ -0,0 +1,186 @@
+"""
+pytest plumbing for the benchmark suite (bench_data.py, bench_pages.py).
+
+The `bench` fixture times a callable, prints a summary table at the end of
+the session and compares every result with the stored baseline in
+benchmarks/baselines.json. The comparison uses best-of-N times (the minimum
+is far less noisy than the median on a shared machine) and allows for the
+noise actually observed: the limit is tolerance × the baseline's best plus
+a slack of several times the larger median-to-best spread of the baseline
+and the current run (never less than a fixed absolute slack). A result over
+the limit is sampled once more before the test fails, so a single load
+spike does not count as a regression. Re-record the baselines on the
+reference machine with --bench-update after an intended change.
+
+Options:
+    --bench-update          write the measured best-of-N times (and medians)
+                            as the new baselines
+    --bench-tolerance X     allowed slowdown factor (default 1.5, or
+                            CO2_BENCH_TOLERANCE)
+    --bench-max-periods N   largest synthetic panel length (default 10000)
+"""
+
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+# Each timed sample loops the callable until it runs at least this long,
+# so microsecond-scale paths are not dominated by timer noise
+_MIN_SAMPLE_SECONDS = 0.02
+
+# Differences below this are never treated as regressions
+_ABSOLUTE_SLACK = 200e-6
+
+# Multiples of the median-to-best spread added to the limit as noise slack
+_SPREAD_SLACK = 3.0
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("co2 benchmarks")
+    group.addoption("--bench-update", action="store_true", help="Store measured best-of-N times as baselines.")
+    group.addoption(
+        "--bench-tolerance",
+        type=float,
+        default=float(os.environ.get("CO2_BENCH_TOLERANCE", "1.5")),
+        help="Fail when a best-of-N time exceeds tolerance × baseline plus noise slack.",
+    )
+    group.addoption("--bench-max-periods", type=int, default=10_000, help="Largest synthetic panel length.")
+
+
+def machine() -> dict:
+    """Describe the machine the timings come from."""
+    return {
+        "platform": platform.platform(),
+        "processor": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+class Bench:
+    """Times callables and checks them against stored baselines."""
+
+    def __init__(self, baselines: dict, tolerance: float, update: bool):
+        self.baselines = baselines
+        self.tolerance = tolerance
+        self.update = update
+        self.results = {}
+
+    def _sample(self, fn, repeat: int, number: int, setup) -> list[float]:
+        samples = []
+        for _ in range(repeat):
+            elapsed = 0.0
+            for _ in range(number):
+                if setup is not None:
+                    setup()
+                start = time.perf_counter()
+                fn()
+                elapsed += time.perf_counter() - start
+            samples.append(elapsed / number)
+        return samples
+
+    def limit(self, baseline: dict, samples: list[float]) -> float:
+        """Slowest acceptable best-of-N time given a baseline and the current samples."""
+        spread = max(
+            baseline.get("median_s", baseline["min_s"]) - baseline["min_s"],
+            statistics.median(samples) - min(samples),
+        )
+        return baseline["min_s"] * self.tolerance + max(_ABSOLUTE_SLACK, _SPREAD_SLACK * spread)
+
+    def __call__(self, name: str, fn, repeat: int = 5, setup=None) -> float:
+        """Time `fn` and return its median seconds per call (the best-of-N is compared).
+
+        Args:
+            name (str): Benchmark id, the key in baselines.json.
+            fn (callable): The code under test, called without arguments.
+            repeat (int): Number of timed samples.
+            setup (callable): Run before every call, outside the timing
+                (e.g. to drop a cache for a cold measurement).
+        """
+        number = 1
+        if setup is None:
+            # Calibrate how many calls make one sample long enough to time
+            start = time.perf_counter()
+            fn()
+            once = time.perf_counter() - start
+            number = max(1, int(_MIN_SAMPLE_SECONDS / max(once, 1e-9)))
+
+        samples = self._sample(fn, repeat, number, setup)
+        baseline = self.baselines.get(name)
+        if not self.update and baseline is not None and min(samples) > self.limit(baseline, samples):
+            # Confirm with a second round before calling it a regression
+            samples += self._sample(fn, repeat, number, setup)
+
+        median = statistics.median(samples)
+        best = min(samples)
+        self.results[name] = {"median_s": median, "min_s": best, "calls": number * len(samples)}
+
+        if not self.update and baseline is not None:
+            limit = self.limit(baseline, samples)
+            if best > limit:
+                pytest.fail(
+                    f"Performance regression in {name}: best {_format_seconds(best).strip()} vs baseline "
+                    f"{_format_seconds(baseline['min_s']).strip()} (limit {_format_seconds(limit).strip()}: "
+                    f"{self.tolerance:g}× plus noise slack)",
+                    pytrace=False,
+                )
+        return median
+
+
+@pytest.fixture(scope="session")
+def bench(request):
+    try:
+        with open(BASELINE_PATH, encoding="utf-8") as fh:
+            stored = json.load(fh)
+    except (OSError, ValueError):
+        stored = {}
+    config = request.config
+    runner = Bench(
+        stored.get("benchmarks", {}),
+        config.getoption("--bench-tolerance"),
+        config.getoption("--bench-update"),
+    )
+    config._co2_bench = runner
+    yield runner
+
+    if runner.update and runner.results:
+        merged = {**stored.get("benchmarks", {}), **runner.results}
+        with open(BASELINE_PATH, "w", encoding="utf-8") as fh:
+            json.dump({"machine": machine(), "benchmarks": dict(sorted(merged.items()))}, fh, indent=2)
+            fh.write("\n")
+
+
+@pytest.fixture(scope="session")
+def max_periods(request) -> int:
+    return request.config.getoption("--bench-max-periods")
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:10.3f} ms"
+    return f"{seconds * 1e6:10.3f} µs"
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    runner = getattr(config, "_co2_bench", None)
+    if runner is None or not runner.results:
+        return
+    terminalreporter.section("benchmarks (median time per call, best-of-N vs baseline)")
+    for name, result in runner.results.items():
+        baseline = runner.baselines.get(name)
+        ratio = f"best {result['min_s'] / baseline['min_s']:5.2f}× baseline" if baseline else "no baseline"
+        terminalreporter.write_line(f"{name:<52} {_format_seconds(result['median_s'])}   {ratio}")
+    if runner.update:
+        terminalreporter.write_line(f"Baselines written to {os.path.relpath(BASELINE_PATH, ROOT)}")
@@ -0,0 +1,377 @@
+"""
+Bulk scoring of scenario files through data_service, one chunk at a time.
+
+A scenario file (CSV or Parquet, hundreds of thousands of rows) holds a
+"State" column and the five drivers, under their _FEATURES names or any
+alias schema.MERGED_SCHEMA accepts (e.g. the predict_co2 keyword names
+"coal_elec", "urban_pop"). The file is read in chunks (ingest.iter_chunks),
+each chunk is scored by one data_service.predict_co2_batch or
+predict_co2_intervals call, and the scored chunk is appended to the output
+right away, so memory stays at a few chunks whatever the file size. Extra
+columns (scenario ids, notes) are passed through unchanged.
+
+Every output column gets its type before the first chunk is read, because
+a chunk-by-chunk guess differs between chunks (a notes column that is empty
+in the first chunk and holds text later): extra CSV columns are read and
+written as text, drivers as floats, and Parquet sources keep their own
+column types.
+
+Rows with a missing driver or a state without a model are kept with an
+empty prediction and counted as skipped; a missing required column or text
+in a driver column fails fast, naming the column and row.
+
+Command line:
+    python bulk_scoring.py scenarios.csv -o predictions.csv
+    python bulk_scoring.py scenarios.parquet -o predictions.parquet --level 0.95 --chunk-rows 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+
+import data_service
+import ingest
+import instrumentation
+import lazy_import
+import schema
+
+pd = lazy_import.module("pandas")
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+# Output columns added to every input row
+PREDICTION = "predicted co2 per capita"
+INTERVAL = ("prediction low", "prediction high")
+
+
+@dataclass(frozen=True)
+class BulkReport:
+    """Outcome and throughput of one bulk scoring run."""
+
+    rows: int
+    scored: int
+    skipped: int
+    chunks: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+    def summary(self) -> str:
+        """Return a one-line summary for logs and the command line."""
+        return (
+            f"Scored {self.scored:,} of {self.rows:,} rows ({self.skipped:,} skipped) in "
+            f"{self.chunks} chunk(s), {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+        )
+
+
+# ────────────────────────────────────────────────────────
+# Validation and scoring
+# ────────────────────────────────────────────────────────
+def resolve_columns(columns) -> dict[str, str]:
+    """Map a file's column names onto "State" and the _FEATURES names.
+
+    Args:
+        columns (sequence of str): The file's header.
+
+    Returns:
+        dict: file column → canonical name, for the columns that matter.
+
+    Raises:
+        schema.SchemaError: A required column is missing or two columns map
+                            onto the same name.
+    """
+    wanted = [c for c in schema.MERGED_SCHEMA if c.name in ["State"] + data_service._FEATURES]
+    matched, _ = schema._resolve_columns(columns, wanted)
+    missing = [c.name for c in wanted if c.name not in matched.values()]
+    if missing:
+        raise schema.SchemaError(
+            f"Scenario file is missing columns {missing}; found {[str(c) for c in columns]}. "
+            f"Accepted names: {{{', '.join(f'{c.name!r}: {list(c.aliases)}' for c in wanted)}}}."
+        )
+    return matched
+
+
+def _feature_matrix(chunk: "pd.DataFrame", columns: dict[str, str], offset: int) -> np.ndarray:
+    """Parse the driver columns of one chunk, failing on text values."""
+    by_name = {name: source for source, name in columns.items()}
+    X = np.empty((len(chunk), len(data_service._FEATURES)))
+    for j, feature in enumerate(data_service._FEATURES):
+        series = chunk[by_name[feature]]
+        values = pd.to_numeric(series, errors="coerce")
+        bad = values.isna() & series.notna()
+        if bad.any():
+            pos = int(np.argmax(bad.to_numpy()))
+            raise ValueError(
+                f"Column {by_name[feature]!r}, row {offset + pos + 1}: expected a number, got {series.iloc[pos]!r}."
+            )
+        X[:, j] = values.to_numpy(dtype=float, na_value=np.nan)
+    return X
+
+
+def score_chunk(
+    chunk: "pd.DataFrame",
+    columns: dict[str, str],
+    offset: int = 0,
+    level: Optional[float] = None,
+) -> tuple["pd.DataFrame", int]:
+    """Score one chunk of scenario rows.
+
+    Args:
+        chunk (pd.DataFrame): Input rows (any extra columns are kept).
+        columns (dict): Output of resolve_columns() for the file's header.
+        offset (int): Rows before this chunk, for error messages.
+        level (float): If given, add prediction-interval bounds.
+
+    Returns:
+        tuple: (scored chunk, number of rows scored).
+    """
+    X = _feature_matrix(chunk, columns, offset)
+    state_column = next(source for source, name in columns.items() if name == "State")
+    states = chunk[state_column].astype(str).str.strip().str.upper().to_numpy()
+
+    data_service.fit_state_models()
+    known = np.isin(states, np.asarray(data_service.get_model_fit()[0]))
+    valid = known & ~np.isnan(X).any(axis=1)
+
+    out = chunk.copy()
+    estimate = np.full(len(chunk), np.nan)
+    if level is None:
+        if valid.any():
+            estimate[valid] = data_service.predict_co2_batch(states[valid], X[valid])
+    else:
+        low, high = np.full(len(chunk), np.nan), np.full(len(chunk), np.nan)
+        if valid.any():
+            result = data_service.predict_co2_intervals(states[valid], X[valid], level)
+            estimate[valid], low[valid], high[valid] = result.estimate, result.pred_low, result.pred_high
+    out[PREDICTION] = estimate
+    if level is not None:
+        out[INTERVAL[0]], out[INTERVAL[1]] = low, high
+    return out, int(valid.sum())
+
+
+def iter_scored(
+    chunks,
+    level: Optional[float] = None,
+) -> Iterator[tuple["pd.DataFrame", int]]:
+    """Score an iterable of input chunks lazily.
+
+    Yields:
+        tuple: (scored chunk, rows scored in it), in input order.
+    """
+    columns, offset = None, 0
+    for chunk in chunks:
+        if columns is None:
+            columns = resolve_columns(list(chunk.columns))
+        yield score_chunk(chunk, columns, offset, level)
+        offset += len(chunk)
+
+
+def _source_header(source, fmt: str):
+    """Read a CSV header or a Parquet schema without consuming the source."""
+    position = None if isinstance(source, str) else source.tell()
+    try:
+        if fmt == "parquet":
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Reading Parquet sources needs pyarrow (pip install pyarrow).") from None
+            return pq.ParquetFile(source).schema_arrow
+        return list(pd.read_csv(source, nrows=0).columns)
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+def column_types(source, fmt: str) -> tuple[Optional[dict], Optional[dict]]:
+    """Fix the type of every input column before any chunk is read.
+
+    Args:
+        source (str | file): The scenario file.
+        fmt (str): "csv" or "parquet".
+
+    Returns:
+        tuple: ({column: dtype} for pandas.read_csv, or None;
+                {column: pyarrow type} for the output, or None without pyarrow).
+    """
+    header = _source_header(source, fmt)
+    if fmt == "parquet":
+        return None, {field.name: field.type for field in header}
+
+    columns = resolve_columns(header)
+    read_dtypes = {name: str for name in header if name not in columns}
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return read_dtypes, None
+    drivers = {column for column, name in columns.items() if name != "State"}
+    return read_dtypes, {name: pa.float64() if name in drivers else pa.string() for name in header}
+
+
+# ────────────────────────────────────────────────────────
+# Incremental writers
+# ────────────────────────────────────────────────────────
+class _PandasCSVWriter:
+    """Fallback CSV writer for installs without pyarrow."""
+
+    def __init__(self, target):
+        self.target = target
+        self.header = True
+
+    def write(self, frame: "pd.DataFrame") -> None:
+        frame.to_csv(self.target, mode="w" if self.header else "a", header=self.header, index=False)
+        self.header = False
+
+    def close(self) -> None:
+        pass
+
+
+class _ArrowWriter:
+    """Appends chunks to one CSV or Parquet file through pyarrow.
+
+    pyarrow's CSV writer formats floats about ten times faster than
+    DataFrame.to_csv, which otherwise dominates a bulk run. The output
+    schema is the first chunk's, with the `types` given up front taking
+    precedence; later chunks are converted to it.
+    """
+
+    def __init__(self, target, fmt: str, types: Optional[dict] = None):
+        self.target = target
+        self.fmt = fmt
+        self.types = types or {}
+        self.writer = None
+        self.schema = None
+
+    def write(self, frame: "pd.DataFrame") -> None:
+        import pyarrow as pa
+
+        if self.writer is None:
+            inferred = pa.Table.from_pandas(frame, preserve_index=False).schema
+            self.schema = pa.schema([
+                pa.field(field.name, self.types.get(field.name, field.type)) for field in inferred
+            ])
+        table = pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False)
+        if self.writer is None:
+            if self.fmt == "parquet":
+                import pyarrow.parquet as pq
+                self.writer = pq.ParquetWriter(self.target, table.schema)
+            else:
+                import pyarrow.csv as pa_csv
+                self.writer = pa_csv.CSVWriter(self.target, table.schema)
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _open_writer(output, fmt: str, types: Optional[dict] = None):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        if fmt == "parquet":
+            raise ImportError("Writing Parquet output needs pyarrow (pip install pyarrow).") from None
+        return _PandasCSVWriter(output)
+    return _ArrowWriter(output, fmt, types)
+
+
+def _file_format(target, fmt: Optional[str], kind: str, default: str = "") -> str:
+    name = target if isinstance(target, str) else getattr(target, "name", "")
+    ext = (fmt or os.path.splitext(str(name))[1].lstrip(".") or default).lower()
+    if ext not in ("csv", "parquet"):
+        raise ValueError(f"Unsupported {kind} format {ext!r}; use csv or parquet.")
+    return ext
+
+
+def score_file(
+    source,
+    output,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    level: Optional[float] = None,
+    source_format: Optional[str] = None,
+    output_format: Optional[str] = None,
+    progress: Optional[Callable[[int], None]] = None,
+) -> BulkReport:
+    """Stream a scenario file through the model and write the scored rows.
+
+    Args:
+        source (str | file): CSV or Parquet scenario file (path or open
+            binary file, e.g. a Streamlit upload).
+        output (str | file): Where to write the scored rows, as CSV or
+            Parquet; each chunk is appended as soon as it is scored.
+        chunk_rows (int): Rows read and scored per chunk.
+        level (float): If given, also write prediction-interval bounds.
+        source_format (str): "csv" or "parquet" when the source has no
+            telling file name.
+        output_format (str): Likewise for the output (default: from its
+            name, else CSV).
+        progress (callable): Called with the running row count after each chunk.
+
+    Returns:
+        BulkReport: Row counts and throughput.
+
+    Raises:
+        schema.SchemaError: A required column is missing.
+        ValueError: A driver column holds text, or a format is unsupported.
+    """
+    source_format = _file_format(source, source_format, "source")
+    read_dtypes, types = column_types(source, source_format)
+    writer = _open_writer(output, _file_format(output, output_format, "output", default="csv"), types)
+    start = time.perf_counter()
+    rows = scored = chunks = 0
+    try:
+        with instrumentation.span("bulk.score_file"):
+            chunks_in = ingest.iter_chunks(source, chunk_rows=chunk_rows, fmt=source_format, dtype=read_dtypes)
+            for chunk, n_scored in iter_scored(chunks_in, level):
+                writer.write(chunk)
+                rows += len(chunk)
+                scored += n_scored
+                chunks += 1
+                if progress is not None:
+                    progress(rows)
+    finally:
+        writer.close()
+    if chunks == 0:
+        raise schema.SchemaError("Scenario file has no rows.")
+    instrumentation.count("bulk.rows", rows)
+    return BulkReport(
+        rows=rows,
+        scored=scored,
+        skipped=rows - scored,
+        chunks=chunks,
+        seconds=time.perf_counter() - start,
+    )
+
+
+# ────────────────────────────────────────────────────────
+# Command line
+# ────────────────────────────────────────────────────────
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet scenario file in chunks.")
+    parser.add_argument("source", help="Scenario file (.csv or .parquet).")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.csv or .parquet).")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--level", type=float, default=None, help="Add prediction intervals at this coverage.")
+    args = parser.parse_args(argv)
+
+    def show(rows: int) -> None:
+        print(f"\r{rows:,} rows", end="", file=sys.stderr, flush=True)
+
+    try:
+        report = score_file(args.source, args.output, args.chunk_rows, args.level, progress=show)
+    except (ValueError, ImportError) as exc:
+        print(f"\nFailed: {exc}", file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    print(report.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,45 @@
 """
 Provides functions to load and query the merged CO₂-per-capita dataset.
+
+get_presentation() serves the Case Studies page from a presentation layer
+built once per dataset generation: a chart frame for every state, a
+Year × State table for comparison charts, per-state summary statistics
+(min, max, CAGR and national rank), and a NationalRanking of every state in
+every year by CO₂ per capita and by each driver. Showing any state or set of
+states costs a dictionary lookup and a column selection, and ranking
+questions ("top 3 emitters in 2015") are array lookups.
 """
 
+import threading
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 
-# Module‐level cache for the merged DataFrame
-_cached_df = None
+import dataset_registry
+import instrumentation
+import schema
+
+# Two-letter code → state name for every state in the panel
+STATE_NAMES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas",
+    "CA": "California", "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware",
+    "FL": "Florida", "GA": "Georgia", "HI": "Hawaii", "ID": "Idaho",
+    "IL": "Illinois", "IN": "Indiana", "IA": "Iowa", "KS": "Kansas",
+    "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+    "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi",
+    "MO": "Missouri", "MT": "Montana", "NE": "Nebraska", "NV": "Nevada",
+    "NH": "New Hampshire", "NJ": "New Jersey", "NM": "New Mexico", "NY": "New York",
+    "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio", "OK": "Oklahoma",
+    "OR": "Oregon", "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina",
+    "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas", "UT": "Utah",
+    "VT": "Vermont", "VA": "Virginia", "WA": "Washington", "WV": "West Virginia",
+    "WI": "Wisconsin", "WY": "Wyoming",
+}
 
 
 def load_merged_data() -> pd.DataFrame:
-    """Load and cache the merged CO₂-per-capita data from Excel.
+    """Return the merged CO₂-per-capita data shared by all services.
 
     Expects:
       - File: assets/All main data (1998 to 2023).xlsx
@@ -20,17 +50,13 @@ def load_merged_data() -> pd.DataFrame:
           * co2 per capita (float)
 
     Returns:
-        pd.DataFrame: The full merged dataset, cached after first load.
+        pd.DataFrame: The full merged dataset. It is loaded once per process
+                      by dataset_registry and shared with data_service.
     """
-    global _cached_df
-
-    if _cached_df is None:
-        path = "assets/All main data (1998 to 2023).xlsx"
-        # engine="openpyxl" ensures pandas uses the correct reader
-        _cached_df = pd.read_excel(path, sheet_name="merged", engine="openpyxl")
-    return _cached_df
+    return dataset_registry.get_merged_data()
 
 
+@instrumentation.timed("case.series")
 def get_state_co2_series(state_code: str) -> pd.DataFrame:
     """Retrieve the CO₂-per-capita time series for a single state.
 
@@ -41,9 +67,267 @@ def get_state_co2_series(state_code: str) -> pd.DataFrame:
         pd.DataFrame: A DataFrame with columns ["Year", "co2 per capita"],
                       sorted by Year ascending.
     """
-    df = load_merged_data()
-    # Filter to the requested state
-    df_sub = df[df["State"] == state_code.upper()]
+    # O(1) positional slice of the pre-sorted frame; unknown codes give an
+    # empty slice, so the result still carries the two expected columns
+    rows = dataset_registry.get_dataset().rows(state_code.upper())
+    return rows[["Year", "co2 per capita"]]
+
+
+@instrumentation.timed("case.states_data")
+def get_states_data(state_codes: list[str], columns: list[str]) -> pd.DataFrame:
+    """Retrieve selected columns for several states, sorted by (State, Year).
+
+    Args:
+        state_codes (list[str]): Two-letter state abbreviations, case‐insensitive.
+        columns (list[str]): Columns of the merged sheet to return.
+
+    Returns:
+        pd.DataFrame: The requested columns for those states, in the order the
+                      codes were given and by Year within each state, with a
+                      fresh RangeIndex.
+    """
+    dataset = dataset_registry.get_dataset()
+    parts = [dataset.rows(code.upper())[columns] for code in state_codes]
+    return pd.concat(parts, ignore_index=True)
+
+
+# ────────────────────────────────────────────────────────
+# Presentation layer for the Case Studies page
+# ────────────────────────────────────────────────────────
+# Column label of the CO₂ series in chart frames
+CHART_COLUMN = "CO₂"
+
+
+@dataclass(frozen=True)
+class NationalRanking:
+    """Per-year national ranks of every state, by CO₂ per capita and by each driver.
+
+    Rank 1 is the highest value. States without a value for a metric in a
+    year are left out of that year's ranking (rank 0); equal values are
+    ranked by state code.
+    """
+
+    metrics: tuple[str, ...]    # TARGET first, then schema.FEATURES
+    years: np.ndarray           # (n_years,) ascending
+    states: np.ndarray          # (n_states,) sorted state codes
+    order: np.ndarray           # (n_metrics, n_years, n_states) state indices, highest value first
+    ranks: np.ndarray           # (n_metrics, n_years, n_states) 1-based rank, 0 where missing
+    counts: np.ndarray          # (n_metrics, n_years) states ranked in each year
+
+    def _index(self, metric: str, year: int) -> tuple[int, int]:
+        if metric not in self.metrics:
+            raise KeyError(f"Unknown metric {metric!r}; choose among {list(self.metrics)}.")
+        y = int(np.searchsorted(self.years, year))
+        if y == len(self.years) or self.years[y] != year:
+            raise KeyError(f"No data for {year}; years run {self.years[0]}–{self.years[-1]}.")
+        return self.metrics.index(metric), y
+
+    def latest_year(self, metric: str = schema.TARGET) -> int:
+        """Return the most recent year in which at least one state has a value."""
+        if metric not in self.metrics:
+            raise KeyError(f"Unknown metric {metric!r}; choose among {list(self.metrics)}.")
+        ranked = np.flatnonzero(self.counts[self.metrics.index(metric)])
+        if not len(ranked):
+            raise KeyError(f"No state has a value for {metric!r}.")
+        return int(self.years[ranked[-1]])
+
+    def top_k(self, year: int, k: int = 3, metric: str = schema.TARGET) -> list[str]:
+        """Return the k highest-ranked state codes of one year, highest first."""
+        m, y = self._index(metric, year)
+        return self.states[self.order[m, y, :min(k, self.counts[m, y])]].tolist()
+
+    def rank(self, state_code: str, year: int, metric: str = schema.TARGET) -> int:
+        """Return one state's rank in one year (0 if it has no value)."""
+        m, y = self._index(metric, year)
+        s = int(np.searchsorted(self.states, state_code.upper()))
+        if s == len(self.states) or self.states[s] != state_code.upper():
+            return 0
+        return int(self.ranks[m, y, s])
+
+    def year_table(self, year: int, metric: str = schema.TARGET) -> pd.DataFrame:
+        """Return every state's rank in one year, with the change since the year before.
+
+        Returns:
+            pd.DataFrame: Indexed by state in rank order, columns "rank" and
+                          "change" (places gained since the previous year;
+                          NaN in the first year or when either rank is missing).
+        """
+        m, y = self._index(metric, year)
+        ranked = self.order[m, y, :self.counts[m, y]]
+        current = self.ranks[m, y, ranked]
+        change = np.full(len(ranked), np.nan)
+        if y > 0:
+            previous = self.ranks[m, y - 1, ranked]
+            change = np.where(previous > 0, previous - current, np.nan)
+        return pd.DataFrame({"rank": current, "change": change}, index=pd.Index(self.states[ranked], name="State"))
+
+    def rank_changes(self, start: int, end: int, metric: str = schema.TARGET) -> pd.DataFrame:
+        """Compare every state's rank between two years.
+
+        Returns:
+            pd.DataFrame: Indexed by state, columns "start", "end" (ranks, 0
+                          if missing) and "change" (places gained, NaN if
+                          either rank is missing), sorted by the end rank.
+        """
+        m, y0 = self._index(metric, start)
+        _, y1 = self._index(metric, end)
+        first, last = self.ranks[m, y0], self.ranks[m, y1]
+        change = np.where((first > 0) & (last > 0), first - last, np.nan)
+        table = pd.DataFrame({"start": first, "end": last, "change": change}, index=pd.Index(self.states, name="State"))
+        return table.iloc[np.argsort(np.where(last > 0, last, len(self.states) + 1), kind="stable")]
+
+    def history(self, state_code: str, metric: str = schema.TARGET) -> pd.Series:
+        """Return one state's rank in every year (0 where it has no value)."""
+        m = self.metrics.index(metric)
+        s = int(np.searchsorted(self.states, state_code.upper()))
+        if s == len(self.states) or self.states[s] != state_code.upper():
+            raise KeyError(f"Unknown state {state_code!r}.")
+        return pd.Series(self.ranks[m, :, s], index=pd.Index(self.years, name="Year"), name=metric)
+
+
+def build_ranking(frame: pd.DataFrame) -> NationalRanking:
+    """Rank every state in every year by CO₂ per capita and each driver.
+
+    One argsort over a (metric, year, state) value cube ranks all of them
+    at once; missing values sort last and are left unranked.
+
+    Args:
+        frame (pd.DataFrame): The merged panel (State, Year and any of the
+            TARGET/FEATURES columns).
+
+    Returns:
+        NationalRanking: Ranks, orderings and per-year counts.
+    """
+    metrics = tuple(name for name in (schema.TARGET, *schema.FEATURES) if name in frame.columns)
+    rows = frame[frame["State"].notna() & frame["Year"].notna()]
+    state_idx, states = pd.factorize(rows["State"], sort=True)
+    states = np.asarray(states, dtype=str)
+    year_idx, years = pd.factorize(rows["Year"], sort=True)
+
+    values = np.full((len(metrics), len(years), len(states)), np.nan)
+    for m, name in enumerate(metrics):
+        values[m, year_idx, state_idx] = rows[name].to_numpy(dtype=float, na_value=np.nan)
+
+    # Negate so the highest value comes first; NaN still sorts last
+    order = np.argsort(-values, axis=-1, kind="stable")
+    counts = (~np.isnan(values)).sum(axis=-1)
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, len(states) + 1), axis=-1)
+    ranks[np.isnan(values)] = 0
+    for arr in (order, ranks, counts):
+        arr.flags.writeable = False
+    return NationalRanking(metrics, years, states, order, ranks, counts)
+
+
+@dataclass(frozen=True)
+class CasePresentation:
+    """Chart frames and summary statistics of every state, for one dataset generation.
+
+    All frames are shared between sessions and must be treated as read-only.
+    """
+
+    generation: int
+    charts: dict[str, pd.DataFrame]   # state → "Year" and CHART_COLUMN columns, one row per year
+    wide: pd.DataFrame                # Year × state code CO₂ per capita (NaN where a year is missing)
+    # Indexed by state: first_year, last_year, latest, min, min_year, max,
+    # max_year, cagr and rank (1 = highest latest CO₂ per capita)
+    summary: pd.DataFrame
+    ranking: NationalRanking
+
+    def chart(self, state_code: str) -> pd.DataFrame:
+        """Return one state's chart frame (empty if unknown)."""
+        return self.charts.get(state_code.upper(), _EMPTY_CHART)
+
+    def comparison(self, state_codes: list[str]) -> pd.DataFrame:
+        """Return a "Year" column plus one CO₂ per capita column per state, labelled by state name."""
+        codes = [code.upper() for code in state_codes if code.upper() in self.wide.columns]
+        return self.wide[codes].rename(columns=STATE_NAMES).reset_index()
+
+
+_EMPTY_CHART = pd.DataFrame({"Year": pd.Series(dtype=int), CHART_COLUMN: pd.Series(dtype=float)})
+
+
+def build_presentation(dataset: dataset_registry.MergedDataset, generation: int = 0) -> CasePresentation:
+    """Compute every state's chart frame and summary statistics in one pass.
+
+    Args:
+        dataset (MergedDataset): The indexed merged panel.
+        generation (int): Dataset generation the result belongs to.
+
+    Returns:
+        CasePresentation: The presentation layer for that dataset.
+    """
+    frame = dataset.frame
+    series = frame[["State", "Year", "co2 per capita"]].dropna()
+
+    # The frame is sorted by (State, Year), so first/last are the earliest and latest years
+    grouped = series.groupby("State", observed=True, sort=True)
+    summary = grouped["co2 per capita"].agg(["first", "last", "min", "max"]).rename(columns={"last": "latest"})
+    summary.index = summary.index.astype(str)
+    summary[["first_year", "last_year"]] = grouped["Year"].agg(["first", "last"]).to_numpy()
+    summary["min_year"] = series.loc[grouped["co2 per capita"].idxmin(), "Year"].to_numpy()
+    summary["max_year"] = series.loc[grouped["co2 per capita"].idxmax(), "Year"].to_numpy()
+
+    span = (summary["last_year"] - summary["first_year"]).to_numpy(dtype=float)
+    ratio = (summary["latest"] / summary["first"]).to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = np.where((span > 0) & (ratio > 0) & np.isfinite(ratio), ratio ** (1.0 / span) - 1.0, np.nan)
+    summary["cagr"] = cagr
+    # Ranked like NationalRanking (ties by state code), so both agree on a shared latest year
+    latest = build_ranking(pd.DataFrame({"State": summary.index, "Year": 0, schema.TARGET: summary["latest"]}))
+    summary["rank"] = pd.Series(latest.ranks[0, 0], index=latest.states).reindex(summary.index).to_numpy()
+    summary = summary.drop(columns="first")[
+        ["first_year", "last_year", "latest", "min", "min_year", "max", "max_year", "cagr", "rank"]
+    ]
+
+    # One small frame per state, built straight from slices of the sorted arrays
+    codes, states = pd.factorize(series["State"], sort=True)
+    values = series["co2 per capita"].to_numpy()
+    years = series["Year"].to_numpy()
+    positions = np.arange(len(states))
+    starts, ends = np.searchsorted(codes, positions, side="left"), np.searchsorted(codes, positions, side="right")
+    charts = {
+        str(state): pd.DataFrame({"Year": years[start:end], CHART_COLUMN: values[start:end]})
+        for state, start, end in zip(states, starts, ends)
+    }
+
+    year_idx, all_years = pd.factorize(years, sort=True)
+    grid = np.full((len(all_years), len(states)), np.nan)
+    grid[year_idx, codes] = values
+    wide = pd.DataFrame(grid, index=pd.Index(all_years, name="Year"), columns=list(charts))
+    return CasePresentation(
+        generation=generation,
+        charts=charts,
+        wide=wide,
+        summary=summary,
+        ranking=build_ranking(frame),
+    )
+
+
+_presentation_lock = threading.Lock()
+_presentation = None
+
+
+def get_presentation() -> CasePresentation:
+    """Return the presentation layer of the current dataset, building it on first use.
+
+    Rebuilt once after dataset_registry.invalidate(); concurrent callers
+    wait for a build in progress instead of starting their own.
+    """
+    global _presentation
+    generation = dataset_registry.generation()
+    presentation = _presentation
+    if presentation is not None and presentation.generation == generation:
+        instrumentation.cache_hit("case_presentation")
+        return presentation
+    with _presentation_lock:
+        if _presentation is None or _presentation.generation != generation:
+            instrumentation.cache_miss("case_presentation")
+            with instrumentation.span("case.presentation.build"):
+                _presentation = build_presentation(dataset_registry.get_dataset(), generation)
+        return _presentation
+
 
-    # Select and sort the relevant columns
-    return df_sub[["Year", "co2 per capita"]].sort_values("Year")
+def get_ranking() -> NationalRanking:
+    """Return the national ranking of the current dataset (see get_presentation())."""
+    return get_presentation().ranking
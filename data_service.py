@@ -1,93 +1,697 @@
 """
 Data service module for fitting state‐specific linear regression models
 and predicting CO₂ per capita using NumPy.
+
+Every state uses plain OLS by default. configure_models() (or the
+CO2_MODEL_METHOD switch, e.g. "ridge" or "ols,WY=lasso,ND=ridge") selects
+ridge or lasso for all or some states, with penalties tuned by
+cross-validation (see regularized); the prediction API is the same for
+every family.
+
+Drivers are relatively scaled before solving (each column divided by its
+largest absolute value over the state's training rows; see
+ols_engine.relative_scale). The scale is stored in the model artifact next
+to the coefficients and reused for the interval quadratic forms, so
+predictions in original units are unchanged while the designs stay well
+conditioned. conditioning_report() compares the
+raw and scaled condition numbers.
 """
 
-import pandas as pd
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
 import numpy as np
 
-# ────────────────────────────────────────────────────────
-# Module‐level cache for the merged dataset
-# ────────────────────────────────────────────────────────
-_cached_df = None
+import dataset_registry
+import instrumentation
+import lazy_import
+import model_store
+import ols_engine
+import online_ols
+import regularized
+import schema
 
+pd = lazy_import.module("pandas")
 
-def load_merged_data() -> pd.DataFrame:
-    """Load and cache the merged CO₂-per-capita dataset from Excel."""
-    global _cached_df
-    if _cached_df is None:
-        path = "assets/All main data (1998 to 2023).xlsx"
-        _cached_df = pd.read_excel(path, sheet_name="merged", engine="openpyxl")
-    return _cached_df
+# ────────────────────────────────────────────────────────
+# Dataset access (shared with case_service via dataset_registry)
+# ────────────────────────────────────────────────────────
+def load_merged_data() -> "pd.DataFrame":
+    """Return the shared merged CO₂-per-capita dataset (loaded once per process)."""
+    return dataset_registry.get_merged_data()
 
 
 # ────────────────────────────────────────────────────────
 # Core regression fitting
 # ────────────────────────────────────────────────────────
-# List of feature column names (must match the Excel sheet exactly)
-_FEATURES = [
-    "renewable energy",
-    "Coal Electricity Consumption",
-    "Natural Gas Electricity Consumption",
-    "PCE per capita",
-    "Estimated Urban Population",
-]
-
-# The three case‐study state codes
+# Feature column names: the canonical names of schema.MERGED_SCHEMA, which
+# renames accepted aliases in the sheet when the dataset loads
+_FEATURES = list(schema.FEATURES)
+
+# The three case‐study state codes (the Prediction page lists these first)
 _STATES = ["WY", "ND", "AK"]
 
-# Cache for the fitted models (intercept + slopes)
-_fitted_models = None
+# Model families a state can use: plain OLS, or ridge/lasso with the
+# penalty chosen by cross-validation
+MODEL_METHODS = ("ols", "ridge", "lasso")
+
+
+def _fit_options(method: str = "ols", per_state: dict = None) -> dict:
+    """Build (and validate) the fit options for a default family and per-state overrides."""
+    per_state = {state.upper(): m for state, m in (per_state or {}).items() if m != method}
+    unknown = sorted({method, *per_state.values()} - set(MODEL_METHODS))
+    if unknown:
+        raise ValueError(f"Unknown model method(s) {unknown}; choose among {list(MODEL_METHODS)}.")
+    options = {"method": method, "solver": "batched-svd", "scaling": "relative"}
+    if per_state:
+        options["per_state"] = dict(sorted(per_state.items()))
+    return options
+
+
+def _parse_method_switch(value: str) -> dict:
+    """Parse CO2_MODEL_METHOD: a default family, then optional STATE=family items."""
+    method, per_state = "ols", {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        if "=" in item:
+            state, family = item.split("=", 1)
+            per_state[state.strip()] = family.strip().lower()
+        else:
+            method = item.lower()
+    return _fit_options(method, per_state)
+
+
+# Options that, together with the dataset hash and _FEATURES, key the
+# persisted model artifact (see model_store)
+_FIT_OPTIONS = _parse_method_switch(os.environ.get("CO2_MODEL_METHOD", "ols"))
+
+
+@dataclass(frozen=True)
+class _ModelBundle:
+    """One set of models and everything predictions read from it.
+
+    Replaced as a whole, never mutated: a caller that captures the bundle
+    once sees state rows, coefficients and scales of the same fit even if
+    a refit or panel swap publishes a new bundle meanwhile. The
+    coefficients live in one contiguous (n_states, p+1) array, column 0 the
+    intercept and columns 1..p the slopes in _FEATURES order; the dicts are
+    a view of it. Intervals use the matching (n_states, p+1) column scales
+    and (XᵀX)⁻¹ expressed in scaled units.
+    """
+
+    states: list[str]
+    index: dict[str, int]               # state code → row
+    fit: ols_engine.OLSFit
+    coef: np.ndarray
+    x_scale: np.ndarray
+    scaled_xtx_inv: np.ndarray
+    models: dict[str, dict[str, float]]
+    key: str                            # model_version()
+    generation: int                     # dataset generation the models belong to
+
+
+# The models in use, tagged with the dataset generation they were fitted on
+# so dataset_registry.invalidate() expires them; published under the lock
+_models: Optional[_ModelBundle] = None
+_models_lock = threading.Lock()
+
+# Per-state sufficient statistics for incremental updates, seeded from the
+# panel on the first update_state_models() call of a dataset generation;
+# the lock serialises updates so none is lost between seed and publish
+_online = None
+_online_generation = None
+_online_rows: set[tuple[str, int]] = set()   # (State, Year) already in _online
+_online_lock = threading.Lock()
+
+
+def stack_panel(dataset=None) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Group the panel once into zero-padded per-state arrays.
+
+    Works on the dataset's pre-validated model arrays (complete rows only),
+    so no columns are looked up and nothing is dropped here.
+
+    Args:
+        dataset (MergedDataset): Defaults to the shared dataset.
+
+    Returns:
+        tuple: (states, X3, y2, mask, years) where row i of each array is
+               states[i]; X3 is (n_states, T, p+1) with a leading column of
+               1s, and y2, mask and years are (n_states, T).
+    """
+    if dataset is None:
+        dataset = dataset_registry.get_dataset()
+    model = _require_model(dataset)
+    states = dataset.states
+    X3, y2, mask, years2 = ols_engine.stack_groups(
+        model.group_ids, model.X, model.y, len(states), aux=model.years
+    )
+    return states, X3, y2, mask, years2
+
+
+def _require_model(dataset) -> "dataset_registry.ModelArrays":
+    if dataset.model is None:
+        raise schema.SchemaError(
+            f"The dataset lacks model columns; need {['State', 'Year', schema.TARGET] + _FEATURES}."
+        )
+    return dataset.model
+
+
+def state_methods(states: list[str]) -> list[str]:
+    """Return the configured model family of each state."""
+    per_state = _FIT_OPTIONS.get("per_state", {})
+    return [per_state.get(state, _FIT_OPTIONS["method"]) for state in states]
+
+
+def _fit_all_states(dataset) -> tuple[list[str], ols_engine.OLSFit]:
+    """Group the panel once and solve every state's problem, one batch per model family."""
+    states, X3, y2, mask, _ = stack_panel(dataset)
+    scale = ols_engine.relative_scale(X3, mask)
+    methods = np.asarray(state_methods(states))
+    if (methods == "ols").all():
+        # Batched SVD solve of the scaled designs; matches np.linalg.lstsq
+        # per state to rounding
+        return states, ols_engine.batched_ols(X3, y2, mask, scale=scale)
+
+    parts = {}
+    for method in np.unique(methods):
+        rows = np.flatnonzero(methods == method)
+        if method == "ols":
+            parts[method] = (rows, ols_engine.batched_ols(X3[rows], y2[rows], mask[rows], scale=scale[rows]))
+        else:
+            parts[method] = (rows, regularized.fit(method, X3[rows], y2[rows], mask[rows]))
+
+    # Scatter each family's rows back into one fit in state order; OLS rows get penalty 0
+    combined = {}
+    for field in ["coef", "stderr", "xtx_inv", "sigma2", "r2", "adj_r2", "n_obs", "rank", "penalty"]:
+        sample = next(getattr(fit, field) for _, fit in parts.values() if getattr(fit, field) is not None)
+        combined[field] = np.zeros((len(states),) + sample.shape[1:], dtype=sample.dtype)
+        for rows, fit in parts.values():
+            if getattr(fit, field) is not None:
+                combined[field][rows] = getattr(fit, field)
+    # Ridge and lasso standardize internally; every state keeps the same
+    # relative scale for prediction and reports its scaled design's conditioning
+    combined["x_scale"] = scale
+    combined["cond"] = ols_engine.condition_numbers(X3, mask, scale)
+    return states, ols_engine.OLSFit(**combined)
+
+
+def configure_models(method: str = "ols", per_state: dict = None) -> None:
+    """Choose the model family used for all states, or per state.
+
+    The next fit_state_models() call loads (or fits and stores) the
+    artifact for that configuration; artifacts of other configurations stay
+    on disk under their own keys.
+
+    Args:
+        method (str): Family for every state: "ols", "ridge" or "lasso".
+        per_state (dict): Optional state code → family overrides.
+    """
+    global _FIT_OPTIONS, _models, _online
+    _FIT_OPTIONS = _fit_options(method, per_state)
+    with _models_lock:
+        _models = None
+    _online = None
+
+
+@instrumentation.timed("models.fit")
+def build_model_artifact() -> model_store.ModelArtifact:
+    """Fit all states from the dataset and persist the result as an artifact."""
+    states, fit = _fit_all_states(dataset_registry.get_dataset())
+    dataset_sha256 = model_store.dataset_fingerprint()
+    try:
+        return model_store.save(states, _FEATURES, _FIT_OPTIONS, dataset_sha256, fit)
+    except OSError:
+        # Read-only deployments still predict; they just refit per process
+        key = model_store.artifact_key(dataset_sha256, _FEATURES, _FIT_OPTIONS)
+        return model_store.ModelArtifact(key, states, list(_FEATURES), fit, {})
 
 
 def fit_state_models() -> dict[str, dict[str, float]]:
     """
-    Fit and cache OLS coefficient dictionaries for each state in _STATES.
+    Fit and cache OLS coefficient dictionaries for every state in the panel.
+
+    The models come from the persisted artifact for the current workbook,
+    feature list and fit options when one exists (no dataset load needed);
+    otherwise all states are solved in one batched least-squares pass and
+    the artifact is written for later processes. Standard errors and
+    adjusted R² are available via get_model_fit() and model_summary().
     
     Returns:
         {
-          "WY":   {"intercept": float, "renewable energy": float, ..., },
-          "ND":   {...},
-          "AK":   {...}
+          "AK":   {"intercept": float, "renewable energy": float, ..., },
+          "AL":   {...},
+          ...
+          "WY":   {...}
         }
     """
-    global _fitted_models
-    if _fitted_models is not None:
-        return _fitted_models
+    return _current_models().models
 
-    df = load_merged_data()
-    models: dict[str, dict[str, float]] = {}
 
-    for state in _STATES:
-        # Filter data for this state and drop any rows with missing values
-        df_s = df[df["State"] == state].dropna(subset=_FEATURES + ["co2 per capita"])
-        
-        # Design matrix X (n×(p+1)) with leading column of 1s for intercept
-        X_raw = df_s[_FEATURES].values
-        ones = np.ones((X_raw.shape[0], 1))
-        X = np.hstack([ones, X_raw])
-        
-        # Response vector y
-        y = df_s["co2 per capita"].values
-        
-        # Solve OLS via the normal equations: β = (XᵀX)⁻¹ Xᵀ y
-        # We use np.linalg.lstsq for numerical stability
-        beta, *_ = np.linalg.lstsq(X, y, rcond=None)
-        
-        # Build a dict of coefficients
-        coef_dict = {"intercept": float(beta[0])}
+def _current_models() -> _ModelBundle:
+    """Return the bundle for the current dataset generation, loading or fitting it if needed."""
+    generation = dataset_registry.generation()
+    bundle = _models
+    if bundle is not None and bundle.generation == generation:
+        instrumentation.cache_hit("models")
+        return bundle
+    instrumentation.cache_miss("models")
+
+    with instrumentation.span("models.load_artifact"):
+        key = model_store.artifact_key(model_store.dataset_fingerprint(), _FEATURES, _FIT_OPTIONS)
+        artifact = model_store.load(key)
+    if artifact is None or artifact.features != _FEATURES:
+        instrumentation.cache_miss("model_artifact")
+        artifact = build_model_artifact()
+    else:
+        instrumentation.cache_hit("model_artifact")
+
+    return _install_models(artifact.states, artifact.fit, artifact.key, generation)
+
+
+def _install_models(states: list[str], fit: ols_engine.OLSFit, key: str, generation: int) -> _ModelBundle:
+    """Make a fit the current set of models used for prediction, in one assignment."""
+    global _models
+    coef = np.ascontiguousarray(fit.coef)
+    # Incremental (online) fits carry no scale; their intervals use original units
+    scale = fit.x_scale if fit.x_scale is not None else np.ones_like(coef)
+
+    # Build a dict of coefficients per state from the matrix rows
+    models: dict[str, dict[str, float]] = {}
+    for row, state in enumerate(states):
+        coef_dict = {"intercept": float(coef[row, 0])}
         for idx, feat in enumerate(_FEATURES, start=1):
-            coef_dict[feat] = float(beta[idx])
-        
+            coef_dict[feat] = float(coef[row, idx])
         models[state] = coef_dict
 
-    _fitted_models = models
-    return models
+    bundle = _ModelBundle(
+        states=list(states),
+        index={state: row for row, state in enumerate(states)},
+        fit=fit,
+        coef=coef,
+        x_scale=scale,
+        scaled_xtx_inv=fit.xtx_inv * scale[:, :, None] * scale[:, None, :],
+        models=models,
+        key=key,
+        generation=generation,
+    )
+    with _models_lock:
+        # A slow fit for an older generation must not replace a newer bundle
+        if _models is None or _models.generation <= generation:
+            _models = bundle
+    return bundle
+
+
+def model_version() -> str:
+    """Return the artifact key of the models currently in use."""
+    return _current_models().key
+
+
+def _model_rows(rows: "pd.DataFrame") -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Split incoming rows into (states, years, X, y), dropping rows with missing values."""
+    missing = [name for name in ["State", "Year", schema.TARGET] + _FEATURES if name not in rows.columns]
+    if missing:
+        raise schema.SchemaError(f"Rows are missing columns {missing}.")
+    X = rows[_FEATURES].to_numpy(dtype=float)
+    y = rows["co2 per capita"].to_numpy(dtype=float)
+    years = rows["Year"].to_numpy(dtype=float)
+    valid = ~(np.isnan(X).any(axis=1) | np.isnan(y) | np.isnan(years))
+    states = rows["State"].astype(str).str.upper().to_numpy()
+    return states[valid], years[valid].astype(int), X[valid], y[valid]
+
+
+def _rows_after(held: set, added=None, removed=None) -> set:
+    """Return the (State, Year) keys held once rows are added and removed.
+
+    Raises:
+        ValueError: If a row would be counted twice (its key is already held
+            or repeats within the batch) or a removed key is not held.
+    """
+    held = set(held)
+    for parsed, adding in [(added, True), (removed, False)]:
+        if parsed is None:
+            continue
+        keys = list(zip(parsed[0].tolist(), parsed[1].tolist()))
+        if len(set(keys)) != len(keys):
+            raise ValueError("Rows repeat a (State, Year); each observation may be counted once.")
+        bad = sorted(k for k in keys if (k in held) == adding)
+        if bad:
+            problem = "are already in the models" if adding else "were never added to the models"
+            raise ValueError(f"Rows for (State, Year) {bad[:5]}{' …' if len(bad) > 5 else ''} {problem}.")
+        if adding:
+            held.update(keys)
+        else:
+            held.difference_update(keys)
+    return held
+
+
+@instrumentation.timed("models.update")
+def update_state_models(
+    new_rows: "pd.DataFrame",
+    expired_rows: "pd.DataFrame" = None,
+) -> dict[str, dict[str, float]]:
+    """
+    Fold newly arrived rows (e.g. a new year) into the models without refitting.
+
+    Per-state sufficient statistics (XᵀX, Xᵀy, n, Σy²) are built from the
+    panel once per dataset generation; after that each call costs O(p²) per
+    ingested row and never rescans history. The updated models replace the
+    current ones in memory (with a new model_version()) until the dataset is
+    invalidated; they are not written to the artifact store, which stays
+    keyed to the workbook contents.
+
+    Args:
+        new_rows (pd.DataFrame): Rows with "State", "Year", _FEATURES and
+            "co2 per capita" columns to add.
+        expired_rows (pd.DataFrame): Optional rows to remove again, e.g. the
+            oldest year of a rolling window.
+
+    Returns:
+        dict: The updated coefficient dictionaries, as fit_state_models().
+
+    Raises:
+        ValueError: If a new row's (State, Year) is already in the panel or
+            was added by an earlier update, or an expired one is not held;
+            nothing is changed then.
+    """
+    global _online, _online_generation, _online_rows
+    if _FIT_OPTIONS["method"] != "ols" or _FIT_OPTIONS.get("per_state"):
+        raise ValueError(
+            "Incremental updates keep OLS statistics only; they are not available for "
+            f"ridge/lasso models (configured: {_FIT_OPTIONS})."
+        )
+    with _online_lock:
+        current = _current_models()
+        generation = current.generation
+        if _online is None or _online_generation != generation:
+            dataset = dataset_registry.get_dataset()
+            model = _require_model(dataset)
+            seed_states = np.asarray(dataset.states)[model.group_ids]
+            _online = online_ols.OnlineOLS([], len(_FEATURES))
+            _online.update(seed_states, model.X, model.y)
+            _online_rows = set(zip(seed_states.tolist(), model.years.astype(int).tolist()))
+            _online_generation = generation
+
+        added, removed = [
+            _model_rows(rows) if rows is not None and len(rows) else None for rows in (new_rows, expired_rows)
+        ]
+        held = _rows_after(_online_rows, added, removed)
+
+        # The new model version chains the previous one with the ingested rows
+        digest = hashlib.sha256(current.key.encode("utf-8"))
+        for parsed, apply, tag in [(added, _online.update, b"+"), (removed, _online.downdate, b"-")]:
+            if parsed is not None:
+                states, _, X, y = parsed
+                apply(states, X, y)
+                digest.update(tag + states.astype(str).tobytes() + X.tobytes() + y.tobytes())
+        _online_rows = held
+
+        return _install_models(_online.states, _online.fit(), digest.hexdigest()[:16], generation).models
+
+
+def get_model_fit() -> tuple[list[str], ols_engine.OLSFit]:
+    """Return the state codes and the full batched fit (row i ↔ state i)."""
+    bundle = _current_models()
+    return bundle.states, bundle.fit
+
+
+def model_summary() -> "pd.DataFrame":
+    """
+    Tabulate the per-state fit statistics.
+
+    Returns:
+        pd.DataFrame: Indexed by State, with columns "method", "penalty"
+                      (0 for OLS), "n_obs", "r2", "adj_r2", "sigma", "cond"
+                      (condition number of the scaled design; NaN for
+                      incrementally updated models) and, for each term (intercept and _FEATURES),
+                      the coefficient and its standard error ("se <term>").
+    """
+    states, fit = get_model_fit()
+    terms = ["intercept"] + _FEATURES
+    summary = pd.DataFrame(
+        {
+            "method": state_methods(states),
+            "penalty": fit.penalty if fit.penalty is not None else np.zeros(len(states)),
+            "n_obs": fit.n_obs,
+            "r2": fit.r2,
+            "adj_r2": fit.adj_r2,
+            "sigma": np.sqrt(fit.sigma2),
+            "cond": fit.cond if fit.cond is not None else np.full(len(states), np.nan),
+        },
+        index=pd.Index(states, name="State"),
+    )
+    for idx, term in enumerate(terms):
+        summary[term] = fit.coef[:, idx]
+        summary[f"se {term}"] = fit.stderr[:, idx]
+    return summary
+
+
+def conditioning_report(dataset=None) -> "pd.DataFrame":
+    """
+    Compare each state's design conditioning before and after relative scaling.
+
+    Args:
+        dataset (MergedDataset): Defaults to the shared dataset.
+
+    Returns:
+        pd.DataFrame: Indexed by State, with columns "cond raw" and
+                      "cond scaled" (σ_max / σ_min of the design including
+                      the intercept column; inf if singular).
+    """
+    states, X3, _, mask, _ = stack_panel(dataset)
+    scale = ols_engine.relative_scale(X3, mask)
+    return pd.DataFrame(
+        {
+            "cond raw": ols_engine.condition_numbers(X3, mask),
+            "cond scaled": ols_engine.condition_numbers(X3, mask, scale),
+        },
+        index=pd.Index(states, name="State"),
+    )
 
 
 # ────────────────────────────────────────────────────────
 # Prediction API
 # ────────────────────────────────────────────────────────
+def _as_feature_matrix(X) -> np.ndarray:
+    """Coerce a DataFrame or array of driver values to an (n, p) float array."""
+    # Checked without importing pandas: nobody can pass a DataFrame before it is loaded
+    pandas = lazy_import.loaded("pandas")
+    if pandas is not None and isinstance(X, pandas.DataFrame):
+        missing = [feat for feat in _FEATURES if feat not in X.columns]
+        if missing:
+            raise ValueError(f"Input is missing feature columns {missing}.")
+        return X[_FEATURES].to_numpy(dtype=float)
+
+    arr = np.asarray(X, dtype=float)
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1)
+    if arr.ndim != 2 or arr.shape[1] != len(_FEATURES):
+        raise ValueError(
+            f"Expected an array of shape (n, {len(_FEATURES)}) in _FEATURES order, "
+            f"got {arr.shape}."
+        )
+    return arr
+
+
+def _coef_rows(index: dict[str, int], states, n: int) -> np.ndarray:
+    """Map state codes (one per row, or a single code for all rows) to rows of a bundle's arrays."""
+    if isinstance(states, str):
+        codes, inverse = np.array([states]), np.zeros(n, dtype=np.intp)
+    else:
+        codes, inverse = np.unique(np.asarray(states, dtype=str), return_inverse=True)
+        if inverse.shape[0] != n:
+            raise ValueError(f"Got {inverse.shape[0]} state codes for {n} input rows.")
+
+    # Only the distinct codes go through the dict lookup
+    lookup = np.empty(len(codes), dtype=np.intp)
+    for k, code in enumerate(codes):
+        state = code.upper()
+        if state not in index:
+            raise ValueError(f"Model for state {state} not found. Choose among {list(index)}.")
+        lookup[k] = index[state]
+    return lookup[inverse.reshape(-1)]
+
+
+@instrumentation.timed("predict.batch")
+def predict_co2_batch(states, X) -> np.ndarray:
+    """
+    Predict CO₂ emissions per capita for many input rows at once.
+
+    Rows are grouped by state and each group is scored with a single
+    matrix–vector product against that state's coefficient row. The rows
+    are not rescaled: the stored relative scale is already folded into the
+    coefficients in original units, which saves a division per input.
+
+    Args:
+        states (str | array-like of str): One state code per row of X, or a
+            single code applied to every row (case-insensitive). Mixed
+            states are allowed.
+        X (pd.DataFrame | np.ndarray): Either a DataFrame with the _FEATURES
+            columns, or an (n, p) array with columns in _FEATURES order.
+
+    Returns:
+        np.ndarray: Predicted CO₂ per capita, shape (n,).
+    """
+    bundle = _current_models()
+    X = _as_feature_matrix(X)
+    instrumentation.count("predict.rows", X.shape[0])
+    rows = _coef_rows(bundle.index, states, X.shape[0])
+    coef = bundle.coef
+
+    out = np.empty(X.shape[0])
+    for model_row, group in _row_groups(rows):
+        beta = coef[model_row]
+        out[group] = beta[0] + X[group] @ beta[1:]
+    return out
+
+
+def _row_groups(rows: np.ndarray):
+    """Yield (model row, input row indices) for each model used in a batch."""
+    # Sort rows by model once, then hand out each contiguous group
+    order = np.argsort(rows, kind="stable")
+    bounds = np.flatnonzero(np.diff(rows[order])) + 1
+    for group in np.split(order, bounds):
+        if group.size:
+            yield rows[group[0]], group
+
+
+@dataclass(frozen=True)
+class PredictionIntervals:
+    """Point predictions with their uncertainty; element i belongs to input row i."""
+
+    estimate: np.ndarray    # predicted CO₂ per capita
+    se_mean: np.ndarray     # standard error of the fitted mean
+    se_pred: np.ndarray     # standard error of a new observation
+    mean_low: np.ndarray    # confidence interval for the mean
+    mean_high: np.ndarray
+    pred_low: np.ndarray    # prediction interval for a new observation
+    pred_high: np.ndarray
+    level: float
+
+    def to_frame(self) -> "pd.DataFrame":
+        """Return the arrays as DataFrame columns (level dropped)."""
+        return pd.DataFrame({name: value for name, value in vars(self).items() if name != "level"})
+
+
+@instrumentation.timed("predict.intervals")
+def predict_co2_intervals(states, X, level: float = 0.95) -> PredictionIntervals:
+    """
+    Predict CO₂ per capita with confidence and prediction intervals.
+
+    For a row x̃ = [1, x] scored by a state's model, the variance of the
+    fitted mean is σ² x̃ᵀ(XᵀX)⁻¹x̃ and that of a new observation σ²(1 + x̃ᵀ(XᵀX)⁻¹x̃),
+    using the fit's stored (XᵀX)⁻¹ and residual variance σ²; the quadratic
+    form is evaluated on inputs divided by the stored relative scale, where
+    (ZᵀZ)⁻¹ has entries of comparable size. Rows are grouped
+    by state as in predict_co2_batch(), so a batch costs one matrix product
+    per state and no matrix is inverted at prediction time. The critical
+    value is Student's t with n − rank degrees of freedom; states without
+    spare degrees of freedom get NaN bounds.
+
+    Args:
+        states (str | array-like of str): As predict_co2_batch().
+        X (pd.DataFrame | np.ndarray): As predict_co2_batch().
+        level (float): Two-sided coverage, e.g. 0.95.
+
+    Returns:
+        PredictionIntervals: Estimates, standard errors and interval bounds.
+    """
+    if not 0 < level < 1:
+        raise ValueError(f"level must lie in (0, 1), got {level}.")
+    bundle = _current_models()
+    X = _as_feature_matrix(X)
+    instrumentation.count("predict.rows", X.shape[0])
+    rows = _coef_rows(bundle.index, states, X.shape[0])
+    fit = bundle.fit
+
+    estimate = np.empty(X.shape[0])
+    leverage = np.empty(X.shape[0])
+    for model_row, group in _row_groups(rows):
+        Z1 = np.empty((group.size, X.shape[1] + 1))
+        Z1[:, 0] = 1.0
+        Z1[:, 1:] = X[group] / bundle.x_scale[model_row, 1:]
+        beta = bundle.coef[model_row]
+        estimate[group] = beta[0] + X[group] @ beta[1:]
+        # Row-wise quadratic form z̃ᵀ(ZᵀZ)⁻¹z̃ without forming an n × n matrix
+        leverage[group] = np.einsum("ij,ij->i", Z1 @ bundle.scaled_xtx_inv[model_row], Z1)
+
+    sigma2 = fit.sigma2[rows]
+    se_mean = np.sqrt(sigma2 * np.maximum(leverage, 0.0))
+    se_pred = np.sqrt(sigma2 * (1.0 + np.maximum(leverage, 0.0)))
+    t = ols_engine.t_quantile(0.5 + level / 2, (fit.n_obs - fit.rank)[rows])
+    return PredictionIntervals(
+        estimate=estimate,
+        se_mean=se_mean,
+        se_pred=se_pred,
+        mean_low=estimate - t * se_mean,
+        mean_high=estimate + t * se_mean,
+        pred_low=estimate - t * se_pred,
+        pred_high=estimate + t * se_pred,
+        level=level,
+    )
+
+
+@dataclass(frozen=True)
+class PredictionContributions:
+    """Additive breakdown of predictions into driver terms; row i belongs to input row i."""
+
+    baseline: np.ndarray        # (n,) prediction at the reference drivers (the intercept for reference 0)
+    contributions: np.ndarray   # (n, p) coef_j × (x_j − reference_j), columns in _FEATURES order
+    estimate: np.ndarray        # (n,) baseline + row sums of contributions
+
+    def to_frame(self) -> "pd.DataFrame":
+        """Return baseline, one column per feature and the estimate."""
+        frame = pd.DataFrame(self.contributions, columns=_FEATURES)
+        frame.insert(0, "baseline", self.baseline)
+        frame["estimate"] = self.estimate
+        return frame
+
+
+@instrumentation.timed("predict.contributions")
+def explain_co2_batch(states, X, reference=None) -> PredictionContributions:
+    """
+    Split predictions into the contribution of every driver, for many rows at once.
+
+    A linear model's prediction is intercept + Σ coef_j·x_j, so each driver's
+    term is its contribution. Measured against reference drivers r (e.g. a
+    state's latest observed year) the split becomes
+    ŷ(r) + Σ coef_j·(x_j − r_j), i.e. how far each driver moves the forecast
+    away from the reference prediction. The whole (n, p) matrix comes from
+    one coefficient gather and one elementwise product, with no per-state loop.
+
+    Args:
+        states (str | array-like of str): As predict_co2_batch().
+        X (pd.DataFrame | np.ndarray): As predict_co2_batch().
+        reference (array-like): Optional reference drivers in _FEATURES
+            order, one (p,) row for all inputs or an (n, p) array; None
+            measures from all-zero drivers (baseline = intercept).
+
+    Returns:
+        PredictionContributions: Baselines, the contribution matrix and the
+                                 estimates (equal to predict_co2_batch() up
+                                 to rounding).
+    """
+    bundle = _current_models()
+    X = _as_feature_matrix(X)
+    instrumentation.count("predict.rows", X.shape[0])
+    beta = bundle.coef[_coef_rows(bundle.index, states, X.shape[0])]
+
+    if reference is None:
+        baseline = beta[:, 0].copy()
+        contributions = X * beta[:, 1:]
+    else:
+        reference = np.broadcast_to(np.asarray(reference, dtype=float), X.shape)
+        baseline = beta[:, 0] + np.einsum("ij,ij->i", reference, beta[:, 1:])
+        contributions = (X - reference) * beta[:, 1:]
+    return PredictionContributions(
+        baseline=baseline,
+        contributions=contributions,
+        estimate=baseline + contributions.sum(axis=1),
+    )
+
+
 def predict_co2(
     state_code: str,
     renewable_energy: float,
@@ -100,7 +704,7 @@ def predict_co2(
     Predict CO₂ emissions per capita for a given state and input features.
 
     Args:
-        state_code (str): "WY", "ND", or "AK" (case-insensitive).
+        state_code (str): Two-letter state code, e.g. "WY" (case-insensitive).
         renewable_energy (float): Renewable energy consumption (Billion Btu/yr).
         coal_elec (float): Coal electricity consumption (short tons/yr).
         gas_elec (float): Natural gas consumption (thousand cubic feet/yr).
@@ -110,18 +714,6 @@ def predict_co2(
     Returns:
         float: Predicted CO₂ per capita.
     """
-    state = state_code.upper()
-    models = fit_state_models()
-    if state not in models:
-        raise ValueError(f"Model for state {state} not found. Choose among {list(models)}.")
-    
-    coefs = models[state]
-    # Compute intercept + Σ (slope_i × feature_i)
-    pred = coefs["intercept"]
-    pred += coefs["renewable energy"]                  * renewable_energy
-    pred += coefs["Coal Electricity Consumption"]       * coal_elec
-    pred += coefs["Natural Gas Electricity Consumption"]* gas_elec
-    pred += coefs["PCE per capita"]                    * pce_per_capita
-    pred += coefs["Estimated Urban Population"]        * urban_pop
-    
-    return float(pred)
+    # One-row call into the batch path; features in _FEATURES order
+    row = [renewable_energy, coal_elec, gas_elec, pce_per_capita, urban_pop]
+    return float(predict_co2_batch(state_code, [row])[0])
@@ -0,0 +1,435 @@
+"""
+Persistent columnar cache for worksheets of the merged Excel workbook.
+
+The first load of a sheet streams it through ingest.py in chunks and
+writes every column to a ``.npy`` file next to a small JSON manifest. Later
+loads, including those in fresh processes, memory-map the ``.npy`` files
+instead of parsing the workbook again. The manifest records the workbook's mtime, size and
+SHA-256 digest so the cache is rebuilt automatically when the file changes.
+
+Merged panels rebuilt from per-source extracts (see panel_refresh) are
+published under ``<cache dir>/panels``: immutable, content-addressed files
+plus a ``CURRENT.json`` pointer that is swapped atomically. When a pointer
+exists, published_panel() names the panel the app loads instead of the
+workbook.
+
+Switches:
+    CO2_DATA_CACHE  "0"/"off"/"false"/"no" disables the cache (default: on).
+    CO2_CACHE_DIR   Directory holding the cache (default: ".cache").
+
+Command line:
+    python dataset_cache.py build    # parse the workbook and write the cache
+    python dataset_cache.py status   # show whether the cache is up to date
+    python dataset_cache.py clear    # delete the cached sheet
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from typing import Optional
+
+import instrumentation
+import lazy_import
+
+np = lazy_import.module("numpy")
+pd = lazy_import.module("pandas")
+
+WORKBOOK_PATH = "assets/All main data (1998 to 2023).xlsx"
+SHEET_NAME = "merged"
+
+# Bump whenever the on-disk layout changes so stale caches are rebuilt
+_CACHE_FORMAT = 2
+
+_DISABLED_VALUES = {"0", "off", "false", "no"}
+
+
+# ────────────────────────────────────────────────────────
+# Configuration
+# ────────────────────────────────────────────────────────
+def cache_enabled() -> bool:
+    """Return True unless the cache is switched off via CO2_DATA_CACHE."""
+    value = os.environ.get("CO2_DATA_CACHE", "on").strip().lower()
+    return value not in _DISABLED_VALUES
+
+
+def cache_dir() -> str:
+    """Return the directory that holds cached sheets."""
+    return os.environ.get("CO2_CACHE_DIR", ".cache")
+
+
+def panel_dir() -> str:
+    """Return the directory holding published merged panels."""
+    return os.path.join(cache_dir(), "panels")
+
+
+def published_panel() -> Optional[dict]:
+    """Return the pointer to the current published panel, or None.
+
+    Returns:
+        dict | None: {"path", "sha256", "sources", "rows", "created"} as
+                     written by panel_refresh.publish(), None when nothing
+                     was published or the file it names is gone.
+    """
+    try:
+        with open(os.path.join(panel_dir(), "CURRENT.json"), encoding="utf-8") as fh:
+            pointer = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    return pointer if os.path.exists(pointer.get("path", "")) else None
+
+
+def store_path(path: str = WORKBOOK_PATH, sheet: str = SHEET_NAME) -> str:
+    """Return the cache directory used for one sheet of one workbook."""
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_dir(), f"{sheet}-{key}")
+
+
+# ────────────────────────────────────────────────────────
+# Workbook fingerprinting
+# ────────────────────────────────────────────────────────
+def file_sha256(path: str) -> str:
+    """Return the SHA-256 hex digest of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stat(path: str) -> dict:
+    st = os.stat(path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def _read_manifest(store: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(store, "manifest.json"), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(store: str, manifest: dict) -> None:
+    # Per-process name: the app and the scoring server may refresh one store at once
+    tmp = os.path.join(store, f"manifest.json.tmp-{os.getpid()}")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp, os.path.join(store, "manifest.json"))
+
+
+def is_fresh(path: str = WORKBOOK_PATH, sheet: str = SHEET_NAME) -> bool:
+    """Check whether the cached copy of a sheet matches the workbook on disk.
+
+    A matching mtime and size is trusted as-is. Otherwise the workbook is
+    hashed, and a matching digest (e.g. after a ``touch`` or a fresh git
+    checkout) refreshes the recorded mtime instead of forcing a rebuild;
+    if the manifest cannot be rewritten (read-only checkout), the copy is
+    still fresh and the hash is simply redone next time.
+    """
+    store = store_path(path, sheet)
+    manifest = _read_manifest(store)
+    if manifest is None or manifest.get("format") != _CACHE_FORMAT:
+        return False
+
+    source = manifest["source"]
+    current = _stat(path)
+    if current["mtime_ns"] == source["mtime_ns"] and current["size"] == source["size"]:
+        return True
+
+    if current["size"] != source["size"] or file_sha256(path) != source["sha256"]:
+        return False
+
+    manifest["source"].update(current)
+    try:
+        _write_manifest(store, manifest)
+    except OSError:
+        pass
+    return True
+
+
+# ────────────────────────────────────────────────────────
+# Columnar store
+# ────────────────────────────────────────────────────────
+# Rows copied per block when a column file is re-encoded or finalized
+_BLOCK_ROWS = 1 << 20
+
+
+class StoreWriter:
+    """Append DataFrame chunks to a new columnar store, one column file at a time.
+
+    Each chunk is appended to raw per-column files, so memory is bounded by
+    the chunk size (plus the dictionary of distinct text values). Numeric
+    columns widen in place when a later chunk needs a wider dtype (e.g.
+    float32 → float64, int → float for missing values); text columns are
+    dictionary-encoded as int32 codes. commit() turns the raw files into
+    ``.npy`` arrays and swaps the finished store into place atomically.
+
+    Use as a context manager so an aborted ingestion leaves no partial store:
+
+        with StoreWriter(path, sheet) as writer:
+            for chunk in chunks:
+                writer.append(chunk)
+            writer.commit()
+    """
+
+    def __init__(self, path: str = WORKBOOK_PATH, sheet: str = SHEET_NAME):
+        self.path = path
+        self.sheet = sheet
+        self.store = store_path(path, sheet)
+        self.tmp = f"{self.store}.tmp-{os.getpid()}"
+        self.n_rows = 0
+        self._columns = None
+        self._lookups = None
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        os.makedirs(self.tmp)
+
+    def __enter__(self) -> "StoreWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        # After commit() the directory has been renamed, so this only cleans up aborts
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def kinds(self) -> dict:
+        """Return {column: "numeric" | "category"} for columns seen so far."""
+        return {c["name"]: c["kind"] for c in self._columns or [] if c["kind"]}
+
+    def append(self, chunk: "pd.DataFrame") -> None:
+        """Append one chunk; its columns must match the first chunk's.
+
+        Raises:
+            TypeError: A column is neither numeric nor text.
+            ValueError: The columns differ from earlier chunks, or a column
+                        with numbers so far receives text (or vice versa).
+        """
+        names = [str(n) for n in chunk.columns]
+        if self._columns is None:
+            self._columns = [
+                {"name": name, "file": f"c{i}.npy", "kind": None, "dtype": None, "n_valid": 0}
+                for i, name in enumerate(names)
+            ]
+            self._lookups = [{} for _ in names]
+        elif names != [c["name"] for c in self._columns]:
+            raise ValueError(f"Chunk columns {names} do not match {[c['name'] for c in self._columns]}.")
+
+        for i, (column, lookup) in enumerate(zip(self._columns, self._lookups)):
+            self._append_column(column, lookup, chunk.iloc[:, i])
+        self.n_rows += len(chunk)
+
+    def _raw(self, column: dict) -> str:
+        return os.path.join(self.tmp, column["file"][:-4] + ".bin")
+
+    def _append_column(self, column: dict, lookup: dict, series: "pd.Series") -> None:
+        if series.dtype.kind in "biuf":
+            kind, values = "numeric", series.to_numpy()
+            n_valid = int(len(values) - np.isnan(values).sum()) if values.dtype.kind == "f" else len(values)
+        elif isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(series):
+            codes, uniques = pd.factorize(series)
+            # Map chunk-local codes onto the store-wide dictionary; -1 (missing) stays -1
+            local = np.array([lookup.setdefault(str(u), len(lookup)) for u in uniques] + [-1], dtype=np.int32)
+            kind, values = "category", local[codes]
+            n_valid = int((codes >= 0).sum())
+        else:
+            raise TypeError(f"Column {column['name']!r} has unsupported dtype {series.dtype}.")
+
+        if column["kind"] is None:
+            column["kind"], column["dtype"] = kind, values.dtype.str
+        elif kind != column["kind"]:
+            if n_valid == 0:
+                # An all-missing chunk fits any column
+                kind = column["kind"]
+                values = np.full(len(values), -1 if kind == "category" else np.nan)
+            elif column["n_valid"] == 0:
+                # Nothing but missing values so far: re-encode them as the new kind
+                column["kind"] = kind
+                dtype = values.dtype if kind == "category" else np.result_type(values.dtype, np.float32)
+                self._rewrite(column, dtype, fill=-1 if kind == "category" else np.nan)
+            else:
+                expected = "numbers" if column["kind"] == "numeric" else "text"
+                raise ValueError(f"Column {column['name']!r} held {expected} in earlier rows but not at row {self.n_rows + 1}.")
+
+        if kind == "numeric":
+            dtype = np.result_type(np.dtype(column["dtype"]), values.dtype)
+            if values.dtype.kind == "f" and dtype.kind in "biu":
+                dtype = np.result_type(dtype, np.float32)
+            if dtype != np.dtype(column["dtype"]):
+                self._rewrite(column, dtype)
+        else:
+            dtype = np.dtype(np.int32)
+
+        with open(self._raw(column), "ab") as fh:
+            values.astype(dtype, copy=False).tofile(fh)
+        column["n_valid"] += n_valid
+
+    def _rewrite(self, column: dict, dtype, fill=None) -> None:
+        """Re-encode the rows written so far as `dtype`, block by block."""
+        old, dtype = np.dtype(column["dtype"]), np.dtype(dtype)
+        raw = self._raw(column)
+        with open(raw + ".new", "wb") as out:
+            for start in range(0, self.n_rows, _BLOCK_ROWS):
+                count = min(_BLOCK_ROWS, self.n_rows - start)
+                if fill is not None:
+                    block = np.full(count, fill, dtype=dtype)
+                else:
+                    block = np.fromfile(raw, dtype=old, count=count, offset=start * old.itemsize).astype(dtype)
+                block.tofile(out)
+        os.replace(raw + ".new", raw)
+        column["dtype"] = dtype.str
+
+    def commit(self) -> dict:
+        """Finalize the column files, write the manifest and publish the store.
+
+        Returns:
+            dict: The manifest of the published store.
+        """
+        columns = []
+        for column, lookup in zip(self._columns or [], self._lookups or []):
+            entry = {"name": column["name"], "file": column["file"], "kind": column["kind"] or "numeric"}
+            dtype = np.dtype(column["dtype"] or np.float64)
+            remap = None
+            if entry["kind"] == "category":
+                # Store categories sorted so codes order like the values do
+                categories = sorted(lookup, key=lookup.get)
+                order = np.argsort(categories, kind="stable")
+                remap = np.empty(len(categories) + 1, dtype=np.int32)
+                remap[order] = np.arange(len(categories), dtype=np.int32)
+                remap[-1] = -1
+                entry["categories"] = [categories[i] for i in order]
+            self._finalize(column, dtype, remap)
+            columns.append(entry)
+
+        manifest = {
+            "format": _CACHE_FORMAT,
+            "sheet": self.sheet,
+            "n_rows": int(self.n_rows),
+            "columns": columns,
+            "source": {"path": self.path, **_stat(self.path), "sha256": file_sha256(self.path)},
+        }
+        _write_manifest(self.tmp, manifest)
+
+        # Swap the finished directory into place so readers never see a half-written store
+        shutil.rmtree(self.store, ignore_errors=True)
+        os.replace(self.tmp, self.store)
+        return manifest
+
+    def _finalize(self, column: dict, dtype: "np.dtype", remap) -> None:
+        """Prefix the raw column file with a .npy header (remapping codes if given)."""
+        raw = self._raw(column)
+        header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (self.n_rows,)}
+        with open(os.path.join(self.tmp, column["file"]), "wb") as out:
+            np.lib.format.write_array_header_1_0(out, header)
+            if not os.path.exists(raw):
+                return
+            for start in range(0, self.n_rows, _BLOCK_ROWS):
+                count = min(_BLOCK_ROWS, self.n_rows - start)
+                block = np.fromfile(raw, dtype=dtype, count=count, offset=start * dtype.itemsize)
+                (block if remap is None else remap[block]).tofile(out)
+        os.remove(raw)
+
+
+def _read_store(path: str, sheet: str) -> "pd.DataFrame":
+    store = store_path(path, sheet)
+    manifest = _read_manifest(store)
+    data = {}
+    for entry in manifest["columns"]:
+        values = np.load(os.path.join(store, entry["file"]), mmap_mode="r", allow_pickle=False)
+        if entry["kind"] == "category":
+            # Code -1 (missing) becomes NaN
+            data[entry["name"]] = pd.Categorical.from_codes(np.asarray(values), categories=entry["categories"])
+        else:
+            data[entry["name"]] = values
+    return pd.DataFrame(data)
+
+
+def read_excel_sheet(path: str = WORKBOOK_PATH, sheet: str = SHEET_NAME) -> "pd.DataFrame":
+    """Parse one sheet straight from the workbook, bypassing the cache."""
+    # engine="openpyxl" ensures pandas uses the correct reader
+    return pd.read_excel(path, sheet_name=sheet, engine="openpyxl")
+
+
+def _read_uncached(path: str, sheet: str) -> "pd.DataFrame":
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        return read_excel_sheet(path, sheet)
+    # CSV / Parquet sources (e.g. published panels) through the chunked readers
+    import ingest
+
+    return pd.concat(list(ingest.iter_chunks(path, sheet)), ignore_index=True)
+
+
+def load_sheet(
+    path: str = WORKBOOK_PATH,
+    sheet: str = SHEET_NAME,
+    use_cache: Optional[bool] = None,
+) -> "pd.DataFrame":
+    """Load a workbook sheet, going through the columnar cache when enabled.
+
+    Args:
+        path (str): Path to the Excel workbook (or a CSV / Parquet table).
+        sheet (str): Name of the sheet to load.
+        use_cache (Optional[bool]): Force the cache on or off; None defers to
+            the CO2_DATA_CACHE environment switch.
+
+    Returns:
+        pd.DataFrame: The sheet contents.
+    """
+    if use_cache is None:
+        use_cache = cache_enabled()
+    if not use_cache:
+        with instrumentation.span("dataset.read_excel"):
+            return _read_uncached(path, sheet)
+
+    if is_fresh(path, sheet):
+        instrumentation.cache_hit("sheet_store")
+        with instrumentation.span("dataset.read_store"):
+            return _read_store(path, sheet)
+    instrumentation.cache_miss("sheet_store")
+
+    # Imported here because ingest builds on this module's StoreWriter
+    import ingest
+
+    try:
+        with instrumentation.span("dataset.ingest"):
+            ingest.ingest(path, sheet)
+    except (OSError, TypeError, ValueError):
+        # A read-only deployment, or a table whose column types change between
+        # chunks, still loads; it just never gets the speed-up
+        with instrumentation.span("dataset.read_excel"):
+            return _read_uncached(path, sheet)
+    with instrumentation.span("dataset.read_store"):
+        return _read_store(path, sheet)
+
+
+def clear(path: str = WORKBOOK_PATH, sheet: str = SHEET_NAME) -> None:
+    """Delete the cached copy of a sheet, if any."""
+    shutil.rmtree(store_path(path, sheet), ignore_errors=True)
+
+
+# ────────────────────────────────────────────────────────
+# Command line
+# ────────────────────────────────────────────────────────
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the columnar workbook cache.")
+    parser.add_argument("command", choices=["build", "status", "clear"])
+    parser.add_argument("--workbook", default=WORKBOOK_PATH)
+    parser.add_argument("--sheet", default=SHEET_NAME)
+    args = parser.parse_args(argv)
+
+    if args.command == "clear":
+        clear(args.workbook, args.sheet)
+        print(f"Cleared {store_path(args.workbook, args.sheet)}")
+    elif args.command == "build":
+        clear(args.workbook, args.sheet)
+        df = load_sheet(args.workbook, args.sheet, use_cache=True)
+        print(f"Cached {len(df)} rows × {df.shape[1]} columns in {store_path(args.workbook, args.sheet)}")
+    else:
+        state = "fresh" if is_fresh(args.workbook, args.sheet) else "stale or missing"
+        enabled = "enabled" if cache_enabled() else "disabled (CO2_DATA_CACHE)"
+        print(f"{store_path(args.workbook, args.sheet)}: {state}; cache {enabled}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Process-wide registry holding the single shared copy of the merged dataset.
+
+Both services (and through them every page) read the merged sheet from
+here, so a Streamlit worker parses the workbook at most once and keeps one
+DataFrame in memory. Loading is single-flight: concurrent script runs that
+ask for the data while it is being loaded wait for that load instead of
+starting their own.
+
+At load time the sheet is validated against schema.MERGED_SCHEMA (aliases
+renamed, dtypes narrowed, a ValidationReport kept), the frame is sorted by
+(State, Year) with State as a categorical, and a state → row-slice index is
+built, so per-state lookups are constant-time positional slices instead of
+boolean scans. The model inputs are extracted once into ModelArrays, so
+fitting never looks up columns or drops missing rows again.
+
+The data comes from the workbook's merged sheet until panel_refresh
+publishes a panel rebuilt from per-source extracts; from then on source()
+names the published file. swap() installs a freshly built dataset in place
+of the current one without a reload, so a running app moves to the new
+version on its next script run.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+import instrumentation
+import lazy_import
+import schema
+from dataset_cache import SHEET_NAME, WORKBOOK_PATH, load_sheet, published_panel
+
+pd = lazy_import.module("pandas")
+
+
+@dataclass(frozen=True)
+class ModelArrays:
+    """Complete model rows of the panel as read-only NumPy arrays, in frame order."""
+
+    group_ids: np.ndarray   # (n,) index into MergedDataset.states
+    X: np.ndarray           # (n, p) float64, columns in schema.FEATURES order
+    y: np.ndarray           # (n,) float64 CO₂ per capita
+    years: np.ndarray       # (n,)
+
+
+@dataclass(frozen=True)
+class MergedDataset:
+    """The merged panel plus its precomputed per-state index."""
+
+    frame: "pd.DataFrame"
+    state_slices: dict[str, slice]
+    # None when the frame lacks the model columns (e.g. a partial sheet)
+    model: Optional[ModelArrays] = None
+    report: Optional[schema.ValidationReport] = None
+
+    @property
+    def states(self) -> list[str]:
+        """State codes present in the panel, in sorted order."""
+        return list(self.state_slices)
+
+    def rows(self, state_code: str) -> "pd.DataFrame":
+        """Return the Year-sorted rows of one state (empty if unknown)."""
+        return self.frame.iloc[self.state_slices.get(state_code, slice(0, 0))]
+
+
+def build_dataset(df: "pd.DataFrame", report: Optional[schema.ValidationReport] = None) -> MergedDataset:
+    """Sort the sheet by (State, Year) and index the row range of each state.
+
+    Args:
+        df (pd.DataFrame): The merged sheet (validated by schema.apply_schema).
+        report (ValidationReport): The validation report to keep alongside.
+
+    Returns:
+        MergedDataset: The sorted frame (State as categorical, fresh
+                       RangeIndex), its state → slice mapping and the
+                       model arrays.
+    """
+    frame = df.copy()
+    frame["State"] = frame["State"].astype("category")
+    # Missing states sort first so the category codes are non-decreasing
+    frame = frame.sort_values(["State", "Year"], kind="stable", na_position="first")
+    frame = frame.reset_index(drop=True)
+
+    codes = frame["State"].cat.codes.to_numpy()
+    categories = frame["State"].cat.categories
+    positions = np.arange(len(categories))
+    starts = np.searchsorted(codes, positions, side="left")
+    ends = np.searchsorted(codes, positions, side="right")
+    state_slices = {
+        str(state): slice(int(start), int(end))
+        for state, start, end in zip(categories, starts, ends)
+        if end > start
+    }
+    return MergedDataset(
+        frame=frame,
+        state_slices=state_slices,
+        model=_model_arrays(frame, codes, categories, state_slices),
+        report=report,
+    )
+
+
+def _model_arrays(frame, codes, categories, state_slices) -> Optional[ModelArrays]:
+    """Extract the complete rows' model inputs, once per load."""
+    columns = list(schema.FEATURES) + [schema.TARGET, "Year"]
+    if any(name not in frame.columns for name in columns):
+        return None
+
+    X = frame[list(schema.FEATURES)].to_numpy(dtype=np.float64)
+    y = frame[schema.TARGET].to_numpy(dtype=np.float64)
+    years = frame["Year"].to_numpy()
+
+    # Category code → position in the list of states that have rows
+    group_of_code = np.full(len(categories) + 1, -1, dtype=np.intp)
+    index = {state: i for i, state in enumerate(state_slices)}
+    for code, state in enumerate(categories):
+        group_of_code[code] = index.get(str(state), -1)
+    group_ids = group_of_code[codes]
+
+    valid = (group_ids >= 0) & ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+    if not np.issubdtype(years.dtype, np.integer):
+        valid &= ~np.isnan(years)
+    arrays = [group_ids[valid], X[valid], y[valid], years[valid]]
+    for arr in arrays:
+        arr.flags.writeable = False
+    return ModelArrays(*arrays)
+
+
+_lock = threading.Lock()
+_dataset = None
+# File the current dataset was loaded from (or swapped in with)
+_source = None
+
+# Generation counter, bumped on every invalidation so dependants (e.g. the
+# fitted-model cache in data_service) can tell their inputs went stale
+_generation = 0
+
+_stats = {"loads": 0, "last_load_seconds": None}
+
+
+def get_dataset() -> MergedDataset:
+    """Return the shared, indexed merged dataset, loading it on first use."""
+    dataset = _dataset
+    if dataset is not None:
+        instrumentation.cache_hit("dataset")
+        return dataset
+    return _load()
+
+
+def get_merged_data() -> "pd.DataFrame":
+    """Return the shared merged DataFrame, loading it on first use.
+
+    Returns:
+        pd.DataFrame: The merged dataset sorted by (State, Year). Callers
+                      must treat it as read-only since every page and
+                      service shares the same object.
+    """
+    return get_dataset().frame
+
+
+def source() -> str:
+    """Return the file the dataset is (or will be) loaded from, without loading it.
+
+    Returns:
+        str: The published panel when one exists, else the workbook.
+    """
+    if _source is not None:
+        return _source
+    pointer = published_panel()
+    return pointer["path"] if pointer is not None else WORKBOOK_PATH
+
+
+def _load() -> MergedDataset:
+    global _dataset, _source
+    with _lock:
+        # Another thread may have finished loading while we waited
+        if _dataset is None:
+            instrumentation.cache_miss("dataset")
+            start = time.perf_counter()
+            with instrumentation.span("dataset.load"):
+                path = source()
+                raw = load_sheet(path, SHEET_NAME)
+                with instrumentation.span("dataset.validate"):
+                    frame, report = schema.apply_schema(raw)
+                with instrumentation.span("dataset.index"):
+                    _dataset = build_dataset(frame, report)
+            _source = path
+            _stats["loads"] += 1
+            _stats["last_load_seconds"] = time.perf_counter() - start
+        return _dataset
+
+
+def validation_report() -> schema.ValidationReport:
+    """Return the schema validation report of the loaded dataset."""
+    return get_dataset().report
+
+
+def invalidate() -> None:
+    """Drop the shared dataset so the next access reloads it from disk."""
+    global _dataset, _source, _generation
+    with _lock:
+        _dataset = None
+        _source = None
+        _generation += 1
+
+
+def swap(dataset: MergedDataset, path: str) -> int:
+    """Replace the shared dataset with an already built one, without a reload.
+
+    Readers that already hold the old MergedDataset keep a consistent copy;
+    every later access sees the new one, and the generation bump expires
+    the caches derived from the old version (models, presentation, ...).
+
+    Args:
+        dataset (MergedDataset): The new dataset, e.g. from build_dataset().
+        path (str): The file it was published as (becomes source()).
+
+    Returns:
+        int: The new generation.
+    """
+    global _dataset, _source, _generation
+    with _lock:
+        _dataset = dataset
+        _source = path
+        _generation += 1
+        return _generation
+
+
+def generation() -> int:
+    """Return the current dataset generation (bumped by invalidate())."""
+    return _generation
+
+
+def is_loaded() -> bool:
+    """Return True if the dataset is currently held in memory."""
+    return _dataset is not None
+
+
+def memory_usage() -> dict:
+    """Report how much memory the shared dataset occupies.
+
+    Returns:
+        {
+          "loaded": bool,
+          "rows": int,
+          "columns": int,
+          "bytes": int,               # deep memory usage, including strings
+          "loads": int,               # workbook/cache loads in this process
+          "last_load_seconds": float | None,
+          "generation": int,
+          "source": str,              # file the dataset comes from
+        }
+    """
+    df = None if _dataset is None else _dataset.frame
+    return {
+        "loaded": df is not None,
+        "rows": 0 if df is None else int(len(df)),
+        "columns": 0 if df is None else int(df.shape[1]),
+        "bytes": 0 if df is None else int(df.memory_usage(deep=True).sum()),
+        "loads": _stats["loads"],
+        "last_load_seconds": _stats["last_load_seconds"],
+        "generation": _generation,
+        "source": source(),
+    }
+
+
+instrumentation.register_gauge("dataset_bytes", lambda: memory_usage()["bytes"])
+instrumentation.register_gauge("dataset_rows", lambda: memory_usage()["rows"])
+instrumentation.register_gauge("dataset_generation", generation)
@@ -0,0 +1,95 @@
+"""
+Pre-resized copies of the images shown on the pages.
+
+st.image() given a PIL image re-encodes it on every script run, and the
+page had to import PIL and decode the full-size PNG each time just to show
+it 500 px wide. resized_png() does that work once: the image is scaled to
+the display width, encoded as an optimized PNG and kept both in memory (per
+process) and under the cache directory (across restarts), keyed by the
+source file's mtime and size so an edited asset is picked up. Later runs
+hand Streamlit the ready-made bytes without importing PIL at all.
+
+The on-disk copies live in CO2_CACHE_DIR/images and follow the same
+CO2_DATA_CACHE switch as the dataset cache.
+"""
+
+import hashlib
+import io
+import os
+import threading
+
+import instrumentation
+from dataset_cache import cache_dir, cache_enabled
+
+_resized: dict[tuple, bytes] = {}
+_lock = threading.Lock()
+
+
+def _disk_path(key: tuple) -> str:
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(key[0]))[0]
+    return os.path.join(cache_dir(), "images", f"{stem}-{key[3]}w-{digest}.png")
+
+
+def _render(path: str, width: int) -> bytes:
+    """Scale an image down to `width` pixels (never up) and encode it as PNG."""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def resized_png(path: str, width: int) -> bytes:
+    """Return the image at `path` as PNG bytes at most `width` pixels wide.
+
+    Args:
+        path (str): Source image (any format PIL reads).
+        width (int): Display width in pixels.
+
+    Returns:
+        bytes: The encoded PNG, ready for st.image().
+
+    Raises:
+        OSError: The source image is missing or unreadable.
+        ImportError: Nothing is cached yet and Pillow is not installed.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, int(width))
+    data = _resized.get(key)
+    if data is not None:
+        instrumentation.cache_hit("image")
+        return data
+    instrumentation.cache_miss("image")
+
+    with _lock:
+        data = _resized.get(key)
+        if data is not None:
+            return data
+        disk = _disk_path(key) if cache_enabled() else None
+        if disk is not None:
+            try:
+                with open(disk, "rb") as fh:
+                    data = fh.read()
+            except OSError:
+                data = None
+        if data is None:
+            with instrumentation.span("image.resize"):
+                data = _render(path, int(width))
+            if disk is not None:
+                try:
+                    os.makedirs(os.path.dirname(disk), exist_ok=True)
+                    with open(disk + ".tmp", "wb") as fh:
+                        fh.write(data)
+                    os.replace(disk + ".tmp", disk)
+                except OSError:
+                    pass   # read-only deployments keep the in-memory copy only
+        # Drop copies of older versions of the same file at this width
+        for old in [k for k in _resized if k[0] == key[0] and k[3] == key[3]]:
+            del _resized[old]
+        _resized[key] = data
+    return data
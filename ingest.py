@@ -0,0 +1,222 @@
+"""
+Streaming, chunked ingestion of source tables into the columnar cache.
+
+Sources are read a chunk of rows at a time and appended to a
+dataset_cache.StoreWriter, so peak memory depends on the chunk size rather
+than the size of the input:
+
+    .xlsx / .xlsm   one worksheet, read row by row with openpyxl in read-only mode
+    .csv            pandas.read_csv in chunks
+    .parquet        pyarrow record batches (optional dependency)
+
+Every chunk is validated and coerced before it is written: float columns
+become float32 when every value survives the round trip exactly, integer
+columns stay integer, and text columns (State included) are stored as
+categoricals. A column that held numbers in earlier chunks must keep doing
+so; the first value that does not parse raises ValueError with its row.
+
+Once ingested, the table is served by dataset_cache.load_sheet(path, sheet)
+like any cached workbook sheet.
+
+Command line:
+    python ingest.py "assets/All main data (1998 to 2023).xlsx"
+    python ingest.py data/county_monthly.csv --chunk-rows 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import SHEET_NAME, StoreWriter, store_path
+from schema import downcast_float
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+# Columns always stored as categoricals, even if their values look numeric
+_TEXT_COLUMNS = {"State"}
+
+
+# ────────────────────────────────────────────────────────
+# Chunked readers
+# ────────────────────────────────────────────────────────
+def iter_chunks(
+    path,
+    sheet: str = SHEET_NAME,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    fmt: Optional[str] = None,
+    dtype: Optional[dict] = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield a source table as DataFrames of at most `chunk_rows` rows.
+
+    Args:
+        path (str | file): An .xlsx/.xlsm workbook, a .csv file or a .parquet
+            file, either as a path or as an open binary file (e.g. an upload).
+        sheet (str): Worksheet to read (workbooks only).
+        chunk_rows (int): Rows per chunk.
+        fmt (str): Format ("csv", "parquet", "xlsx") when it cannot be
+            told from the file name.
+        dtype (dict): {column: dtype} for CSV sources, so a column keeps
+            one type across chunks (passed to pandas.read_csv).
+    """
+    name = path if isinstance(path, str) else getattr(path, "name", "")
+    ext = ("." + fmt.lstrip(".") if fmt else os.path.splitext(name)[1]).lower()
+    if ext in (".xlsx", ".xlsm"):
+        return _iter_excel(path, sheet, chunk_rows)
+    if ext == ".csv":
+        return iter(pd.read_csv(path, chunksize=chunk_rows, dtype=dtype))
+    if ext == ".parquet":
+        return _iter_parquet(path, chunk_rows)
+    raise ValueError(f"Unsupported source {name or path!r}; use .xlsx, .csv or .parquet.")
+
+
+def _column_names(header: tuple) -> list[str]:
+    """Name columns the way pandas.read_excel does (Unnamed: i, x.1 for repeats)."""
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _iter_excel(path: str, sheet: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet not in workbook.sheetnames:
+            raise ValueError(f"Worksheet {sheet!r} not found in {path!r}.")
+        rows = workbook[sheet].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        while header and header[-1] is None:
+            header.pop()
+        names = _column_names(header)
+        width = len(names)
+
+        buffer = []
+        for row in rows:
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            if all(v is None for v in row):
+                continue
+            buffer.append(row)
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame.from_records(buffer, columns=names)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame.from_records(buffer, columns=names)
+    finally:
+        workbook.close()
+
+
+def _iter_parquet(path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet sources needs pyarrow (pip install pyarrow).") from None
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+
+# ────────────────────────────────────────────────────────
+# Validation and dtype coercion
+# ────────────────────────────────────────────────────────
+def _coerce_column(name: str, series: pd.Series, kind: Optional[str], offset: int):
+    """Coerce one chunk column to a numeric array or a categorical."""
+    if kind != "numeric" and (name in _TEXT_COLUMNS or kind == "category"):
+        return pd.Categorical(series.astype(str).where(series.notna()))
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    if series.dtype.kind in "biu" and not series.hasnans:
+        return series.to_numpy()
+    if series.dtype.kind == "f":
+        return downcast_float(series.to_numpy(dtype=np.float64, na_value=np.nan))
+
+    numbers = pd.to_numeric(series, errors="coerce")
+    bad = numbers.isna() & series.notna()
+    if not bad.any():
+        return downcast_float(numbers.to_numpy(dtype=np.float64, na_value=np.nan))
+    if kind == "numeric":
+        pos = int(np.argmax(bad.to_numpy()))
+        raise ValueError(f"Column {name!r}, row {offset + pos + 1}: expected a number, got {series.iloc[pos]!r}.")
+
+    values = series[series.notna()]
+    not_text = ~values.map(lambda v: isinstance(v, str)).astype(bool)
+    if not_text.any():
+        raise TypeError(f"Column {name!r} mixes text with {type(values[not_text].iloc[0]).__name__} values.")
+    return pd.Categorical(series.where(series.notna()))
+
+
+def coerce_chunk(chunk: pd.DataFrame, kinds: Optional[dict] = None, offset: int = 0) -> pd.DataFrame:
+    """Validate one chunk and narrow its dtypes for the columnar store.
+
+    Args:
+        chunk (pd.DataFrame): Rows as read from the source.
+        kinds (dict): {column: "numeric" | "category"} established by earlier
+            chunks (StoreWriter.kinds()); unseen columns are inferred.
+        offset (int): Rows ingested before this chunk, for error messages.
+
+    Returns:
+        pd.DataFrame: The chunk with float32/float64/int and categorical columns.
+
+    Raises:
+        ValueError: A numeric column holds a value that is not a number.
+        TypeError: A column mixes text with other non-numeric values.
+    """
+    kinds = kinds or {}
+    return pd.DataFrame({
+        str(name): _coerce_column(str(name), chunk[name], kinds.get(str(name)), offset)
+        for name in chunk.columns
+    })
+
+
+# ────────────────────────────────────────────────────────
+# Ingestion
+# ────────────────────────────────────────────────────────
+def ingest(path: str, sheet: str = SHEET_NAME, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> dict:
+    """Stream a source table into the columnar cache.
+
+    Args:
+        path (str): Workbook, CSV or Parquet file.
+        sheet (str): Worksheet for workbooks; for other sources it only names
+            the store (see dataset_cache.store_path).
+        chunk_rows (int): Rows held in memory at a time.
+
+    Returns:
+        dict: The manifest of the written store (rows, columns, dtypes, source).
+    """
+    with StoreWriter(path, sheet) as writer:
+        for chunk in iter_chunks(path, sheet, chunk_rows):
+            writer.append(coerce_chunk(chunk, writer.kinds(), offset=writer.n_rows))
+        return writer.commit()
+
+
+# ────────────────────────────────────────────────────────
+# Command line
+# ────────────────────────────────────────────────────────
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Stream a source table into the columnar cache.")
+    parser.add_argument("source")
+    parser.add_argument("--sheet", default=SHEET_NAME)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    manifest = ingest(args.source, args.sheet, args.chunk_rows)
+    elapsed = time.perf_counter() - start
+    print(f"Ingested {manifest['n_rows']} rows × {len(manifest['columns'])} columns "
+          f"into {store_path(args.source, args.sheet)} in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""
+Lightweight instrumentation for the services and pages.
+
+Collects timing spans, call counters, cache hit/miss counts and gauges
+(e.g. the dataset's memory footprint) in process-wide registries, and
+exports them as a snapshot dict, a Prometheus text dump or one JSON log
+line per finished span. Spans nest: each log line names its parent, so a
+slow page render can be traced to Excel parsing, model fitting or chart
+rendering.
+
+Collection is off by default and every hook is then a cheap no-op.
+
+Switches:
+    CO2_INSTRUMENTATION      "1"/"on"/"true"/"yes" enables collection (default: off).
+    CO2_INSTRUMENTATION_LOG  Also append a JSON line per finished span to this
+                             file ("-" for stderr).
+
+Usage:
+    with instrumentation.span("models.fit"):
+        ...
+
+    @instrumentation.timed("case.series")
+    def get_state_co2_series(state_code): ...
+
+    instrumentation.cache_hit("models")
+    print(instrumentation.render_prometheus())
+"""
+
+import bisect
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+_ENABLED_VALUES = {"1", "on", "true", "yes"}
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        self.n = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.n += 1
+
+    def render(self, name: str, labels: str = "") -> list[str]:
+        sep = "," if labels else ""
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.total}")
+        lines.append(f"{name}_count{suffix} {self.n}")
+        return lines
+
+
+# ────────────────────────────────────────────────────────
+# Switches
+# ────────────────────────────────────────────────────────
+def _env_enabled() -> bool:
+    return os.environ.get("CO2_INSTRUMENTATION", "off").strip().lower() in _ENABLED_VALUES
+
+
+_lock = threading.Lock()
+_enabled = _env_enabled()
+_spans: dict[str, Histogram] = {}
+_counters: dict[str, int] = {}
+_caches: dict[str, list[int]] = {}
+_gauges: dict[str, Callable[[], float]] = {}
+_log = None
+_current = contextvars.ContextVar("co2_span", default=None)
+
+
+def enabled() -> bool:
+    """Return True if metrics are being collected."""
+    return _enabled
+
+
+def set_enabled(flag: bool) -> None:
+    """Switch collection on or off for this process (overrides CO2_INSTRUMENTATION)."""
+    global _enabled
+    _enabled = bool(flag)
+
+
+def set_log(target: Optional[str]) -> None:
+    """Send span log lines to a file path, "-" for stderr, or None to stop."""
+    global _log
+    with _lock:
+        if _log not in (None, sys.stderr):
+            _log.close()
+        if not target:
+            _log = None
+        elif target == "-":
+            _log = sys.stderr
+        else:
+            _log = open(target, "a", encoding="utf-8")
+
+
+# ────────────────────────────────────────────────────────
+# Spans
+# ────────────────────────────────────────────────────────
+class _Span:
+    """Times a block; usable as a context manager or via start()/stop()."""
+
+    __slots__ = ("name", "parent", "_start", "_token")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.parent = _current.get()
+        self._token = _current.set(self.name)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self._start
+        _current.reset(self._token)
+        _record(self.name, elapsed, self.parent, _is_error(exc_type))
+
+    def stop(self) -> None:
+        self.__exit__(None, None, None)
+
+
+def _is_error(exc_type) -> bool:
+    """True unless the block finished normally or was interrupted by Streamlit itself.
+
+    A widget or st.rerun()/st.stop() ends a script run by raising a
+    ScriptControlException subclass; that is control flow, not a failure.
+    Matched by name so this module never imports Streamlit.
+    """
+    if exc_type is None:
+        return False
+    return not any(
+        cls.__name__ == "ScriptControlException" and cls.__module__.startswith("streamlit.")
+        for cls in exc_type.__mro__
+    )
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    """Return a context manager timing the enclosed block as `name`."""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def start_span(name: str):
+    """Start timing `name` now; call .stop() on the result to finish.
+
+    Handy for page scripts, where wrapping the whole script in a with block
+    would indent every line. A run that raises before .stop() (a failure,
+    or a rerun/stop interrupting the script) records no span.
+    """
+    return _Span(name).__enter__() if _enabled else _NULL_SPAN
+
+
+def timed(name: str):
+    """Decorate a function so every call is recorded as span `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _record(name: str, seconds: float, parent: Optional[str], error: bool) -> None:
+    with _lock:
+        hist = _spans.get(name)
+        if hist is None:
+            hist = _spans[name] = Histogram()
+        hist.observe(seconds)
+        if error:
+            _counters[f"{name}.errors"] = _counters.get(f"{name}.errors", 0) + 1
+        if _log is not None:
+            line = {"ts": time.time(), "span": name, "parent": parent, "seconds": round(seconds, 6), "error": error}
+            _log.write(json.dumps(line) + "\n")
+            _log.flush()
+
+
+# ────────────────────────────────────────────────────────
+# Counters, caches and gauges
+# ────────────────────────────────────────────────────────
+def count(name: str, n: int = 1) -> None:
+    """Add n to counter `name`."""
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def cache_hit(cache: str) -> None:
+    """Record a hit in the named cache."""
+    if _enabled:
+        with _lock:
+            _caches.setdefault(cache, [0, 0])[0] += 1
+
+
+def cache_miss(cache: str) -> None:
+    """Record a miss in the named cache."""
+    if _enabled:
+        with _lock:
+            _caches.setdefault(cache, [0, 0])[1] += 1
+
+
+def register_gauge(name: str, fn: Callable[[], float]) -> None:
+    """Register a callable sampled whenever metrics are exported."""
+    _gauges[name] = fn
+
+
+# ────────────────────────────────────────────────────────
+# Export
+# ────────────────────────────────────────────────────────
+def snapshot() -> dict:
+    """Return every metric as plain Python values.
+
+    Returns:
+        {
+          "enabled": bool,
+          "spans":    {name: {"count", "total_s", "mean_s", "max_s"}},
+          "counters": {name: int},
+          "caches":   {name: {"hits", "misses", "hit_ratio"}},
+          "gauges":   {name: float},
+        }
+    """
+    with _lock:
+        spans = {
+            name: {"count": h.n, "total_s": h.total, "mean_s": h.total / h.n if h.n else 0.0, "max_s": h.max}
+            for name, h in sorted(_spans.items())
+        }
+        counters = dict(sorted(_counters.items()))
+        caches = {
+            name: {"hits": hits, "misses": misses, "hit_ratio": hits / (hits + misses) if hits + misses else 0.0}
+            for name, (hits, misses) in sorted(_caches.items())
+        }
+    gauges = {}
+    for name, fn in sorted(_gauges.items()):
+        try:
+            gauges[name] = float(fn())
+        except Exception:
+            gauges[name] = float("nan")
+    return {"enabled": _enabled, "spans": spans, "counters": counters, "caches": caches, "gauges": gauges}
+
+
+def _metric_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def render_prometheus(prefix: str = "co2") -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    with _lock:
+        spans = [(name, hist) for name, hist in sorted(_spans.items())]
+        lines = [f"# TYPE {prefix}_span_seconds histogram"]
+        for name, hist in spans:
+            lines += hist.render(f"{prefix}_span_seconds", f'span="{name}"')
+        lines.append(f"# TYPE {prefix}_calls_total counter")
+        for name, value in sorted(_counters.items()):
+            lines.append(f'{prefix}_calls_total{{name="{name}"}} {value}')
+        lines.append(f"# TYPE {prefix}_cache_requests_total counter")
+        for name, (hits, misses) in sorted(_caches.items()):
+            lines.append(f'{prefix}_cache_requests_total{{cache="{name}",result="hit"}} {hits}')
+            lines.append(f'{prefix}_cache_requests_total{{cache="{name}",result="miss"}} {misses}')
+    for name, value in snapshot()["gauges"].items():
+        metric = f"{prefix}_{_metric_name(name)}"
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """Clear all collected spans, counters and cache statistics."""
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _caches.clear()
+
+
+set_log(os.environ.get("CO2_INSTRUMENTATION_LOG"))
@@ -0,0 +1,58 @@
+"""
+Deferred imports for the heavy libraries the services depend on.
+
+    pd = lazy_import.module("pandas")
+
+binds a stand-in that imports pandas on its first attribute access, so a
+module can keep writing pd.DataFrame(...) in its function bodies while
+importing the module itself stays cheap: pages that never touch the data
+(Home, HASS Reflection) and a scoring server warm-started from a model
+artifact never pay for pandas. Annotations that name a deferred module must
+be quoted ("pd.DataFrame"), or they would trigger the import when the
+function is defined.
+"""
+
+import importlib
+import sys
+import types
+from typing import Optional
+
+
+class _LazyModule(types.ModuleType):
+    """Placeholder that turns into the real module on first use."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_target"] = name
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self.__dict__["_lazy_target"])
+        # Copy the namespace over so later lookups skip __getattr__ entirely
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_target"] in sys.modules else "not loaded"
+        return f"<lazy module {self.__dict__['_lazy_target']!r} ({state})>"
+
+
+def module(name: str) -> types.ModuleType:
+    """Return `name` if it is already imported, else a lazy stand-in for it.
+
+    Args:
+        name (str): Absolute module name, e.g. "pandas".
+
+    Returns:
+        module: The real module, or a placeholder importing it on first
+                attribute access.
+    """
+    return sys.modules.get(name) or _LazyModule(name)
+
+
+def loaded(name: str) -> Optional[types.ModuleType]:
+    """Return module `name` if something has imported it already, else None.
+
+    Useful for type checks that must not import the library themselves, e.g.
+    "is X a DataFrame?" is trivially False while pandas is not loaded.
+    """
+    return sys.modules.get(name)
@@ -0,0 +1,192 @@
+"""
+Versioned on-disk store for fitted state models.
+
+Each artifact is a small ``.npz`` archive holding the coefficient matrix and
+fit statistics for every state plus a JSON metadata record. Its file name is
+a key derived from the SHA-256 of the dataset file (the workbook, or the
+panel published by panel_refresh), the feature list and the fit options, so
+a changed dataset or model specification never picks up a stale artifact.
+Loading an artifact needs NumPy only: no DataFrame is built and the dataset
+file is only hashed, never parsed.
+
+Switches:
+    CO2_MODEL_DIR   Directory holding artifacts (default: ".cache/models").
+
+Command line (e.g. during deploy):
+    python model_store.py build    # fit all states and write the artifact
+    python model_store.py list     # show stored artifacts
+    python model_store.py clear    # delete all artifacts
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+import dataset_registry
+from dataset_cache import file_sha256
+from ols_engine import OLSFit
+
+# Bump whenever the archive layout changes so old artifacts are ignored
+ARTIFACT_FORMAT = 1
+
+_FIT_ARRAYS = ["coef", "stderr", "xtx_inv", "sigma2", "r2", "adj_r2", "n_obs", "rank"]
+
+# Stored only when the fit has them: penalties of ridge/lasso fits (see
+# regularized), the relative column scales and design condition numbers
+_OPTIONAL_ARRAYS = ["penalty", "x_scale", "cond"]
+
+
+@dataclass(frozen=True)
+class ModelArtifact:
+    """A fitted set of state models as stored on disk."""
+
+    key: str
+    states: list[str]
+    features: list[str]
+    fit: OLSFit
+    metadata: dict
+
+
+def model_dir() -> str:
+    """Return the directory that holds model artifacts."""
+    return os.environ.get("CO2_MODEL_DIR", os.path.join(".cache", "models"))
+
+
+def artifact_key(dataset_sha256: str, features: list[str], options: dict) -> str:
+    """Derive the artifact key from everything that determines the fit."""
+    spec = {
+        "format": ARTIFACT_FORMAT,
+        "dataset_sha256": dataset_sha256,
+        "features": list(features),
+        "options": options,
+    }
+    blob = json.dumps(spec, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def artifact_path(key: str) -> str:
+    """Return the file path of the artifact with the given key."""
+    return os.path.join(model_dir(), f"models-{key}.npz")
+
+
+def dataset_fingerprint(path: str = None) -> str:
+    """Return the SHA-256 of the data the models are fitted on.
+
+    Defaults to dataset_registry.source(): the workbook, or the published
+    panel once panel_refresh has swapped one in.
+    """
+    if path is None:
+        path = dataset_registry.source()
+    return file_sha256(path)
+
+
+def save(
+    states: list[str],
+    features: list[str],
+    options: dict,
+    dataset_sha256: str,
+    fit: OLSFit,
+) -> ModelArtifact:
+    """Write a fitted set of models to its keyed artifact file.
+
+    Args:
+        states (list[str]): State codes; row i of every fit array is states[i].
+        features (list[str]): Feature names in coefficient column order.
+        options (dict): JSON-serialisable fit options (part of the key).
+        dataset_sha256 (str): Fingerprint of the training data (part of the key).
+        fit (OLSFit): The batched fit to persist.
+
+    Returns:
+        ModelArtifact: The stored artifact.
+    """
+    key = artifact_key(dataset_sha256, features, options)
+    metadata = {
+        "format": ARTIFACT_FORMAT,
+        "key": key,
+        "dataset_sha256": dataset_sha256,
+        "features": list(features),
+        "options": options,
+        "states": list(states),
+    }
+
+    os.makedirs(model_dir(), exist_ok=True)
+    path = artifact_path(key)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as fh:
+        np.savez(
+            fh,
+            metadata=np.array(json.dumps(metadata)),
+            **{name: getattr(fit, name) for name in _FIT_ARRAYS},
+            **{name: getattr(fit, name) for name in _OPTIONAL_ARRAYS if getattr(fit, name) is not None},
+        )
+    # Readers in other workers see either no artifact or a complete one
+    os.replace(tmp, path)
+    return ModelArtifact(key, list(states), list(features), fit, metadata)
+
+
+def load(key: str) -> Optional[ModelArtifact]:
+    """Load the artifact with the given key, or None if it is missing or unreadable."""
+    try:
+        with np.load(artifact_path(key), allow_pickle=False) as archive:
+            metadata = json.loads(str(archive["metadata"]))
+            arrays = {name: archive[name] for name in _FIT_ARRAYS}
+            arrays.update({name: archive[name] for name in _OPTIONAL_ARRAYS if name in archive.files})
+    except (OSError, KeyError, ValueError):
+        return None
+    if metadata.get("format") != ARTIFACT_FORMAT:
+        return None
+    return ModelArtifact(key, metadata["states"], metadata["features"], OLSFit(**arrays), metadata)
+
+
+def list_artifacts() -> list[dict]:
+    """Return the metadata of every readable artifact in the store."""
+    found = []
+    if not os.path.isdir(model_dir()):
+        return found
+    for name in sorted(os.listdir(model_dir())):
+        if name.startswith("models-") and name.endswith(".npz"):
+            artifact = load(name[len("models-"):-len(".npz")])
+            if artifact is not None:
+                found.append(artifact.metadata)
+    return found
+
+
+def clear() -> None:
+    """Delete every artifact in the store."""
+    for meta in list_artifacts():
+        os.remove(artifact_path(meta["key"]))
+
+
+# ────────────────────────────────────────────────────────
+# Command line
+# ────────────────────────────────────────────────────────
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage fitted model artifacts.")
+    parser.add_argument("command", choices=["build", "list", "clear"])
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        import data_service
+
+        artifact = data_service.build_model_artifact()
+        print(f"Wrote {artifact_path(artifact.key)} ({len(artifact.states)} states)")
+    elif args.command == "list":
+        for meta in list_artifacts():
+            print(
+                f"{meta['key']}  dataset {meta['dataset_sha256'][:12]}  "
+                f"{len(meta['states'])} states  options {meta['options']}"
+            )
+    else:
+        clear()
+        print(f"Cleared {model_dir()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,71 +1,188 @@
+import math
+
 import streamlit as st
-from case_service import get_state_co2_series, load_merged_data
+
+import instrumentation
+from case_service import CHART_COLUMN, STATE_NAMES, get_presentation, get_states_data
 
 # ─── Page configuration ────────────────────────────────────────────────────────
 # Set the browser tab title and choose a wide layout so charts span the width.
 st.set_page_config(page_title="Case Studies", layout="wide")
+page_timer = instrumentation.start_span("page.case_studies")
+
+# Chart frames, summary statistics and national ranks of every state,
+# built once per dataset version
+presentation = get_presentation()
+ranking = presentation.ranking
+n_states = len(presentation.summary)
+
+# The case studies are the top three CO₂ per-capita emitters of the latest
+# year with CO₂ data (the drivers may already cover a later year)
+latest_year = ranking.latest_year()
+case_studies = ranking.top_k(latest_year, 3)
+case_names = [STATE_NAMES.get(code, code) for code in case_studies]
+
+# Driver narratives for states the course studied in depth
+NARRATIVES = {
+    "WY": """
+        This high intensity stems from its enormous coal reserves and coal-fired power
+        plants—among the largest generators of coal electricity in the U.S.—coupled with a
+        small population base. In 2023, over **80%** of its in-state electricity came from
+        coal combustion, yielding one of the largest per-person emissions footprints in the
+        country.
+        """,
+    "ND": """
+        Its emissions are driven primarily by its booming oil and natural gas sector.
+        Hydraulic fracturing and associated gas flaring in the Bakken region release
+        substantial CO₂, while its low population dilutes total state emissions across
+        fewer residents.
+        """,
+    "AK": """
+        This reflects high energy needs for heating in an Arctic climate and the energy
+        intensity of transporting oil and gas off-shore. Despite growing renewable
+        installations, per-capita use of diesel and natural gas for electricity and heating
+        remains elevated in rural and urban communities alike.
+        """,
+}
+
+# Ranked metric → label, in the order of the prediction inputs
+METRIC_LABELS = {
+    "co2 per capita": "CO₂ per capita",
+    "renewable energy": "Renewable energy",
+    "Coal Electricity Consumption": "Coal electricity",
+    "Natural Gas Electricity Consumption": "Natural gas electricity",
+    "PCE per capita": "PCE per capita",
+    "Estimated Urban Population": "Urban population",
+}
+
+
+def ordinal(n: int) -> str:
+    """Format 1 → "1st", 2 → "2nd", 11 → "11th"."""
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
 
 # ─── Page header ───────────────────────────────────────────────────────────────
-st.title("Case Studies: WY, ND & AK")
+st.title(f"Case Studies: {', '.join(case_studies[:-1])} & {case_studies[-1]}")
 st.markdown(
-    """
+    f"""
     We pivoted to a targeted case-study approach by selecting the top three CO₂ per-capita
-    emitters (Wyoming, North Dakota, Alaska)—to yield state-specific insights within
-    our course scope.
+    emitters of {latest_year} ({', '.join(case_names)})—to yield state-specific insights
+    within our course scope.
     """
 )
 
-# ─── Loop over the three states and render each section ────────────────────────
-for code, name in [("WY", "Wyoming"), ("ND", "North Dakota"), ("AK", "Alaska")]:
+# Vega-Lite encodings shared by the charts (plain specs skip Altair's per-run validation)
+YEAR_AXIS = {"field": "Year", "type": "quantitative", "axis": {"format": "d"}}
+CO2_AXIS = {"field": CHART_COLUMN, "type": "quantitative", "title": "CO₂ per capita (t)"}
+
+
+def state_metrics(code: str) -> None:
+    """Show a state's latest value, national rank, peak and growth rate."""
+    stats = presentation.summary.loc[code]
+    first, last, peak = int(stats["first_year"]), int(stats["last_year"]), int(stats["max_year"])
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric(f"CO₂ per capita ({last})", f"{stats['latest']:.1f} t")
+    col2.metric("National rank", f"{int(stats['rank'])} of {n_states}")
+    col3.metric(f"Peak ({peak})", f"{stats['max']:.1f} t")
+    col4.metric(
+        f"Growth per year {first}–{last}",
+        "n/a" if math.isnan(stats["cagr"]) else f"{stats['cagr']:+.2%}",
+        help="Compound annual growth rate between the first and latest year",
+    )
+
+
+def driver_ranks(code: str) -> str:
+    """Describe where a state ranks nationally on each driver in the latest year."""
+    parts = [
+        f"{METRIC_LABELS.get(metric, metric)} {ordinal(ranking.rank(code, latest_year, metric))}"
+        for metric in ranking.metrics[1:]
+        if ranking.rank(code, latest_year, metric)
+    ]
+    return f"National driver ranks in {latest_year}: " + " · ".join(parts)
+
+
+# ─── One section per case-study state ──────────────────────────────────────────
+for code, name in zip(case_studies, case_names):
     # Sub‐section header for the state
     st.subheader(f"{name} ({code})")
-    
-    # Fetch time series and rename the emission column for clarity
-    df_series = get_state_co2_series(code).rename(columns={"co2 per capita": "CO₂"})
-    # Plot the historical CO₂ per capita as a line chart
-    st.line_chart(df_series.set_index("Year"))
-    
-    # Add narrative text that explains the drivers behind each state’s ranking
-    if code == "WY":
-        st.markdown(
-            """
-            **Wyoming** ranks **1st** in CO₂ per capita nationwide. This high intensity stems
-            from its enormous coal reserves and coal-fired power plants—among the largest
-            generators of coal electricity in the U.S.—coupled with a small population base.
-            In 2023, over **80%** of its in-state electricity came from coal combustion,
-            yielding one of the largest per-person emissions footprints in the country.
-            """
+
+    # Plot the precomputed CO₂ per capita series
+    with instrumentation.span("page.case_studies.chart"):
+        state_metrics(code)
+        st.vega_lite_chart(
+            presentation.chart(code),
+            {"mark": "line", "encoding": {"x": YEAR_AXIS, "y": CO2_AXIS, "tooltip": [YEAR_AXIS, CO2_AXIS]}},
+            width="stretch",
         )
-    elif code == "ND":
-        st.markdown(
-            """
-            **North Dakota** places **2nd**, driven primarily by its booming oil and natural
-            gas sector. Hydraulic fracturing and associated gas flaring in the Bakken region
-            release substantial CO₂, while its low population dilutes total state emissions
-            across fewer residents.
-            """
+
+    # Narrative text that explains the drivers behind the state's ranking
+    st.markdown(
+        f"**{name}** ranks **{ordinal(ranking.rank(code, latest_year))}** in CO₂ per capita "
+        f"nationwide. {' '.join(NARRATIVES.get(code, driver_ranks(code)).split())}"
+    )
+    if code in NARRATIVES:
+        st.caption(driver_ranks(code))
+
+# ─── National rankings ─────────────────────────────────────────────────────────
+st.subheader("National rankings")
+col1, col2 = st.columns(2)
+ranked_metric = col1.selectbox(
+    "Rank states by",
+    list(ranking.metrics),
+    format_func=lambda metric: METRIC_LABELS.get(metric, metric),
+)
+ranked_year = col2.select_slider("Year", options=ranking.years.tolist(), value=latest_year)
+with instrumentation.span("page.case_studies.ranking"):
+    table = ranking.year_table(ranked_year, ranked_metric).head(10)
+    since = ranking.rank_changes(int(ranking.years[0]), ranked_year, ranked_metric)["change"]
+    table[f"change since {ranking.years[0]}"] = since.reindex(table.index)
+    st.dataframe(
+        table.rename(index=STATE_NAMES),
+        column_config={
+            "change": st.column_config.NumberColumn("change since last year", format="%+d"),
+            f"change since {ranking.years[0]}": st.column_config.NumberColumn(format="%+d"),
+        },
+    )
+
+# ─── Compare any states ────────────────────────────────────────────────────────
+st.subheader("Compare states")
+compared = st.multiselect(
+    "States to compare",
+    list(presentation.charts),
+    default=case_studies,
+    format_func=lambda code: STATE_NAMES.get(code, code),
+)
+if compared:
+    with instrumentation.span("page.case_studies.compare"):
+        comparison = presentation.comparison(compared)
+        names = list(comparison.columns[1:])
+        st.vega_lite_chart(
+            comparison,
+            {
+                "transform": [{"fold": names, "as": ["State", CHART_COLUMN]}],
+                "mark": "line",
+                "encoding": {
+                    "x": YEAR_AXIS,
+                    "y": CO2_AXIS,
+                    "color": {"field": "State", "type": "nominal", "sort": names},
+                    "tooltip": [{"field": "State", "type": "nominal"}, YEAR_AXIS, CO2_AXIS],
+                },
+            },
+            width="stretch",
         )
-    else:  # AK
-        st.markdown(
-            """
-            **Alaska** is **3rd**, reflecting high energy needs for heating in an Arctic climate
-            and the energy intensity of transporting oil and gas off-shore. Despite growing
-            renewable installations, per-capita use of diesel and natural gas for electricity
-            and heating remains elevated in rural and urban communities alike.
-            """
+        st.dataframe(
+            presentation.summary.loc[compared].rename(index=STATE_NAMES),
+            column_config={"cagr": st.column_config.NumberColumn("cagr", format="percent")},
         )
 
 # ─── Optional raw data preview ─────────────────────────────────────────────────
 # Give users the option to inspect the underlying numbers
-if st.checkbox("Show raw data preview for WY, ND & AK"):
-    df = load_merged_data()  # load full dataset
-    df_subset = df[df["State"].isin(["WY", "ND", "AK"])]
-    df_display = (
-        df_subset[["State", "Year", "co2 per capita"]]
-        .sort_values(["State", "Year"])
-        .reset_index(drop=True)
-    )
-    st.dataframe(df_display)  # interactive table
+if st.checkbox(f"Show raw data preview for {', '.join(case_studies[:-1])} & {case_studies[-1]}"):
+    # Per-state slices of the pre-sorted dataset, no full-frame filter or sort
+    df_display = get_states_data(sorted(case_studies), ["State", "Year", "co2 per capita"])
+    with instrumentation.span("page.case_studies.table"):
+        st.dataframe(df_display)  # interactive table
 
 # ─── Data sources ─────────────────────────────────────────────────────────────
 st.markdown(
@@ -76,3 +193,5 @@ st.markdown(
     3. National Oceanic and Atmospheric Administration (NOAA). Arctic Climatology, 2023. 
     """
 )
+
+page_timer.stop()
@@ -2,13 +2,100 @@
 Prediction page for CO₂ emissions per capita using state‐specific linear models.
 """
 
+import io
+
 import streamlit as st
 import pandas as pd
 
-from data_service import predict_co2
+import bulk_scoring
+import instrumentation
+import scenario_sweep
+from schema import FEATURES, SchemaError
+from case_service import STATE_NAMES, get_states_data
+from data_service import explain_co2_batch, model_version
+from prediction_cache import PredictionCache
 
 # Configure the page BEFORE any other Streamlit calls
 st.set_page_config(page_title="Prediction", layout="wide")
+page_timer = instrumentation.start_span("page.prediction")
+
+# ─────────────────────────────────────────────────────────────────
+# Cached resources (shared by every session of this server process)
+# ─────────────────────────────────────────────────────────────────
+@st.cache_resource
+def get_prediction_cache() -> PredictionCache:
+    """One bounded LRU/TTL prediction cache for all sessions."""
+    return PredictionCache(maxsize=4096, ttl=3600.0)
+
+
+@st.cache_data
+def input_table(state, renewable, coal, gas, pce, urban) -> pd.DataFrame:
+    """Build the input summary table once per distinct set of inputs."""
+    return pd.DataFrame({
+        "State": [state],
+        "Renewable Energy (Billion Btu/yr)": [renewable],
+        "Coal Electricity Consumption (short tons/yr)": [coal],
+        "Natural Gas Consumption (thousand cu ft/yr)": [gas],
+        "PCE per Capita (USD)": [pce],
+        "Estimated Urban Population (people)": [urban]
+    })
+
+
+@st.cache_data(max_entries=32)
+def sweep_chart_data(state, base, ranges, level, version) -> tuple[pd.DataFrame, int, float]:
+    """Score a sweep grid once per distinct request and thin it for charting.
+
+    `version` is part of the cache key only: callers pass the current
+    `model_version()`, so grids scored before a refit or a panel swap are
+    never served afterwards. Returns (frame, points scored, seconds).
+    """
+    axes = [scenario_sweep.axis(feature, low, high, steps) for feature, low, high, steps in ranges]
+    result = scenario_sweep.sweep(state, list(base), axes, level=level if len(axes) == 1 else None)
+    return result.to_frame(max_points=_CHART_POINTS[len(axes)]), result.points, result.seconds
+
+
+@st.cache_data(max_entries=64)
+def latest_drivers(state, version) -> tuple[int, list[float]]:
+    """Return the state's most recent complete year and its drivers (in FEATURES order).
+
+    `version` (the model version) is part of the cache key only, so a
+    refreshed dataset is picked up.
+    """
+    rows = get_states_data([state], ["Year"] + list(FEATURES)).dropna()
+    last = rows.iloc[-1]
+    return int(last["Year"]), [float(last[feature]) for feature in FEATURES]
+
+
+# Short driver names for the contribution chart, in FEATURES order
+DRIVER_LABELS = ["Renewables", "Coal electricity", "Gas electricity", "PCE per capita", "Urban population"]
+_WATERFALL_COLORS = {"reference": "#9e9e9e", "raises": "#d62728", "lowers": "#2ca02c", "scenario": "#1f77b4"}
+
+
+def waterfall_frame(reference_label, baseline, contributions, estimate) -> pd.DataFrame:
+    """Lay out bar start/end values: reference, one step per driver, then the scenario."""
+    steps = [(reference_label, 0.0, baseline, "reference")]
+    running = baseline
+    for label, change in zip(DRIVER_LABELS, contributions):
+        steps.append((label, running, running + change, "raises" if change >= 0 else "lowers"))
+        running += change
+    steps.append(("Scenario", 0.0, estimate, "scenario"))
+    frame = pd.DataFrame(steps, columns=["step", "start", "end", "effect"])
+    frame["change"] = frame["end"] - frame["start"]
+    # Total bars start just below the lowest running total, so the driver steps stay visible
+    levels = frame.loc[frame["effect"].isin(["raises", "lowers"]), ["start", "end"]].to_numpy()
+    span = max(float(levels.max() - levels.min()), 1e-9) if levels.size else 1.0
+    floor = min(float(levels.min()) if levels.size else baseline, baseline, estimate) - 0.5 * span
+    totals = frame["effect"].isin(["reference", "scenario"])
+    frame.loc[totals, "start"] = floor
+    frame.loc[totals, "change"] = frame.loc[totals, "end"]
+    return frame
+
+
+# Points drawn per chart: a line stays smooth at 2000, a heatmap at 80 × 80 cells
+_CHART_POINTS = {1: 2_000, 2: 6_400}
+
+# Warm the models on page load so the first click only scores
+model_version()
 
 # ─────────────────────────────────────────────────────────────────
 # Page header
@@ -25,10 +112,13 @@ st.markdown(
 # ─────────────────────────────────────────────────────────────────
 st.sidebar.header("Model & Inputs")
 
+# Case-study states first, then every other state model alphabetically
+case_studies = ["WY", "ND", "AK"]
+state_options = case_studies + sorted(code for code in STATE_NAMES if code not in case_studies)
 state = st.sidebar.selectbox(
     "Select state model",
-    ("WY", "ND", "AK"),
-    format_func=lambda x: {"WY": "Wyoming", "ND": "North Dakota", "AK": "Alaska"}[x]
+    state_options,
+    format_func=lambda x: STATE_NAMES[x]
 )
 
 renewable = st.sidebar.number_input(
@@ -81,35 +171,253 @@ urban = st.sidebar.number_input(
     help="Enter the estimated number of residents in urban areas"
 )
 
+level = st.sidebar.select_slider(
+    "Interval coverage",
+    options=[0.80, 0.90, 0.95, 0.99],
+    value=0.95,
+    format_func=lambda x: f"{x:.0%}",
+    help="Two-sided coverage of the confidence and prediction intervals"
+)
+
 # ─────────────────────────────────────────────────────────────────
 # Run prediction and show results
 # ─────────────────────────────────────────────────────────────────
 if st.sidebar.button("Run Prediction"):
-    # Compute prediction
-    prediction = predict_co2(
-        state_code=state,
-        renewable_energy=renewable,
-        coal_elec=coal,
-        gas_elec=gas,
-        pce_per_capita=pce,
-        urban_pop=urban
-    )
+    # Compute prediction and intervals (served from the shared cache for repeated inputs)
+    cache = get_prediction_cache()
+    with instrumentation.span("page.prediction.predict"):
+        result = cache.predict_interval(state, [renewable, coal, gas, pce, urban], level)
+    prediction = result["estimate"]
 
-    # Display predicted metric
-    st.metric(
+    # Display predicted metric and its uncertainty
+    col1, col2, col3 = st.columns(3)
+    col1.metric(
         label=f"Predicted CO₂ per Capita ({state})",
         value=f"{prediction:.2f} t"
     )
+    col2.metric(
+        label=f"{level:.0%} prediction interval",
+        value=f"{result['pred_low']:.2f} – {result['pred_high']:.2f} t",
+        help="Range expected to contain the state's actual value for a year with these drivers"
+    )
+    col3.metric(
+        label=f"{level:.0%} confidence interval (mean)",
+        value=f"{result['mean_low']:.2f} – {result['mean_high']:.2f} t",
+        help="Uncertainty of the fitted regression line itself at these inputs"
+    )
+    st.caption(
+        f"Standard error {result['se_pred']:.2f} t for a single year ({result['se_mean']:.2f} t for the mean). "
+        "Intervals assume the state's linear model holds; inputs far outside the state's "
+        "history widen them quickly."
+    )
+
+    # Which drivers moved the forecast, measured from the state's latest observed year
+    st.subheader("What drives this prediction")
+    with instrumentation.span("page.prediction.contributions"):
+        year, reference = latest_drivers(state, model_version())
+        explained = explain_co2_batch(state, [[renewable, coal, gas, pce, urban]], reference=reference)
+        waterfall = waterfall_frame(
+            f"{state} {year}", explained.baseline[0], explained.contributions[0], explained.estimate[0]
+        )
+        st.vega_lite_chart(
+            waterfall,
+            {
+                "mark": "bar",
+                "encoding": {
+                    "x": {"field": "step", "type": "nominal", "sort": None, "title": None,
+                          "axis": {"labelAngle": 0}},
+                    "y": {"field": "start", "type": "quantitative", "title": "CO₂ per capita (t)",
+                          "scale": {"zero": False}},
+                    "y2": {"field": "end"},
+                    "color": {
+                        "field": "effect", "type": "nominal", "legend": None,
+                        "scale": {"domain": list(_WATERFALL_COLORS), "range": list(_WATERFALL_COLORS.values())},
+                    },
+                    "tooltip": [
+                        {"field": "step", "type": "nominal"},
+                        {"field": "change", "type": "quantitative", "format": "+.2f", "title": "t CO₂ per capita"},
+                        {"field": "end", "type": "quantitative", "format": ".2f", "title": "running total"},
+                    ],
+                },
+            },
+            width="stretch",
+        )
+    st.caption(
+        f"Starts from the model's prediction for {state}'s actual {year} drivers "
+        f"({explained.baseline[0]:.2f} t); each bar is coefficient × (your input − {year} value). "
+        "Red raises the forecast, green lowers it."
+    )
 
     # Show the inputs for transparency
     st.subheader("Input Data")
-    st.dataframe(
-        pd.DataFrame({
-            "State": [state],
-            "Renewable Energy (Billion Btu/yr)": [renewable],
-            "Coal Electricity Consumption (short tons/yr)": [coal],
-            "Natural Gas Consumption (thousand cu ft/yr)": [gas],
-            "PCE per Capita (USD)": [pce],
-            "Estimated Urban Population (people)": [urban]
-        })
+    st.dataframe(input_table(state, renewable, coal, gas, pce, urban))
+
+    stats = cache.stats()
+    st.caption(
+        f"Prediction cache: {stats['hits']} hits, {stats['misses']} misses "
+        f"({stats['hit_ratio']:.0%} hit ratio, {stats['size']}/{stats['maxsize']} entries)"
+    )
+
+# ─────────────────────────────────────────────────────────────────
+# Scenario sweep: vary one or two drivers around the sidebar scenario
+# ─────────────────────────────────────────────────────────────────
+st.header("Scenario Sweep")
+st.markdown(
+    """
+    See how the predicted CO₂ per capita responds as one or two drivers vary over a range,
+    with the other drivers held at the sidebar values.
+    """
+)
+
+# Driver label → (feature column, upper bound of its sidebar input), in sidebar order
+SWEEP_DRIVERS = {
+    "Renewable energy (Billion Btu/yr)": ("renewable energy", 300_000.0),
+    "Coal electricity (short tons/yr)": ("Coal Electricity Consumption", 100_000_000.0),
+    "Natural gas (thousand cubic feet/yr)": ("Natural Gas Electricity Consumption", 20_000_000_000.0),
+    "PCE per capita (USD)": ("PCE per capita", 100_000.0),
+    "Urban population (people)": ("Estimated Urban Population", 500_000.0),
+}
+
+
+@st.fragment
+def scenario_sweep_section(state, base, level) -> None:
+    """Sweep controls and chart; changing them reruns only this section."""
+    # Label → (feature column, sidebar value, upper bound)
+    sweep_drivers = {
+        label: (feature, value, upper) for (label, (feature, upper)), value in zip(SWEEP_DRIVERS.items(), base)
+    }
+    swept = st.multiselect(
+        "Drivers to vary (one for a line chart, two for a heatmap)",
+        list(sweep_drivers),
+        default=["Coal electricity (short tons/yr)"],
+        max_selections=2,
     )
+
+    ranges = []
+    for column, label in zip(st.columns(max(len(swept), 1)), swept):
+        feature, value, upper = sweep_drivers[label]
+        low, high = column.slider(
+            f"{label} range",
+            min_value=0.0,
+            max_value=upper,
+            value=(0.5 * value, min(1.5 * value, upper) if value > 0 else upper),
+        )
+        steps = column.number_input(
+            f"Steps for {label.split(' (')[0].lower()}",
+            min_value=2,
+            max_value=1_000_000 if len(swept) == 1 else 2_000,
+            value=500 if len(swept) == 1 else 200,
+            step=100,
+            help="Grid points along this driver; a two-driver sweep scores every combination",
+        )
+        ranges.append((feature, low, high, int(steps)))
+
+    if ranges:
+        with instrumentation.span("page.prediction.sweep"):
+            frame, points, seconds = sweep_chart_data(
+                state, base, tuple(ranges), level, model_version()
+            )
+        labels = dict(zip((r[0] for r in ranges), swept))
+
+        if len(ranges) == 1:
+            feature = ranges[0][0]
+            x = {"field": "x", "type": "quantitative", "title": labels[feature]}
+            y = {"field": "estimate", "type": "quantitative", "title": "CO₂ per capita (t)"}
+            spec = {
+                "layer": [
+                    {"mark": {"type": "area", "opacity": 0.25},
+                     "encoding": {"x": x, "y": {"field": "low", "type": "quantitative"}, "y2": {"field": "high"}}},
+                    {"mark": "line",
+                     "encoding": {"x": x, "y": y, "tooltip": [dict(x, format=",.0f"), dict(y, format=".2f")]}},
+                    {"data": {"values": [{"x": sweep_drivers[swept[0]][1]}]},
+                     "mark": {"type": "rule", "strokeDash": [4, 4]},
+                     "encoding": {"x": {"field": "x", "type": "quantitative"}}},
+                ]
+            }
+            st.vega_lite_chart(frame.rename(columns={feature: "x"}), spec, width="stretch")
+            st.caption(f"Shaded band: {level:.0%} prediction interval. Dashed line: the sidebar value.")
+        else:
+            (fx, *_), (fy, *_) = ranges
+            dx, dy = frame[fx].diff().max(), frame[fy].diff().max()
+            chart_data = frame.rename(columns={fx: "x", fy: "y"})
+            chart_data["x2"] = chart_data["x"] + (dx if dx > 0 else 1.0)
+            chart_data["y2"] = chart_data["y"] + (dy if dy > 0 else 1.0)
+            x = {"field": "x", "type": "quantitative", "title": labels[fx]}
+            y = {"field": "y", "type": "quantitative", "title": labels[fy]}
+            z = {"field": "estimate", "type": "quantitative", "title": "CO₂ t/person"}
+            spec = {
+                "mark": "rect",
+                "encoding": {
+                    "x": x, "x2": {"field": "x2"}, "y": y, "y2": {"field": "y2"},
+                    "color": dict(z, scale={"scheme": "inferno", "reverse": True}),
+                    "tooltip": [dict(x, format=",.0f"), dict(y, format=",.0f"), dict(z, format=".2f")],
+                },
+            }
+            st.vega_lite_chart(chart_data, spec, width="stretch")
+
+        st.caption(
+            f"Scored {points:,} scenarios in {seconds * 1000:,.0f} ms"
+            + (f"; chart shows {len(frame):,} of them." if len(frame) < points else ".")
+        )
+
+
+scenario_sweep_section(state, (renewable, coal, gas, pce, float(urban)), level)
+
+# ─────────────────────────────────────────────────────────────────
+# Bulk scoring: score an uploaded scenario file chunk by chunk
+# ─────────────────────────────────────────────────────────────────
+st.header("Bulk Scoring")
+st.markdown(
+    """
+    Upload a CSV or Parquet file with a **State** column and the five drivers
+    (renewable energy, coal electricity, natural gas, PCE per capita, urban population)
+    to score every row. Other columns are passed through to the result.
+    """
+)
+
+
+@st.fragment
+def bulk_scoring_section(level) -> None:
+    """Upload, score and download; reruns only this section."""
+    upload = st.file_uploader("Scenario file", type=["csv", "parquet"])
+    with_intervals = st.checkbox(f"Add {level:.0%} prediction intervals", value=False)
+    if upload is None:
+        return
+
+    fmt = upload.name.rsplit(".", 1)[-1].lower()
+    key = (upload.file_id, with_intervals, level, model_version())
+    if st.session_state.get("bulk_scoring_key") != key:
+        upload.seek(0)
+        output = io.BytesIO()
+        bar = st.progress(0.0, text="Scoring…")
+        total = max(upload.size, 1)
+        try:
+            report = bulk_scoring.score_file(
+                upload, output,
+                level=level if with_intervals else None,
+                source_format=fmt, output_format=fmt,
+                # The upload's read position tracks progress through the file
+                progress=lambda rows: bar.progress(min(upload.tell() / total, 1.0), text=f"{rows:,} rows scored"),
+            )
+        except (SchemaError, ValueError) as exc:
+            bar.empty()
+            st.error(str(exc))
+            return
+        bar.empty()
+        st.session_state["bulk_scoring_key"] = key
+        st.session_state["bulk_scoring_result"] = (report, output.getvalue())
+
+    report, data = st.session_state["bulk_scoring_result"]
+    st.success(report.summary())
+    st.download_button(
+        "Download scored file",
+        data,
+        file_name=f"{upload.name.rsplit('.', 1)[0]}-scored.{fmt}",
+        mime="text/csv" if fmt == "csv" else "application/octet-stream",
+        on_click="ignore",
+    )
+
+
+bulk_scoring_section(level)
+
+page_timer.stop()
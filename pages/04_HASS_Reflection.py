@@ -1,7 +1,10 @@
 import streamlit as st
 
+import instrumentation
+
 # Page settings
 st.set_page_config(page_title="HASS Reflection", layout="wide")
+page_timer = instrumentation.start_span("page.hass_reflection")
 
 # Title
 st.title("HASS Reflection")
@@ -62,3 +65,5 @@ with burden_cols[2]:
 # Footer note
 st.markdown("---")
 st.caption("Reflect on the societal dimensions of CO₂ emissions and environmental justice.")
+
+page_timer.stop()
@@ -0,0 +1,112 @@
+"""
+Diagnostics page: timings, call counts, cache hit ratios and dataset memory.
+
+Metrics are collected only while instrumentation is on (CO2_INSTRUMENTATION=1,
+or the toggle below for this server process). With CO2_ALLOW_REFRESH=1 the
+dataset section can also rebuild the panel from the per-source extracts (see
+panel_refresh) and swap it into the running app.
+"""
+
+import streamlit as st
+import pandas as pd
+
+import dataset_registry
+import instrumentation
+import panel_refresh
+
+st.set_page_config(page_title="Diagnostics", layout="wide")
+
+st.title("Diagnostics")
+st.markdown(
+    """
+    Where the time goes in this server process: service and page spans,
+    cache hit ratios and the shared dataset's memory footprint.
+    """
+)
+
+# ─────────────────────────────────────────────────────────────────
+# Collection switch
+# ─────────────────────────────────────────────────────────────────
+enabled = st.sidebar.toggle("Collect metrics", value=instrumentation.enabled())
+if enabled != instrumentation.enabled():
+    instrumentation.set_enabled(enabled)
+if st.sidebar.button("Reset metrics"):
+    instrumentation.reset()
+
+if not instrumentation.enabled():
+    st.info(
+        "Instrumentation is off. Start the app with `CO2_INSTRUMENTATION=1` "
+        "(add `CO2_INSTRUMENTATION_LOG=-` for JSON span logs) or use the sidebar toggle, "
+        "then browse the other pages."
+    )
+
+snapshot = instrumentation.snapshot()
+
+# ─────────────────────────────────────────────────────────────────
+# Dataset footprint
+# ─────────────────────────────────────────────────────────────────
+st.subheader("Dataset")
+usage = dataset_registry.memory_usage()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Loaded", "yes" if usage["loaded"] else "no")
+col2.metric("Rows × columns", f"{usage['rows']:,} × {usage['columns']}")
+col3.metric("Memory", f"{usage['bytes'] / 1024:,.1f} KiB")
+col4.metric(
+    "Last load",
+    "–" if usage["last_load_seconds"] is None else f"{usage['last_load_seconds'] * 1000:.1f} ms",
+)
+if usage["loaded"]:
+    report = dataset_registry.validation_report()
+    if report is not None:
+        st.caption("Schema validation: " + report.summary().replace("\n", " · "))
+st.caption(f"Source: `{usage['source']}` · generation {usage['generation']}")
+
+# Any visitor could otherwise rewrite the published panel for every session
+sources = panel_refresh.sources_dir()
+if panel_refresh.refresh_allowed() and st.button(
+    "Refresh from source extracts", help=f"Rebuild the panel from the files in {sources}"
+):
+    try:
+        with st.spinner("Reading extracts…"):
+            result = panel_refresh.refresh(sources)
+    except Exception as exc:
+        st.error("Refresh failed.")
+        st.exception(exc)
+    else:
+        st.success(result.summary())
+
+# ─────────────────────────────────────────────────────────────────
+# Spans, caches and counters
+# ─────────────────────────────────────────────────────────────────
+st.subheader("Timing spans")
+if snapshot["spans"]:
+    spans = pd.DataFrame(snapshot["spans"]).T
+    spans["count"] = spans["count"].astype(int)
+    for column in ["total_s", "mean_s", "max_s"]:
+        spans[column.replace("_s", " (ms)")] = spans.pop(column) * 1000
+    st.dataframe(spans.sort_values("total (ms)", ascending=False))
+else:
+    st.caption("No spans recorded yet.")
+
+col_left, col_right = st.columns(2)
+with col_left:
+    st.subheader("Cache hit ratios")
+    if snapshot["caches"]:
+        st.dataframe(pd.DataFrame(snapshot["caches"]).T)
+    else:
+        st.caption("No cache lookups recorded yet.")
+with col_right:
+    st.subheader("Counters")
+    if snapshot["counters"]:
+        st.dataframe(pd.Series(snapshot["counters"], name="count"))
+    else:
+        st.caption("No counters recorded yet.")
+
+# ─────────────────────────────────────────────────────────────────
+# Export
+# ─────────────────────────────────────────────────────────────────
+st.subheader("Export")
+prometheus = instrumentation.render_prometheus()
+st.download_button("Download Prometheus text", prometheus, file_name="co2_metrics.prom")
+with st.expander("Prometheus text dump"):
+    st.code(prometheus, language="text")
@@ -0,0 +1,485 @@
+"""
+Rebuild the merged panel from per-source extract files and publish it.
+
+The workbook's merged sheet is assembled by hand from the EIA, EPA and NOAA
+sources. This module does it from a directory of extracts instead: one
+.csv, .parquet or .xlsx file per source, each with State and Year columns
+plus one or more of the merged schema's value columns (canonical names or
+aliases, see schema.MERGED_SCHEMA).
+
+A refresh:
+    1. reads and validates every extract concurrently on a thread pool;
+       an extract whose file is unchanged since the last refresh (same
+       mtime and size, or same SHA-256) is reused without being re-read;
+    2. indexes each source by (State, Year) and outer-joins them on that
+       sorted index;
+    3. validates the merged frame against the full schema (nothing is
+       published if that fails);
+    4. publishes it atomically: the panel is written to a temporary CSV
+       and renamed to a content-addressed name, then the CURRENT.json
+       pointer is replaced in one os.replace() (see dataset_cache.panel_dir);
+    5. loads the published file the way a fresh process would and swaps
+       the dataset into dataset_registry, so the running app and the
+       services pick up the new version on their next access, without a
+       restart.
+
+If no extract changed since the published version, nothing is written.
+
+Switches:
+    CO2_SOURCES_DIR   Directory of extract files (default: "data/sources").
+
+Command line:
+    python panel_refresh.py                          # refresh from CO2_SOURCES_DIR
+    python panel_refresh.py data/sources --workers 4
+    python panel_refresh.py --export-workbook data/sources   # seed extracts from the workbook's source sheets
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import dataset_cache
+import dataset_registry
+import instrumentation
+import schema
+
+# Extract formats a sources directory may hold
+EXTRACT_SUFFIXES = (".csv", ".parquet", ".xlsx", ".xlsm")
+
+# Published panels kept on disk, the current one included (older ones are pruned)
+KEEP_PANELS = 3
+
+_ENABLED_VALUES = {"1", "on", "true", "yes"}
+
+# Every merged column may come from any source; only the join keys are required
+_SOURCE_SCHEMA = tuple(
+    column if column.name in ("State", "Year") else replace(column, required=False)
+    for column in schema.MERGED_SCHEMA
+)
+_KEYS = ["State", "Year"]
+
+
+def sources_dir() -> str:
+    """Return the directory holding the per-source extract files."""
+    return os.environ.get("CO2_SOURCES_DIR", os.path.join("data", "sources"))
+
+
+def refresh_allowed() -> bool:
+    """Return True when CO2_ALLOW_REFRESH lets app users trigger a refresh (off by default)."""
+    return os.environ.get("CO2_ALLOW_REFRESH", "off").strip().lower() in _ENABLED_VALUES
+
+
+@dataclass(frozen=True)
+class SourceTable:
+    """One validated extract, indexed by (State, Year)."""
+
+    name: str               # file name within the sources directory
+    path: str
+    sha256: str
+    stat: tuple             # (mtime_ns, size) when it was read
+    frame: "pd.DataFrame"   # sorted unique (State, Year) index, int64/float64 value columns
+    report: schema.ValidationReport
+
+    @property
+    def columns(self) -> list[str]:
+        """Merged-schema columns this source provides."""
+        return list(self.frame.columns)
+
+
+@dataclass(frozen=True)
+class RefreshReport:
+    """What a refresh read, reused and published."""
+
+    version: str                        # SHA-256 of the published panel
+    path: str                           # published panel file
+    rows: int
+    sources: dict[str, str]             # extract file name → SHA-256
+    reprocessed: list[str] = field(default_factory=list)
+    reused: list[str] = field(default_factory=list)
+    published: bool = True              # False when nothing changed
+    generation: Optional[int] = None    # dataset_registry generation after the swap
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        """Return a one-line summary for logs and the command line."""
+        action = "published" if self.published else "unchanged"
+        return (
+            f"{action} panel {self.version[:12]} ({self.rows} rows) from {len(self.sources)} sources; "
+            f"reprocessed {self.reprocessed or 'none'}, reused {self.reused or 'none'} "
+            f"in {self.seconds:.2f}s"
+        )
+
+
+# ────────────────────────────────────────────────────────
+# Reading extracts (with change detection)
+# ────────────────────────────────────────────────────────
+# Absolute path → last SourceTable read from it
+_tables: dict[str, SourceTable] = {}
+_tables_lock = threading.Lock()
+
+# One refresh at a time per process
+_refresh_lock = threading.Lock()
+
+
+def list_extracts(directory: str) -> list[str]:
+    """Return the extract files of a sources directory, sorted by name."""
+    names = sorted(
+        name for name in os.listdir(directory)
+        if name.lower().endswith(EXTRACT_SUFFIXES) and not name.startswith((".", "~$"))
+    )
+    return [os.path.join(directory, name) for name in names]
+
+
+def _first_sheet(path: str) -> str:
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return workbook.sheetnames[0]
+    finally:
+        workbook.close()
+
+
+def read_extract(path: str) -> SourceTable:
+    """Read, validate and index one extract file.
+
+    Args:
+        path (str): A .csv, .parquet or .xlsx file (first worksheet).
+
+    Returns:
+        SourceTable: The extract's merged-schema columns, indexed by a
+                     sorted unique (State, Year) MultiIndex.
+
+    Raises:
+        SchemaError: State or Year is missing, no merged-schema value column
+                     is present, or a (State, Year) pair repeats.
+    """
+    stat = os.stat(path)
+    sha256 = dataset_cache.file_sha256(path)
+    name = os.path.basename(path)
+    sheet = _first_sheet(path) if path.lower().endswith((".xlsx", ".xlsm")) else dataset_cache.SHEET_NAME
+
+    with instrumentation.span("refresh.read_source"):
+        # Through the columnar cache when enabled, so a restart re-reads only changed files
+        raw = dataset_cache.load_sheet(path, sheet)
+        frame, report = schema.apply_schema(raw, _SOURCE_SCHEMA)
+    values = [column for column in frame.columns if column not in _KEYS]
+    if not values:
+        raise schema.SchemaError(
+            f"Extract {name!r} has no merged-schema value column; found {[str(c) for c in raw.columns]}."
+        )
+
+    # Rows without a join key cannot be placed (they are counted in report.missing)
+    frame = frame[frame["State"].notna() & frame["Year"].notna()]
+    # Whole-number columns stay integer (until a join leaves gaps), others become
+    # exact float64; plain-string states so every source's index compares alike
+    data = {
+        column: np.asarray(frame[column], dtype=np.int64 if frame[column].dtype.kind in "iu" else np.float64)
+        for column in values
+    }
+    index = pd.MultiIndex.from_arrays(
+        [np.asarray(frame["State"].astype(str), dtype=object), np.asarray(frame["Year"], dtype=np.int64)],
+        names=_KEYS,
+    )
+    indexed = pd.DataFrame(data, index=index).sort_index()
+    if not indexed.index.is_unique:
+        dupes = indexed.index[indexed.index.duplicated()].unique()[:5].tolist()
+        raise schema.SchemaError(f"Extract {name!r} repeats (State, Year) pairs, e.g. {dupes}.")
+    return SourceTable(name, path, sha256, (stat.st_mtime_ns, stat.st_size), indexed, report)
+
+
+def fingerprint(path: str) -> tuple[str, tuple]:
+    """Return (SHA-256, (mtime_ns, size)) of an extract.
+
+    A file this process already read with the same mtime and size is not
+    hashed again.
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _tables_lock:
+        known = _tables.get(os.path.abspath(path))
+    if known is not None and known.stat == key:
+        return known.sha256, key
+    return dataset_cache.file_sha256(path), key
+
+
+def _load_source(path: str, sha256: str, stat: tuple) -> tuple[SourceTable, bool]:
+    """Return (table, reprocessed) for one extract, reusing an unchanged one."""
+    key = os.path.abspath(path)
+    with _tables_lock:
+        known = _tables.get(key)
+        if known is not None and known.sha256 == sha256:
+            # Touched or re-copied but identical content: keep the parsed table
+            if known.stat != stat:
+                known = _tables[key] = replace(known, stat=stat)
+            return known, False
+
+    table = read_extract(path)
+    with _tables_lock:
+        _tables[key] = table
+    return table, True
+
+
+def read_sources(paths: list[str], workers: Optional[int] = None) -> tuple[list[SourceTable], list[bool]]:
+    """Load many extracts concurrently, re-reading only changed ones.
+
+    Args:
+        paths (list[str]): Extract files.
+        workers (int): Thread-pool size (default: one per file, at most 8).
+
+    Returns:
+        tuple: (tables, reprocessed flags), both in the order of `paths`.
+    """
+    with _pool(workers, len(paths)) as pool:
+        prints = list(pool.map(fingerprint, paths))
+        results = list(pool.map(_load_source, paths, *zip(*prints)))
+    return [table for table, _ in results], [flag for _, flag in results]
+
+
+def _pool(workers: Optional[int], n_files: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=workers or min(8, max(1, n_files)), thread_name_prefix="refresh")
+
+
+# ────────────────────────────────────────────────────────
+# Joining
+# ────────────────────────────────────────────────────────
+def merge_sources(tables: list[SourceTable]) -> "pd.DataFrame":
+    """Outer-join source tables on their (State, Year) index.
+
+    Args:
+        tables (list[SourceTable]): Sources with disjoint value columns.
+
+    Returns:
+        pd.DataFrame: One row per (State, Year) seen in any source, sorted,
+                      with State and Year as columns followed by the value
+                      columns in merged-schema order. Values a source
+                      lacks for a row are NaN.
+
+    Raises:
+        SchemaError: Two sources provide the same column.
+    """
+    owner = {}
+    for table in tables:
+        for column in table.columns:
+            if column in owner:
+                raise schema.SchemaError(
+                    f"Column {column!r} comes from both {owner[column]!r} and {table.name!r}."
+                )
+            owner[column] = table.name
+
+    with instrumentation.span("refresh.merge"):
+        # Aligned on sorted unique indexes: one union of the keys, then a take per source
+        index = tables[0].frame.index
+        for table in tables[1:]:
+            index = index.union(table.frame.index)
+        joined = pd.concat([table.frame.reindex(index) for table in tables], axis=1)
+        order = [column.name for column in schema.MERGED_SCHEMA if column.name in joined.columns]
+        return joined[[name for name in order if name not in _KEYS]].reset_index()
+
+
+# ────────────────────────────────────────────────────────
+# Publishing
+# ────────────────────────────────────────────────────────
+def publish(frame: "pd.DataFrame", sources: dict[str, str]) -> dict:
+    """Write a merged panel under its content hash and point CURRENT.json at it.
+
+    Both steps are atomic renames, so a reader sees either the old or the
+    new version, never a partly written file.
+
+    Args:
+        frame (pd.DataFrame): The merged panel.
+        sources (dict): Extract file name → SHA-256, recorded in the pointer.
+
+    Returns:
+        dict: The new pointer (see dataset_cache.published_panel()).
+    """
+    directory = dataset_cache.panel_dir()
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".panel-", suffix=".csv", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as fh:
+            frame.to_csv(fh, index=False)
+        sha256 = dataset_cache.file_sha256(tmp)
+        path = os.path.join(directory, f"panel-{sha256[:16]}.csv")
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    pointer = {
+        "path": path,
+        "sha256": sha256,
+        "sources": sources,
+        "rows": int(len(frame)),
+        "created": time.time(),
+    }
+    fd, tmp = tempfile.mkstemp(prefix=".CURRENT-", suffix=".json", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        json.dump(pointer, fh, indent=2)
+    os.replace(tmp, os.path.join(directory, "CURRENT.json"))
+    _prune(directory, keep=path)
+    return pointer
+
+
+def _prune(directory: str, keep: str) -> None:
+    """Delete all but the newest KEEP_PANELS published panels (never `keep`), with their cache stores."""
+    panels = [
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith("panel-") and name.endswith(".csv")
+    ]
+    panels.sort(key=os.path.getmtime, reverse=True)
+    for path in panels[KEEP_PANELS:]:
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            dataset_cache.clear(path)
+
+
+# ────────────────────────────────────────────────────────
+# Refresh
+# ────────────────────────────────────────────────────────
+@instrumentation.timed("refresh")
+def refresh(directory: Optional[str] = None, workers: Optional[int] = None, swap: bool = True) -> RefreshReport:
+    """Rebuild the panel from the extracts, publish it and hot-swap it in.
+
+    Args:
+        directory (str): Sources directory (default: sources_dir()).
+        workers (int): Threads reading extracts concurrently.
+        swap (bool): Install the new dataset in dataset_registry.
+
+    Returns:
+        RefreshReport: The published version and which sources were
+                       re-read. When every extract matches the published
+                       version, nothing is written and published is False.
+
+    Raises:
+        FileNotFoundError: The directory holds no extract files.
+        SchemaError: An extract or the merged panel fails validation; the
+                     published version is left untouched.
+    """
+    start = time.perf_counter()
+    directory = directory or sources_dir()
+    paths = list_extracts(directory)
+    if not paths:
+        raise FileNotFoundError(f"No {'/'.join(EXTRACT_SUFFIXES)} extracts in {directory!r}.")
+
+    with _refresh_lock, _pool(workers, len(paths)) as pool:
+        # Hash first: if every extract matches the published version, nothing is read
+        prints = list(pool.map(fingerprint, paths))
+        names = [os.path.basename(path) for path in paths]
+        current = dataset_cache.published_panel()
+        if current is not None and current["sources"] == {n: sha for n, (sha, _) in zip(names, prints)}:
+            generation = None
+            if swap and dataset_registry.source() != current["path"]:
+                dataset_registry.invalidate()
+                generation = dataset_registry.generation()
+            return RefreshReport(
+                version=current["sha256"], path=current["path"], rows=current["rows"],
+                sources=current["sources"], reused=names, published=False,
+                generation=generation, seconds=time.perf_counter() - start,
+            )
+
+        results = list(pool.map(_load_source, paths, *zip(*prints)))
+        tables = [table for table, _ in results]
+        sources = {table.name: table.sha256 for table in tables}
+        reprocessed = [table.name for table, flag in results if flag]
+        reused = [table.name for table, flag in results if not flag]
+
+        merged = merge_sources(tables)
+        with instrumentation.span("refresh.validate"):
+            # Fail before publishing anything
+            schema.apply_schema(merged)
+        with instrumentation.span("refresh.publish"):
+            pointer = publish(merged, sources)
+        generation = None
+        if swap:
+            # Built from the published file exactly as a fresh process would load
+            # it, which also leaves its columnar cache warm for the next start
+            with instrumentation.span("refresh.load"):
+                frame, report = schema.apply_schema(dataset_cache.load_sheet(pointer["path"]))
+                dataset = dataset_registry.build_dataset(frame, report)
+            generation = dataset_registry.swap(dataset, pointer["path"])
+
+    return RefreshReport(
+        version=pointer["sha256"], path=pointer["path"], rows=pointer["rows"],
+        sources=sources, reprocessed=reprocessed, reused=reused, published=True,
+        generation=generation, seconds=time.perf_counter() - start,
+    )
+
+
+async def refresh_async(directory: Optional[str] = None, workers: Optional[int] = None) -> RefreshReport:
+    """Run refresh() off the event loop (e.g. from the scoring server or a scheduler)."""
+    return await asyncio.to_thread(refresh, directory, workers)
+
+
+# ────────────────────────────────────────────────────────
+# Seeding extracts from the workbook
+# ────────────────────────────────────────────────────────
+def export_workbook_sources(directory: str, path: str = dataset_cache.WORKBOOK_PATH) -> list[str]:
+    """Write each per-source sheet of the workbook as a CSV extract.
+
+    Every sheet except the merged one becomes <sheet name>.csv, which gives
+    a sources directory equivalent to the workbook to start from.
+
+    Returns:
+        list[str]: The files written.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        sheets = [name for name in workbook.sheetnames if name != dataset_cache.SHEET_NAME]
+    finally:
+        workbook.close()
+
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for sheet in sheets:
+        target = os.path.join(directory, f"{sheet.strip().replace(' ', '_')}.csv")
+        dataset_cache.read_excel_sheet(path, sheet).to_csv(target, index=False)
+        written.append(target)
+    return written
+
+
+# ────────────────────────────────────────────────────────
+# Command line
+# ────────────────────────────────────────────────────────
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild and publish the merged panel from source extracts.")
+    parser.add_argument("directory", nargs="?", default=None, help="sources directory (default: CO2_SOURCES_DIR)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--export-workbook", action="store_true",
+                        help="write the workbook's source sheets into the directory as CSV extracts")
+    args = parser.parse_args(argv)
+
+    directory = args.directory or sources_dir()
+    if args.export_workbook:
+        for path in export_workbook_sources(directory):
+            print(f"Wrote {path}")
+        return 0
+    try:
+        report = refresh(directory, args.workers, swap=False)
+    except (FileNotFoundError, schema.SchemaError) as exc:
+        print(f"Refresh failed: {exc}", file=sys.stderr)
+        return 1
+    print(report.summary())
+    print(f"Panel: {report.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Bounded LRU/TTL cache of predictions, shared across Streamlit sessions.
+
+Entries are keyed by (kind, state, model version, quantized inputs); kind
+separates point predictions from interval results at each level. A refit or
+incremental update changes data_service.model_version(), so stale results
+are never served, and inputs are rounded to a fixed number of significant
+digits so float noise from the widgets maps onto one entry. The prediction
+itself is computed from the quantized inputs, keeping each cached value
+exactly the one its key describes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import data_service
+import instrumentation
+
+
+def quantize(value: float, digits: int) -> float:
+    """Round a value to `digits` significant digits."""
+    return float(f"{float(value):.{digits}g}")
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with per-entry time-to-live and hit/miss counters."""
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 3600.0, digits: int = 9, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.digits = digits
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def predict(self, state_code: str, inputs) -> float:
+        """Return the (possibly cached) prediction for one row of inputs.
+
+        Args:
+            state_code (str): Two-letter state code (case-insensitive).
+            inputs (sequence of float): Driver values in _FEATURES order.
+
+        Returns:
+            float: Predicted CO₂ per capita, as data_service.predict_co2().
+        """
+        return self._lookup("point", state_code, inputs, lambda state, row: data_service.predict_co2(state, *row))
+
+    def predict_interval(self, state_code: str, inputs, level: float = 0.95) -> dict:
+        """Return the (possibly cached) prediction and its intervals for one row.
+
+        Args:
+            state_code (str): Two-letter state code (case-insensitive).
+            inputs (sequence of float): Driver values in _FEATURES order.
+            level (float): Two-sided coverage of the intervals.
+
+        Returns:
+            dict: The scalar fields of data_service.PredictionIntervals
+                  ("estimate", "se_mean", "se_pred", "mean_low", "mean_high",
+                  "pred_low", "pred_high", "level").
+        """
+        def compute(state, row):
+            result = data_service.predict_co2_intervals(state, [row], level)
+            values = {name: float(array[0]) for name, array in vars(result).items() if name != "level"}
+            return {**values, "level": result.level}
+
+        return dict(self._lookup(("interval", float(level)), state_code, inputs, compute))
+
+    def _lookup(self, kind, state_code: str, inputs, compute):
+        state = state_code.upper()
+        row = tuple(quantize(v, self.digits) for v in inputs)
+        key = (kind, state, data_service.model_version(), row)
+        now = self._clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                instrumentation.cache_hit("prediction")
+                return entry[0]
+            self.misses += 1
+        instrumentation.cache_miss("prediction")
+
+        # Computed outside the lock; a concurrent duplicate just overwrites
+        value = compute(state, row)
+        with self._lock:
+            self._entries[key] = (value, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters, hit ratio and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
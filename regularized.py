@@ -0,0 +1,410 @@
+"""
+Batched ridge and lasso regressions with cross-validated penalties.
+
+Both work on the zero-padded per-group arrays of ols_engine.stack_groups()
+and return an ols_engine.OLSFit in the original units (intercept first), so
+a penalized fit predicts, persists and gives intervals exactly like an OLS
+one. Drivers are centred and scaled to unit variance within each group
+before the penalty applies, and the intercept is never penalized.
+
+Ridge takes one SVD per group of the standardized design, Z = U S Vᵀ.
+Every penalty α on the path then only rescales the singular values
+(s / (s² + α)), and the hat-matrix diagonal gives exact leave-one-out
+residuals, e / (1 − h), so the whole path is scored without refitting
+(criterion="gcv" uses generalized cross-validation instead).
+
+Lasso runs covariance coordinate descent with warm starts along a
+decreasing λ path, for every group and every K-fold training split at
+once. Each split is standardized on its own training rows, so no statistic
+of a held-out row leaks into its fit.
+
+Penalties are reported per observation on the standardized scale:
+minimize (1/2n)‖y − Zb‖² + (α/2)‖b‖² for ridge and + λ‖b‖₁ for lasso.
+
+Usage:
+    X3, y2, mask = ols_engine.stack_groups(group_ids, X, y)
+    fit, path = ridge_cv(X3, y2, mask)
+    path.grid[path.best]      # chosen penalty of every group
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from ols_engine import OLSFit
+
+# Penalty grids relative to the data: ridge α per observation (the
+# standardized Gram matrix has unit diagonal), lasso λ as a fraction of the
+# smallest λ that zeroes every slope
+RIDGE_GRID = np.logspace(-4, 3, 50)
+LASSO_RATIOS = np.logspace(0, -3, 30)
+
+DEFAULT_FOLDS = 5
+
+
+@dataclass(frozen=True)
+class CVPath:
+    """Cross-validation error along the penalty path of every group."""
+
+    grid: np.ndarray        # (G, L) penalties tried, per observation on the standardized scale
+    error: np.ndarray       # (G, L) mean squared validation error
+    best: np.ndarray        # (G,)   index of the chosen penalty
+
+    @property
+    def penalty(self) -> np.ndarray:
+        """Return the chosen penalty of every group."""
+        return self.grid[np.arange(len(self.best)), self.best]
+
+
+# ────────────────────────────────────────────────────────
+# Shared helpers
+# ────────────────────────────────────────────────────────
+def _standardize(X3: np.ndarray, y2: np.ndarray, mask: np.ndarray):
+    """Centre and scale each group's drivers (and centre y) over its real rows.
+
+    Returns:
+        tuple: (Z, yc, x_mean, x_scale, y_mean, n) with padding rows zero;
+               constant columns keep scale 1 (and become all-zero).
+    """
+    X = np.where(mask[..., None], X3[..., 1:], 0.0)
+    y = np.where(mask, y2, 0.0)
+    n = mask.sum(axis=1)
+    count = np.maximum(n, 1)[:, None]
+    x_mean = X.sum(axis=1) / count
+    y_mean = y.sum(axis=1) / count[:, 0]
+    Xc = np.where(mask[..., None], X - x_mean[:, None, :], 0.0)
+    x_scale = np.sqrt((Xc**2).sum(axis=1) / count)
+    x_scale = np.where(x_scale > 0, x_scale, 1.0)
+    Z = Xc / x_scale[:, None, :]
+    yc = np.where(mask, y - y_mean[:, None], 0.0)
+    return Z, yc, x_mean, x_scale, y_mean, n
+
+
+def _to_original_units(
+    b: np.ndarray,
+    cov: np.ndarray,
+    df: np.ndarray,
+    Z: np.ndarray,
+    yc: np.ndarray,
+    x_mean: np.ndarray,
+    x_scale: np.ndarray,
+    y_mean: np.ndarray,
+    n: np.ndarray,
+    penalty: np.ndarray,
+) -> OLSFit:
+    """Turn standardized slopes into an OLSFit in the original units.
+
+    Args:
+        b (np.ndarray): (G, p) slopes on the standardized drivers.
+        cov (np.ndarray): (G, p, p) covariance of b divided by σ².
+        df (np.ndarray): (G,) effective degrees of freedom, intercept included.
+        penalty (np.ndarray): (G,) chosen penalties.
+    """
+    slopes = b / x_scale
+    coef = np.concatenate([(y_mean - np.einsum("gp,gp->g", x_mean, slopes))[:, None], slopes], axis=1)
+
+    # Covariance of (intercept, slopes) per σ²: the centred intercept ȳ is
+    # independent of the slopes, so only the slope block needs rescaling
+    slope_cov = cov / (x_scale[:, :, None] * x_scale[:, None, :])
+    cross = -np.einsum("gp,gpq->gq", x_mean, slope_cov)
+    G, k = coef.shape
+    xtx_inv = np.empty((G, k, k))
+    xtx_inv[:, 1:, 1:] = slope_cov
+    xtx_inv[:, 0, 1:] = xtx_inv[:, 1:, 0] = cross
+    xtx_inv[:, 0, 0] = 1.0 / np.maximum(n, 1) - np.einsum("gq,gq->g", cross, x_mean)
+
+    resid = yc - np.einsum("gtp,gp->gt", Z, b)
+    rss = np.einsum("gt,gt->g", resid, resid)
+    tss = np.einsum("gt,gt->g", yc, yc)
+    df_resid = n - df
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma2 = np.where(df_resid > 0, rss / df_resid, np.nan)
+        r2 = np.where(tss > 0, 1.0 - rss / tss, np.nan)
+        adj_r2 = np.where(df_resid > 0, 1.0 - (1.0 - r2) * (n - 1) / df_resid, np.nan)
+    stderr = np.sqrt(sigma2[:, None] * np.diagonal(xtx_inv, axis1=1, axis2=2))
+
+    return OLSFit(
+        coef=coef,
+        stderr=stderr,
+        xtx_inv=xtx_inv,
+        sigma2=sigma2,
+        r2=r2,
+        adj_r2=adj_r2,
+        n_obs=n,
+        # Integer degrees of freedom for t quantiles: round the effective df up
+        rank=np.ceil(df - 1e-9).astype(int),
+        penalty=penalty,
+    )
+
+
+# ────────────────────────────────────────────────────────
+# Ridge
+# ────────────────────────────────────────────────────────
+def ridge_cv(
+    X3: np.ndarray,
+    y2: np.ndarray,
+    mask: np.ndarray,
+    alphas: Optional[np.ndarray] = None,
+    criterion: str = "loo",
+) -> tuple[OLSFit, CVPath]:
+    """Fit ridge regressions, choosing each group's penalty by cross-validation.
+
+    Args:
+        X3 (np.ndarray): (G, T, p+1) designs with the intercept column first,
+            as built by ols_engine.stack_groups().
+        y2 (np.ndarray): (G, T) responses.
+        mask (np.ndarray): (G, T) True for real rows.
+        alphas (np.ndarray): Penalty path per observation (default RIDGE_GRID).
+        criterion (str): "loo" (exact leave-one-out) or "gcv".
+
+    Returns:
+        tuple: (OLSFit at each group's best α, CVPath of the whole path).
+               xtx_inv holds the ridge covariance (per σ²) and rank the
+               effective degrees of freedom rounded up.
+    """
+    if criterion not in ("loo", "gcv"):
+        raise ValueError(f"criterion must be 'loo' or 'gcv', got {criterion!r}.")
+    alphas = RIDGE_GRID if alphas is None else np.asarray(alphas, dtype=float)
+    Z, yc, x_mean, x_scale, y_mean, n = _standardize(X3, y2, mask)
+    G = Z.shape[0]
+
+    # The one SVD per group; everything below reuses it
+    U, s, Vt = np.linalg.svd(Z, full_matrices=False)
+    uty = np.einsum("gtk,gt->gk", U, yc)
+    s2 = s**2
+    count = np.maximum(n, 1).astype(float)
+
+    grid = np.broadcast_to(alphas, (G, len(alphas))).copy()
+    error = np.empty((G, len(alphas)))
+    for i, alpha in enumerate(alphas):
+        shrink = s2 / (s2 + alpha * count[:, None])            # (G, p)
+        resid = yc - np.einsum("gtk,gk->gt", U, shrink * uty)
+        if criterion == "loo":
+            # Leverage of the unpenalized intercept is 1/n on top of the slopes'
+            h = 1.0 / count[:, None] + np.einsum("gtk,gk->gt", U**2, shrink)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                loo = np.where(mask, resid / (1.0 - h), 0.0)
+            error[:, i] = np.einsum("gt,gt->g", loo, loo) / count
+        else:
+            df = 1.0 + shrink.sum(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                error[:, i] = np.einsum("gt,gt->g", resid, resid) / count / (1.0 - df / count) ** 2
+    best = np.argmin(np.where(np.isfinite(error), error, np.inf), axis=1)
+
+    alpha = alphas[best] * count
+    V = np.swapaxes(Vt, 1, 2)
+    b = np.einsum("gjk,gk->gj", V, s / (s2 + alpha[:, None]) * uty)
+    cov = np.einsum("gjk,gk,glk->gjl", V, s2 / (s2 + alpha[:, None]) ** 2, V)
+    df = 1.0 + (s2 / (s2 + alpha[:, None])).sum(axis=1)
+    fit = _to_original_units(b, cov, df, Z, yc, x_mean, x_scale, y_mean, n, alphas[best])
+    return fit, CVPath(grid=grid, error=error, best=best)
+
+
+# ────────────────────────────────────────────────────────
+# Lasso
+# ────────────────────────────────────────────────────────
+def _soft_threshold(x: np.ndarray, t: np.ndarray) -> np.ndarray:
+    return np.sign(x) * np.maximum(np.abs(x) - t, 0.0)
+
+
+def lasso_path(
+    Q: np.ndarray,
+    c: np.ndarray,
+    lambdas: np.ndarray,
+    tol: float = 1e-10,
+    max_sweeps: int = 1000,
+) -> np.ndarray:
+    """Solve many lasso problems along a decreasing λ path.
+
+    Each problem is given by its standardized Gram matrix Q = ZᵀZ/n and
+    c = Zᵀy/n; the objective is ½bᵀQb − cᵀb + λ‖b‖₁. With a handful of
+    collinear drivers, plain coordinate descent needs hundreds of sweeps
+    per λ, so every λ starts with active-set Newton steps (solve the KKT
+    system on the current active set, drop coordinates whose sign flips, add
+    the worst violator), warm-started from the previous λ. Coordinate
+    descent then polishes the result; from the exact solution it stops
+    after one sweep.
+
+    Args:
+        Q (np.ndarray): (B, p, p) Gram matrices.
+        c (np.ndarray): (B, p) correlations with the response.
+        lambdas (np.ndarray): (B, L) penalties, decreasing along axis 1.
+        tol (float): Coordinate descent stops once no coefficient moves more
+            than this.
+        max_sweeps (int): Upper bound on coordinate sweeps per λ.
+
+    Returns:
+        np.ndarray: (B, L, p) coefficients.
+    """
+    B, p = c.shape
+    diag = np.diagonal(Q, axis1=1, axis2=2)
+    usable = diag > 0          # all-zero (constant) columns stay at zero
+    safe_diag = np.where(usable, diag, 1.0)
+    eye = np.eye(p)
+    rows = np.arange(B)
+
+    active = np.zeros((B, p), dtype=bool)
+    sign = np.zeros((B, p))
+    b = np.zeros((B, p))
+    out = np.empty((B, lambdas.shape[1], p))
+    for i in range(lambdas.shape[1]):
+        lam = lambdas[:, i]
+        for _ in range(4 * p):
+            pair = active[:, :, None] & active[:, None, :]
+            # A tiny ridge keeps exactly collinear active sets solvable
+            system = np.where(pair, Q + 1e-12 * eye, eye)
+            rhs = np.where(active, c - lam[:, None] * sign, 0.0)
+            b = np.linalg.solve(system, rhs[..., None])[..., 0]
+            flipped = active & (b * sign <= 0)
+            grad = c - np.einsum("bjk,bk->bj", Q, b)
+            excess = np.where(~active & usable, np.abs(grad) - lam[:, None] * (1 + 1e-9), 0.0)
+            violated = excess > 0
+            if not (flipped.any() or violated.any()):
+                break
+            # Drop sign flips first; otherwise add the worst violator
+            add = ~flipped.any(axis=1) & violated.any(axis=1)
+            worst = np.argmax(excess, axis=1)
+            active &= ~flipped
+            active[rows[add], worst[add]] = True
+            sign = np.where(active, np.where(sign != 0, sign, np.sign(grad)), 0.0)
+        b = np.where(active, b, 0.0)
+
+        for _ in range(max_sweeps):
+            largest = np.zeros(B)
+            for j in range(p):
+                # Partial residual correlation, leaving coordinate j out
+                rho = c[:, j] - np.einsum("bk,bk->b", Q[:, j, :], b) + diag[:, j] * b[:, j]
+                new = np.where(usable[:, j], _soft_threshold(rho, lam) / safe_diag[:, j], 0.0)
+                largest = np.maximum(largest, np.abs(new - b[:, j]))
+                b[:, j] = new
+            if largest.max(initial=0.0) <= tol:
+                break
+        active, sign = b != 0, np.sign(b)
+        out[:, i] = b
+    return out
+
+
+def _fold_ids(mask: np.ndarray, folds: int) -> np.ndarray:
+    """Assign each real row to one of `folds` interleaved folds (padding gets -1)."""
+    position = np.cumsum(mask, axis=1) - 1
+    return np.where(mask, position % folds, -1)
+
+
+def _split_moments(Z: np.ndarray, yc: np.ndarray, train: np.ndarray):
+    """Standardize every training split on its own rows.
+
+    Args:
+        Z, yc: Group-standardized data, (G, T, p) and (G, T).
+        train (np.ndarray): (S, G, T) training masks.
+
+    Returns:
+        tuple: (Q, c, z_mean, z_scale, y_mean) for each split, shaped (S, G, ...).
+    """
+    w = train.astype(float)
+    n = np.maximum(w.sum(axis=2), 1.0)
+    z_mean = np.einsum("sgt,gtp->sgp", w, Z) / n[..., None]
+    y_mean = np.einsum("sgt,gt->sg", w, yc) / n
+    zz = np.einsum("sgt,gtp,gtq->sgpq", w, Z, Z) / n[..., None, None]
+    zy = np.einsum("sgt,gtp,gt->sgp", w, Z, yc) / n[..., None]
+    cov = zz - z_mean[..., :, None] * z_mean[..., None, :]
+    cross = zy - z_mean * y_mean[..., None]
+    var = np.clip(np.diagonal(cov, axis1=2, axis2=3), 0.0, None)
+    z_scale = np.sqrt(var)
+    z_scale = np.where(z_scale > 1e-12, z_scale, 1.0)
+    Q = cov / (z_scale[..., :, None] * z_scale[..., None, :])
+    # Columns constant within a split carry no information there
+    constant = var <= 1e-24
+    Q = np.where(constant[..., :, None] | constant[..., None, :], 0.0, Q)
+    c = np.where(constant, 0.0, cross / z_scale)
+    return Q, c, z_mean, z_scale, y_mean
+
+
+def lasso_cv(
+    X3: np.ndarray,
+    y2: np.ndarray,
+    mask: np.ndarray,
+    ratios: Optional[np.ndarray] = None,
+    folds: int = DEFAULT_FOLDS,
+) -> tuple[OLSFit, CVPath]:
+    """Fit lasso regressions, choosing each group's λ by K-fold cross-validation.
+
+    Every group's full-data problem and its K training splits are solved
+    together along the same λ path (glmnet's convention: ratios of the
+    group's λ_max on the full data).
+
+    Args:
+        X3 (np.ndarray): (G, T, p+1) designs with the intercept column first.
+        y2 (np.ndarray): (G, T) responses.
+        mask (np.ndarray): (G, T) True for real rows.
+        ratios (np.ndarray): Decreasing fractions of λ_max (default LASSO_RATIOS).
+        folds (int): Number of interleaved folds (rows alternate between
+            folds in order, so each fold spans the whole period).
+
+    Returns:
+        tuple: (OLSFit at each group's best λ, CVPath). Standard errors and
+               xtx_inv are those of OLS on the selected drivers, and rank
+               counts the intercept plus the non-zero slopes.
+    """
+    if folds < 2:
+        raise ValueError(f"Cross-validation needs at least 2 folds, got {folds}.")
+    ratios = LASSO_RATIOS if ratios is None else np.asarray(ratios, dtype=float)
+    Z, yc, x_mean, x_scale, y_mean, n = _standardize(X3, y2, mask)
+    G, T, p = Z.shape
+    count = np.maximum(n, 1).astype(float)
+
+    fold = _fold_ids(mask, folds)
+    # Split 0 is the full data, splits 1..K leave out one fold each
+    train = np.stack([mask] + [mask & (fold != k) for k in range(folds)])
+    Q, c, z_mean, z_scale, s_mean = _split_moments(Z, yc, train)
+
+    lam_max = np.abs(c[0]).max(axis=1)
+    grid = lam_max[:, None] * ratios[None, :]                           # (G, L)
+    S = folds + 1
+    coefs = lasso_path(
+        Q.reshape(S * G, p, p), c.reshape(S * G, p), np.tile(grid, (S, 1))
+    ).reshape(S, G, len(ratios), p)
+
+    # Score each split's path on its held-out fold from the fold's moments
+    # (no (G, L, T) prediction array): a split predicts y ≈ a + Zβ with
+    # β = b / z_scale and a = ȳ_train − z̄_train·β
+    error = np.zeros((G, len(ratios)))
+    for k in range(folds):
+        held = (fold == k).astype(float)
+        n_h = held.sum(axis=1)
+        Sz = np.einsum("gt,gtp->gp", held, Z)
+        Szz = np.einsum("gt,gtp,gtq->gpq", held, Z, Z)
+        Sy = np.einsum("gt,gt->g", held, yc)
+        Syy = np.einsum("gt,gt->g", held, yc**2)
+        Szy = np.einsum("gt,gtp,gt->gp", held, Z, yc)
+        beta = coefs[k + 1] / z_scale[k + 1][:, None, :]                        # (G, L, p)
+        a = s_mean[k + 1][:, None] - np.einsum("gp,glp->gl", z_mean[k + 1], beta)
+        error += (
+            Syy[:, None]
+            - 2 * a * Sy[:, None]
+            - 2 * np.einsum("glp,gp->gl", beta, Szy)
+            + n_h[:, None] * a**2
+            + 2 * a * np.einsum("glp,gp->gl", beta, Sz)
+            + np.einsum("glp,gpq,glq->gl", beta, Szz, beta)
+        )
+    error = np.maximum(error, 0.0) / count[:, None]
+    best = np.argmin(error, axis=1)
+
+    # Full-data coefficients at the chosen λ, back on the group-standardized scale
+    b = coefs[0, np.arange(G), best] / z_scale[0]
+    active = b != 0
+    gram = np.einsum("gtp,gtq->gpq", Z, Z) * (active[:, :, None] & active[:, None, :])
+    cov = np.linalg.pinv(gram, hermitian=True)
+    df = 1.0 + active.sum(axis=1)
+    fit = _to_original_units(b, cov, df, Z, yc, x_mean, x_scale, y_mean, n, grid[np.arange(G), best])
+    return fit, CVPath(grid=grid, error=error, best=best)
+
+
+def fit(method: str, X3: np.ndarray, y2: np.ndarray, mask: np.ndarray) -> OLSFit:
+    """Fit one penalized family ("ridge" or "lasso") with its default tuning."""
+    if method == "ridge":
+        return ridge_cv(X3, y2, mask)[0]
+    if method == "lasso":
+        return lasso_cv(X3, y2, mask)[0]
+    raise ValueError(f"Unknown penalized method {method!r}; use 'ridge' or 'lasso'.")
@@ -0,0 +1,194 @@
+"""
+Scenario sweeps: how a state's predicted CO₂ per capita responds as one or
+two drivers vary over a range while the others stay at a base scenario.
+
+The grid (up to MAX_POINTS points, e.g. 2000 × 2000) is never built as one
+feature matrix: iter_grid() yields it in chunks of feature rows, and every
+chunk is scored through data_service's batched path (predict_co2_batch, or
+predict_co2_intervals when a prediction band is wanted), so memory stays at
+one chunk plus the result arrays. The result is reshaped to the grid, and
+to_frame() thins it to a size a chart can draw.
+
+Usage:
+    result = sweep("WY", base_row, [axis("Coal Electricity Consumption", 0, 5e7, 500)], level=0.95)
+    result.estimate   # (500,) predicted CO₂ per capita
+"""
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import numpy as np
+
+import data_service
+import instrumentation
+import lazy_import
+
+pd = lazy_import.module("pandas")
+
+# Rows per scored chunk: large enough to amortize the per-call overhead,
+# small enough that a chunk's feature matrix stays around 10 MB
+DEFAULT_CHUNK_ROWS = 1 << 18
+
+# Largest grid a single sweep may request
+MAX_POINTS = 4_000_000
+
+
+@dataclass(frozen=True)
+class Axis:
+    """One swept driver and the values it takes."""
+
+    feature: str            # a data_service._FEATURES column name
+    values: np.ndarray      # (steps,) evenly spaced driver values
+
+
+@dataclass(frozen=True)
+class SweepResult:
+    """Scores over a sweep grid; array shapes follow the axes, first axis first."""
+
+    state: str
+    axes: tuple[Axis, ...]
+    estimate: np.ndarray
+    low: Optional[np.ndarray]       # prediction interval bounds (None without a level)
+    high: Optional[np.ndarray]
+    level: Optional[float]
+    seconds: float                  # wall time spent scoring
+
+    @property
+    def points(self) -> int:
+        return int(self.estimate.size)
+
+    def to_frame(self, max_points: Optional[int] = None) -> "pd.DataFrame":
+        """Return the grid in long format, one row per point.
+
+        Args:
+            max_points (int): Thin every axis evenly (keeping its first
+                value) until at most this many points remain, e.g. to keep a
+                chart responsive. Default: every point.
+
+        Returns:
+            pd.DataFrame: One column per swept feature, then "estimate" and,
+                          with a level, "low" and "high".
+        """
+        strides = [1] * len(self.axes)
+        if max_points is not None and self.points > max_points:
+            per_axis = max(1, int(max_points ** (1 / len(self.axes))))
+            strides = [max(1, math.ceil(len(a.values) / per_axis)) for a in self.axes]
+        index = tuple(slice(None, None, s) for s in strides)
+
+        values = [a.values[::s] for a, s in zip(self.axes, strides)]
+        mesh = np.meshgrid(*values, indexing="ij")
+        columns = {a.feature: m.ravel() for a, m in zip(self.axes, mesh)}
+        columns["estimate"] = self.estimate[index].ravel()
+        if self.low is not None:
+            columns["low"] = self.low[index].ravel()
+            columns["high"] = self.high[index].ravel()
+        return pd.DataFrame(columns)
+
+
+def axis(feature: str, low: float, high: float, steps: int) -> Axis:
+    """Build an evenly spaced axis for one driver.
+
+    Args:
+        feature (str): Driver column name (one of data_service._FEATURES).
+        low (float): First value.
+        high (float): Last value.
+        steps (int): Number of values, at least 1.
+
+    Returns:
+        Axis: The driver and its values.
+    """
+    if feature not in data_service._FEATURES:
+        raise ValueError(f"Unknown driver {feature!r}; choose among {data_service._FEATURES}.")
+    if steps < 1:
+        raise ValueError(f"An axis needs at least one step, got {steps}.")
+    if high < low:
+        raise ValueError(f"Range of {feature!r} is empty ({low} > {high}).")
+    return Axis(feature, np.linspace(float(low), float(high), int(steps)))
+
+
+def iter_grid(base, axes, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[tuple[slice, np.ndarray]]:
+    """Yield the sweep grid as feature-matrix chunks, in C (row-major) order.
+
+    Args:
+        base (sequence of float): Driver values in _FEATURES order; the
+            unswept drivers keep these.
+        axes (sequence of Axis): The swept drivers.
+        chunk_rows (int): Grid points per chunk.
+
+    Yields:
+        tuple: (positions, X) where positions is the slice of the flattened
+               grid the chunk covers and X its (m, p) feature matrix.
+    """
+    base = np.asarray(base, dtype=float)
+    shape = tuple(len(a.values) for a in axes)
+    columns = [data_service._FEATURES.index(a.feature) for a in axes]
+    total = math.prod(shape)
+    for start in range(0, total, chunk_rows):
+        stop = min(start + chunk_rows, total)
+        X = np.broadcast_to(base, (stop - start, base.size)).copy()
+        for a, col, idx in zip(axes, columns, np.unravel_index(np.arange(start, stop), shape)):
+            X[:, col] = a.values[idx]
+        yield slice(start, stop), X
+
+
+@instrumentation.timed("scenario.sweep")
+def sweep(
+    state: str,
+    base,
+    axes,
+    level: Optional[float] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> SweepResult:
+    """Score every point of a one- or two-driver sweep grid.
+
+    Args:
+        state (str): Two-letter state code whose model is used.
+        base (sequence of float): Base scenario, driver values in _FEATURES order.
+        axes (sequence of Axis): One or two swept drivers (distinct).
+        level (float): If given, also compute the prediction interval at
+            this coverage.
+        chunk_rows (int): Grid points scored per batched call.
+
+    Returns:
+        SweepResult: Estimates (and interval bounds) shaped like the grid.
+
+    Raises:
+        ValueError: Wrong number of axes, a driver swept twice, a bad base
+                    row, an unknown state or a grid above MAX_POINTS.
+    """
+    axes = tuple(axes)
+    if not 1 <= len(axes) <= 2:
+        raise ValueError(f"A sweep varies one or two drivers, got {len(axes)}.")
+    if len({a.feature for a in axes}) != len(axes):
+        raise ValueError("Each driver can be swept only once.")
+    if len(base) != len(data_service._FEATURES):
+        raise ValueError(f"The base scenario needs {len(data_service._FEATURES)} driver values, got {len(base)}.")
+    shape = tuple(len(a.values) for a in axes)
+    total = math.prod(shape)
+    if total > MAX_POINTS:
+        raise ValueError(f"The grid has {total:,} points; the limit is {MAX_POINTS:,}.")
+
+    start = time.perf_counter()
+    estimate = np.empty(total)
+    low = high = None
+    if level is not None:
+        low, high = np.empty(total), np.empty(total)
+    for positions, X in iter_grid(base, axes, chunk_rows):
+        if level is None:
+            estimate[positions] = data_service.predict_co2_batch(state, X)
+        else:
+            scored = data_service.predict_co2_intervals(state, X, level)
+            estimate[positions] = scored.estimate
+            low[positions], high[positions] = scored.pred_low, scored.pred_high
+
+    return SweepResult(
+        state=state.upper(),
+        axes=axes,
+        estimate=estimate.reshape(shape),
+        low=None if low is None else low.reshape(shape),
+        high=None if high is None else high.reshape(shape),
+        level=level,
+        seconds=time.perf_counter() - start,
+    )
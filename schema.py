@@ -0,0 +1,298 @@
+"""
+Declarative schema of the merged sheet, applied once when the dataset loads.
+
+Every column declares its canonical name, the aliases it may appear under,
+its unit, its kind ("category", "integer" or "number") and its allowed
+range. apply_schema() renames aliases to the canonical names, fails fast
+with SchemaError when a required column is absent or holds values of the
+wrong kind, downcasts numeric columns to the narrowest lossless dtype and
+returns a ValidationReport of everything it noticed on the way.
+
+Missing and out-of-range values are reported, not dropped: the rows stay in
+the frame, and only the pre-validated model arrays built by
+dataset_registry leave out rows with a missing model input.
+
+Command line:
+    python schema.py                 # validate the workbook's merged sheet
+    python schema.py data/panel.csv  # validate another ingested source
+"""
+
+import argparse
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+import lazy_import
+
+pd = lazy_import.module("pandas")
+
+
+class SchemaError(ValueError):
+    """The sheet cannot be used: a required column is missing or malformed."""
+
+
+@dataclass(frozen=True)
+class Column:
+    """Declaration of one sheet column."""
+
+    name: str
+    kind: str                       # "category", "integer" or "number"
+    unit: str = ""
+    aliases: tuple[str, ...] = ()
+    min: Optional[float] = None
+    max: Optional[float] = None
+    pattern: Optional[str] = None   # regular expression for category values
+    required: bool = True
+
+
+MERGED_SCHEMA = (
+    Column("State", "category", "USPS state code", ("state_code", "State Code"), pattern=r"[A-Z]{2}"),
+    Column("Year", "integer", "calendar year", min=1900, max=2100),
+    Column("co2 per capita", "number", "t CO₂ per person per year", ("CO2 per capita",), min=0),
+    Column("renewable energy", "number", "billion Btu per year", ("renewable_energy",), min=0),
+    Column("Coal Electricity Consumption", "number", "short tons per year", ("coal", "coal_elec"), min=0),
+    Column("Natural Gas Electricity Consumption", "number", "thousand cubic feet per year",
+           ("natural_gas", "gas_elec"), min=0),
+    Column("PCE per capita", "number", "USD per person", ("PCE", "pce_per_capita"), min=0),
+    Column("Estimated Urban Population", "number", "people", ("urban_population", "urban_pop"), min=0),
+)
+
+# Model inputs and output, in the order the regression uses them
+FEATURES = (
+    "renewable energy",
+    "Coal Electricity Consumption",
+    "Natural Gas Electricity Consumption",
+    "PCE per capita",
+    "Estimated Urban Population",
+)
+TARGET = "co2 per capita"
+
+
+@dataclass(frozen=True)
+class ValidationReport:
+    """What apply_schema() found and changed."""
+
+    rows: int
+    renamed: dict[str, str] = field(default_factory=dict)     # sheet name → canonical name
+    extra: list[str] = field(default_factory=list)           # columns not in the schema
+    missing: dict[str, int] = field(default_factory=dict)     # missing values per column
+    out_of_range: dict[str, int] = field(default_factory=dict)
+    dtypes: dict[str, str] = field(default_factory=dict)      # column → "before → after"
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def ok(self) -> bool:
+        """True when no value is missing or out of range."""
+        return not self.missing and not self.out_of_range
+
+    def issues(self) -> list[str]:
+        """Return one human-readable line per finding."""
+        lines = [f"Renamed column {old!r} to {new!r}" for old, new in self.renamed.items()]
+        lines += [f"Ignored unknown column {name!r}" for name in self.extra]
+        lines += [f"{n} missing value(s) in {name!r}" for name, n in self.missing.items()]
+        lines += [f"{n} out-of-range value(s) in {name!r}" for name, n in self.out_of_range.items()]
+        return lines
+
+    def summary(self) -> str:
+        """Return a short multi-line summary for logs and the command line."""
+        head = (
+            f"{self.rows} rows; {'valid' if self.ok else 'with issues'}; "
+            f"{self.bytes_before / 1024:.1f} KiB → {self.bytes_after / 1024:.1f} KiB after downcasting"
+        )
+        changed = [f"  {name}: {change}" for name, change in self.dtypes.items()]
+        return "\n".join([head] + changed + [f"  - {line}" for line in self.issues()])
+
+
+# ────────────────────────────────────────────────────────
+# Dtype narrowing
+# ────────────────────────────────────────────────────────
+def downcast_float(values: np.ndarray) -> np.ndarray:
+    """Return `values` as float32 if that is lossless, else as float64."""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(over="ignore", invalid="ignore"):
+        narrow = values.astype(np.float32)
+    return narrow if np.array_equal(narrow, values, equal_nan=True) else values
+
+
+def downcast_int(values: np.ndarray) -> np.ndarray:
+    """Return integer `values` in the narrowest signed dtype that holds them."""
+    values = np.asarray(values)
+    if values.size == 0:
+        return values.astype(np.int64)
+    lo, hi = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+# ────────────────────────────────────────────────────────
+# Validation
+# ────────────────────────────────────────────────────────
+def _normalize(name: str) -> str:
+    return re.sub(r"[\s_]+", " ", str(name)).strip().lower()
+
+
+def _resolve_columns(columns, schema) -> tuple[dict, list]:
+    """Map sheet column names onto schema columns by name or alias."""
+    lookup = {}
+    for column in schema:
+        for name in (column.name,) + column.aliases:
+            lookup[_normalize(name)] = column
+
+    matched, extra = {}, []
+    for name in columns:
+        column = lookup.get(_normalize(name))
+        if column is None:
+            extra.append(str(name))
+        elif column.name in matched.values():
+            other = next(k for k, v in matched.items() if v == column.name)
+            raise SchemaError(f"Columns {other!r} and {name!r} both map to {column.name!r}.")
+        else:
+            matched[name] = column.name
+    return matched, extra
+
+
+def _numeric(column: Column, series: "pd.Series") -> np.ndarray:
+    """Parse a column as numbers, raising SchemaError on the first non-number."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    numbers = pd.to_numeric(series, errors="coerce")
+    bad = numbers.isna() & series.notna()
+    if bad.any():
+        pos = int(np.argmax(bad.to_numpy()))
+        raise SchemaError(f"Column {column.name!r} row {pos + 1}: expected a number, got {series.iloc[pos]!r}.")
+    if numbers.dtype.kind in "biu":
+        return numbers.to_numpy()
+    return numbers.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _coerce(column: Column, series: "pd.Series"):
+    """Return (values, n_out_of_range) for one column."""
+    if column.kind == "category":
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            series = pd.Series(pd.Categorical(series.astype(str).where(series.notna())), index=series.index)
+        bad = 0
+        if column.pattern is not None:
+            cats = series.cat.categories.astype(str)
+            invalid = ~cats.str.fullmatch(column.pattern)
+            bad = int(series.isin(cats[invalid]).sum()) if invalid.any() else 0
+        return series.array, bad
+
+    values = _numeric(column, series)
+    if column.kind == "integer" and values.dtype.kind == "f":
+        finite = values[~np.isnan(values)]
+        if not np.array_equal(finite, np.round(finite)):
+            raise SchemaError(f"Column {column.name!r} must hold whole numbers.")
+        if len(finite) == len(values):
+            values = values.astype(np.int64)
+
+    present = values if values.dtype.kind in "biu" else values[~np.isnan(values)]
+    bad = 0
+    if column.min is not None:
+        bad += int((present < column.min).sum())
+    if column.max is not None:
+        bad += int((present > column.max).sum())
+
+    narrow = downcast_int(values) if values.dtype.kind in "biu" else downcast_float(values)
+    return narrow, bad
+
+
+def apply_schema(df: "pd.DataFrame", schema=MERGED_SCHEMA) -> "tuple[pd.DataFrame, ValidationReport]":
+    """Validate a raw sheet against a schema and narrow its dtypes.
+
+    Args:
+        df (pd.DataFrame): The sheet as loaded from disk.
+        schema (sequence of Column): Column declarations (default: the
+            merged sheet).
+
+    Returns:
+        tuple: (frame, report) where frame has canonical column names in the
+               sheet's order (unknown columns are dropped) and compact dtypes.
+
+    Raises:
+        SchemaError: A required column is missing (under every accepted
+                     name) or holds values of the wrong kind.
+    """
+    matched, extra = _resolve_columns(df.columns, schema)
+    missing = [c.name for c in schema if c.required and c.name not in matched.values()]
+    if missing:
+        accepted = {c.name: list(c.aliases) for c in schema if c.name in missing}
+        raise SchemaError(
+            f"Sheet is missing required columns {missing} (accepted aliases: {accepted}); "
+            f"found {[str(c) for c in df.columns]}."
+        )
+
+    by_name = {c.name: c for c in schema}
+    data, nulls, out_of_range, dtypes = {}, {}, {}, {}
+    for source, name in matched.items():
+        column, series = by_name[name], df[source]
+        values, bad = _coerce(column, series)
+        data[name] = values
+        n_null = int(series.isna().sum())
+        if n_null:
+            nulls[name] = n_null
+        if bad:
+            out_of_range[name] = bad
+        before, after = str(series.dtype), str(values.dtype)
+        if before != after:
+            dtypes[name] = f"{before} → {after}"
+
+    frame = pd.DataFrame(data, index=df.index)
+    report = ValidationReport(
+        rows=len(frame),
+        renamed={str(k): v for k, v in matched.items() if k != v},
+        extra=extra,
+        missing=nulls,
+        out_of_range=out_of_range,
+        dtypes=dtypes,
+        bytes_before=int(df.memory_usage(deep=True).sum()),
+        bytes_after=int(frame.memory_usage(deep=True).sum()),
+    )
+    return frame, report
+
+
+def describe(schema=MERGED_SCHEMA) -> "pd.DataFrame":
+    """Tabulate a schema (name, kind, unit, range, aliases) for display."""
+    return pd.DataFrame(
+        [
+            {
+                "column": c.name,
+                "kind": c.kind,
+                "unit": c.unit,
+                "min": c.min,
+                "max": c.max,
+                "aliases": ", ".join(c.aliases),
+            }
+            for c in schema
+        ]
+    ).set_index("column")
+
+
+# ────────────────────────────────────────────────────────
+# Command line
+# ────────────────────────────────────────────────────────
+def main(argv: Optional[list[str]] = None) -> int:
+    from dataset_cache import SHEET_NAME, WORKBOOK_PATH, load_sheet
+
+    parser = argparse.ArgumentParser(description="Validate a sheet against the merged-data schema.")
+    parser.add_argument("source", nargs="?", default=WORKBOOK_PATH)
+    parser.add_argument("--sheet", default=SHEET_NAME)
+    args = parser.parse_args(argv)
+
+    try:
+        _, report = apply_schema(load_sheet(args.source, args.sheet))
+    except SchemaError as exc:
+        print(f"Invalid: {exc}")
+        return 1
+    print(report.summary())
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+"""
+Headless HTTP scoring service over data_service.
+
+`app` is a plain ASGI application, so any ASGI server can host it
+(``uvicorn scoring_server:app``); ``python scoring_server.py`` runs it on a
+small built-in asyncio HTTP/1.1 server with no extra dependencies.
+
+Endpoints:
+    POST /predict   One row as a JSON object, many rows as a JSON array or
+                    {"rows": [...]}, or NDJSON (Content-Type:
+                    application/x-ndjson, one row per line, answered in kind).
+    GET  /healthz   Liveness and the model version in use.
+    GET  /metrics   Prometheus text: requests, latency histogram, batch sizes
+                    (plus instrumentation metrics when enabled).
+
+A row is {"state": "WY", ...} plus the five drivers under either the
+predict_co2 keyword names (renewable_energy, coal_elec, gas_elec,
+pce_per_capita, urban_pop) or the _FEATURES column names. Concurrent
+requests are micro-batched: rows arriving within a couple of milliseconds
+are scored together by one data_service.predict_co2_batch call, run in a
+worker thread so the event loop keeps accepting requests. Models are
+loaded at startup and followed by version: after a refit or a panel swap
+the next request validates states against the new fit. Request bodies over
+`max_body` bytes are answered with HTTP 413, and any other failure with
+HTTP 500; when a batch fails, its requests are re-scored one at a time so
+only the faulty one fails.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+
+import data_service
+import instrumentation
+from instrumentation import Histogram
+
+# predict_co2 keyword name → feature column, in _FEATURES order
+_ARG_NAMES = dict(zip(
+    ["renewable_energy", "coal_elec", "gas_elec", "pce_per_capita", "urban_pop"],
+    data_service._FEATURES,
+))
+
+_BATCH_BUCKETS = (1, 4, 16, 64, 256, 1024, 4096, 16384)
+
+
+# Largest accepted request body (about 50,000 rows of JSON)
+DEFAULT_MAX_BODY = 8 * 1024 * 1024
+
+
+class BadRequest(ValueError):
+    """A request the client must fix; answered with HTTP 400."""
+
+
+class PayloadTooLarge(BadRequest):
+    """A request body over the size limit; answered with HTTP 413."""
+
+
+# ────────────────────────────────────────────────────────
+# Micro-batching
+# ────────────────────────────────────────────────────────
+class MicroBatcher:
+    """Coalesce concurrent scoring requests into vectorized batches."""
+
+    def __init__(self, max_batch: int = 4096, max_delay: float = 0.002):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batch_sizes = Histogram(_BATCH_BUCKETS)
+        self._pending = []
+        self._rows = 0
+        self._timer = None
+        self._scoring = set()   # batches being scored (the loop keeps only weak references)
+
+    async def submit(self, states: np.ndarray, X: np.ndarray) -> np.ndarray:
+        """Queue rows for the next batch and wait for their predictions."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((states, X, future))
+        self._rows += len(states)
+        if self._rows >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._rows = self._pending, [], 0
+        if pending:
+            task = asyncio.ensure_future(self._score(pending))
+            self._scoring.add(task)
+            task.add_done_callback(self._scoring.discard)
+
+    async def _score(self, pending: list) -> None:
+        states = np.concatenate([p[0] for p in pending])
+        X = np.vstack([p[1] for p in pending])
+        self.batch_sizes.observe(len(states))
+        try:
+            preds = await asyncio.to_thread(data_service.predict_co2_batch, states, X)
+        except Exception as exc:
+            if len(pending) == 1:
+                _settle(pending[0][2], exc=exc)
+                return
+            # One bad request must not fail the others: score each on its own
+            for part_states, part_X, future in pending:
+                try:
+                    part = await asyncio.to_thread(data_service.predict_co2_batch, part_states, part_X)
+                except Exception as part_exc:
+                    _settle(future, exc=part_exc)
+                else:
+                    _settle(future, part)
+            return
+
+        offset = 0
+        for part_states, _, future in pending:
+            n = len(part_states)
+            _settle(future, preds[offset:offset + n])
+            offset += n
+
+
+def _settle(future: asyncio.Future, result=None, exc: Optional[BaseException] = None) -> None:
+    """Resolve a request's future unless its client has already gone."""
+    if future.done():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+# ────────────────────────────────────────────────────────
+# Request parsing
+# ────────────────────────────────────────────────────────
+def parse_rows(rows: list, known_states) -> tuple[np.ndarray, np.ndarray]:
+    """Validate request rows and turn them into (states, X) arrays."""
+    if not rows:
+        raise BadRequest("No rows to score.")
+    states = np.empty(len(rows), dtype=object)
+    X = np.empty((len(rows), len(data_service._FEATURES)))
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict) or not isinstance(row.get("state"), str):
+            raise BadRequest(f"Row {i} must be an object with a 'state' string.")
+        state = row["state"].upper()
+        if state not in known_states:
+            raise BadRequest(f"Model for state {state} not found. Choose among {sorted(known_states)}.")
+        states[i] = state
+        for j, (arg, feat) in enumerate(_ARG_NAMES.items()):
+            value = row.get(arg, row.get(feat))
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise BadRequest(f"Row {i} needs a numeric '{arg}' (or '{feat}').")
+            if not math.isfinite(value):
+                raise BadRequest(f"Row {i}: '{arg}' must be a finite number, got {value}.")
+            X[i, j] = value
+    return states.astype(str), X
+
+
+class ScoringApp:
+    """ASGI application serving predictions from data_service."""
+
+    def __init__(self, max_batch: int = 4096, max_delay: float = 0.002, max_body: int = DEFAULT_MAX_BODY):
+        self.batcher = MicroBatcher(max_batch, max_delay)
+        self.max_body = max_body
+        self.latency = {}
+        self.requests = {}
+        self._states = frozenset()
+        self._version = None
+
+    def warm(self) -> None:
+        """Load (or fit) the models so the first request only scores."""
+        self.known_states()
+
+    def known_states(self) -> frozenset:
+        """Return the states of the models in use, re-read whenever their version changes."""
+        version = data_service.model_version()
+        if version != self._version:
+            self._states = frozenset(data_service.get_model_fit()[0])
+            self._version = version
+        return self._states
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        start = time.perf_counter()
+        route = f'{scope["method"]} {scope["path"]}'
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        try:
+            body = await self._read_body(receive, headers)
+            status, content_type, payload = await self._route(scope["method"], scope["path"], headers, body)
+        except BadRequest as exc:
+            status = 413 if isinstance(exc, PayloadTooLarge) else 400
+            content_type, payload = "application/json", json.dumps({"error": str(exc)}).encode()
+        except Exception as exc:  # answer and count it rather than drop the connection
+            status, content_type = 500, "application/json"
+            payload = json.dumps({"error": f"{type(exc).__name__}: {exc}"}).encode()
+
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(payload)).encode())],
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+        key = (route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        self.latency.setdefault(route, Histogram()).observe(time.perf_counter() - start)
+
+    async def _read_body(self, receive, headers: dict) -> bytes:
+        """Read the request body, refusing more than max_body bytes."""
+        too_large = PayloadTooLarge(f"Request body exceeds {self.max_body:,} bytes; split the rows.")
+        if int(headers.get("content-length") or 0) > self.max_body:
+            raise too_large
+        chunks, size, more = [], 0, True
+        while more:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > self.max_body:
+                raise too_large
+            more = message.get("more_body", False)
+        return b"".join(chunks)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await asyncio.to_thread(self.warm)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _route(self, method: str, path: str, headers: dict, body: bytes):
+        if path == "/healthz" and method == "GET":
+            payload = {"status": "ok", "model_version": data_service.model_version()}
+            return 200, "application/json", json.dumps(payload).encode()
+        if path == "/metrics" and method == "GET":
+            return 200, "text/plain; version=0.0.4", self.render_metrics().encode()
+        if path == "/predict" and method == "POST":
+            return await self._predict(headers, body)
+        return 404, "application/json", json.dumps({"error": f"No route {method} {path}"}).encode()
+
+    async def _predict(self, headers: dict, body: bytes):
+        ndjson = headers.get("content-type", "").startswith("application/x-ndjson")
+        single = False
+        try:
+            if ndjson:
+                rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+            else:
+                data = json.loads(body or b"null")
+                if isinstance(data, dict) and "rows" in data:
+                    rows = data["rows"]
+                elif isinstance(data, dict):
+                    rows, single = [data], True
+                else:
+                    rows = data
+        except ValueError as exc:
+            raise BadRequest(f"Malformed JSON: {exc}") from None
+        if not isinstance(rows, list):
+            raise BadRequest("Expected a JSON object, a JSON array or {'rows': [...]}.")
+
+        # A refit or panel swap since the last request (re)loads models off the event loop
+        known = await asyncio.to_thread(self.known_states)
+        version = self._version
+        states, X = parse_rows(rows, known)
+        preds = await self.batcher.submit(states, X)
+
+        if ndjson:
+            lines = (json.dumps({"state": s, "prediction": float(p)}) for s, p in zip(states, preds))
+            return 200, "application/x-ndjson", ("\n".join(lines) + "\n").encode()
+        if single:
+            payload = {"state": states[0], "prediction": float(preds[0]), "model_version": version}
+        else:
+            payload = {"predictions": preds.tolist(), "model_version": version}
+        return 200, "application/json", json.dumps(payload).encode()
+
+    def render_metrics(self) -> str:
+        """Render request counts and histograms in Prometheus text format."""
+        lines = ["# TYPE co2_requests_total counter"]
+        for (route, status), count in sorted(self.requests.items()):
+            lines.append(f'co2_requests_total{{route="{route}",status="{status}"}} {count}')
+        lines.append("# TYPE co2_request_latency_seconds histogram")
+        for route, hist in sorted(self.latency.items()):
+            lines += hist.render("co2_request_latency_seconds", f'route="{route}"')
+        lines.append("# TYPE co2_batch_rows histogram")
+        lines += self.batcher.batch_sizes.render("co2_batch_rows")
+        # Service-level spans and caches, when CO2_INSTRUMENTATION is on
+        return "\n".join(lines) + "\n" + (instrumentation.render_prometheus() if instrumentation.enabled() else "")
+
+
+app = ScoringApp()
+
+
+# ────────────────────────────────────────────────────────
+# Built-in HTTP/1.1 server (for running without an ASGI server)
+# ────────────────────────────────────────────────────────
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+async def _serve_connection(asgi_app, reader, writer) -> None:
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, target, version = request_line.decode("latin-1").split()
+            headers = []
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers.append((name.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+            header_map = dict(headers)
+            length = int(header_map.get(b"content-length", b"0"))
+            if length > getattr(asgi_app, "max_body", length):
+                # Answer without reading the body, then drop the connection
+                writer.write(b"HTTP/1.1 413 Payload Too Large\r\ncontent-length: 0\r\nconnection: close\r\n\r\n")
+                await writer.drain()
+                break
+            body = await reader.readexactly(length) if length else b""
+
+            path, _, query = target.partition("?")
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": version.split("/")[-1],
+                "method": method,
+                "path": path,
+                "query_string": query.encode("latin-1"),
+                "headers": headers,
+            }
+            response = {}
+
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    response.update(status=message["status"], headers=message.get("headers", []))
+                else:
+                    response["body"] = response.get("body", b"") + message.get("body", b"")
+
+            try:
+                await asgi_app(scope, receive, send)
+            except Exception:
+                response = {"status": 500, "headers": [], "body": b""}
+
+            keep_alive = version == "HTTP/1.1" and header_map.get(b"connection", b"").lower() != b"close"
+            status = response["status"]
+            head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+            head += [f"{k.decode('latin-1')}: {v.decode('latin-1')}" for k, v in response["headers"]]
+            head.append(f"connection: {'keep-alive' if keep_alive else 'close'}")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.get("body", b""))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8000, asgi_app: Optional[ScoringApp] = None):
+    """Start the built-in server and return the asyncio.Server."""
+    asgi_app = asgi_app or app
+    asgi_app.warm()
+    return await asyncio.start_server(lambda r, w: _serve_connection(asgi_app, r, w), host, port)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve CO₂ predictions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    async def run():
+        server = await serve(args.host, args.port)
+        print(f"Scoring service on http://{args.host}:{args.port} (model {data_service.model_version()})")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
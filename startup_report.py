@@ -0,0 +1,162 @@
+"""
+Import-time report and budgets for the app's entry points.
+
+Each entry point (a service module or a page script) is started in a fresh
+interpreter under ``python -X importtime``. The report gives its total import
+time, the slowest modules it pulled in, and which heavy libraries it
+loaded. Every entry point has a time budget and a list of modules it must
+not import: pages that show no data must never reach dataset_registry, and
+the services defer pandas until a function actually needs a DataFrame (see
+lazy_import.py).
+
+Command line:
+    python startup_report.py                     # every entry point vs. its budget
+    python startup_report.py Home.py -n 15       # one entry point, 15 slowest modules
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Libraries worth calling out in the report when an entry point loads them
+HEAVY_MODULES = ("pandas", "numpy", "PIL", "openpyxl", "pyarrow", "altair")
+
+
+@dataclass(frozen=True)
+class EntryPoint:
+    """How to start one entry point and what it may cost."""
+
+    code: str                           # Python statement run under -X importtime
+    budget_ms: float                    # total import time allowed
+    forbidden: tuple[str, ...] = ()     # modules it must never import
+
+
+def _page(path: str) -> str:
+    return f"import runpy; runpy.run_path({path!r}, run_name='__main__')"
+
+
+# Budgets exclude the bare interpreter's own imports and leave ~3× headroom
+# over a typical laptop, so only a real regression (a new eager pandas
+# import, say) trips them
+ENTRY_POINTS = {
+    "instrumentation": EntryPoint("import instrumentation", 30, ("numpy", "pandas")),
+    "dataset_cache": EntryPoint("import dataset_cache", 60, ("numpy", "pandas")),
+    "data_service": EntryPoint("import data_service", 250, ("pandas",)),
+    "scoring_server": EntryPoint("import scoring_server", 300, ("pandas",)),
+    "Home.py": EntryPoint(_page("Home.py"), 1000, ("pandas", "dataset_registry")),
+    "pages/04_HASS_Reflection.py": EntryPoint(
+        _page("pages/04_HASS_Reflection.py"), 1000, ("pandas", "dataset_registry")
+    ),
+}
+
+
+@dataclass
+class ImportProfile:
+    """Parsed ``-X importtime`` output of one interpreter run."""
+
+    total_us: int = 0
+    # module → (self µs, cumulative µs)
+    modules: dict[str, tuple[int, int]] = field(default_factory=dict)
+
+    def slowest(self, n: int = 10) -> list[tuple[str, int, int]]:
+        """Return the n modules with the largest self time."""
+        ranked = sorted(self.modules.items(), key=lambda item: item[1][0], reverse=True)
+        return [(name, self_us, cum_us) for name, (self_us, cum_us) in ranked[:n]]
+
+
+def parse_importtime(text: str, startup: frozenset = frozenset()) -> ImportProfile:
+    """Parse the stderr of ``python -X importtime``.
+
+    Args:
+        text (str): Raw stderr; lines other than "import time:" are ignored.
+        startup (frozenset): Modules the bare interpreter imports anyway
+            (encodings, site, ...); they are left out of total_us.
+
+    Returns:
+        ImportProfile: Per-module times; total_us sums the top-level imports.
+    """
+    profile = ImportProfile()
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue   # the header line
+        self_us, cum_us, name = int(parts[0]), int(parts[1]), parts[2]
+        module = name.strip()
+        profile.modules[module] = (self_us, cum_us)
+        if name[1:] == module and module not in startup:   # not indented: imported directly by the entry point
+            profile.total_us += cum_us
+    return profile
+
+
+def _run(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": ROOT},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+    return result.stderr
+
+
+_startup_modules = None
+
+
+def measure(code: str) -> ImportProfile:
+    """Run `code` in a fresh interpreter under -X importtime and parse the result."""
+    global _startup_modules
+    if _startup_modules is None:
+        _startup_modules = frozenset(parse_importtime(_run("pass")).modules)
+    return parse_importtime(_run(code), _startup_modules)
+
+
+def check(name: str, profile: Optional[ImportProfile] = None) -> list[str]:
+    """Return the budget violations of one entry point (empty when within budget)."""
+    entry = ENTRY_POINTS[name]
+    profile = profile or measure(entry.code)
+    problems = [f"{name} imports {module}" for module in entry.forbidden if module in profile.modules]
+    if profile.total_us > entry.budget_ms * 1000:
+        problems.append(f"{name} takes {profile.total_us / 1000:.0f} ms to import (budget {entry.budget_ms:g} ms)")
+    return problems
+
+
+# ────────────────────────────────────────────────────────
+# Command line
+# ────────────────────────────────────────────────────────
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report import time of the app's entry points.")
+    parser.add_argument("entry", nargs="*", help=f"Entry points (default: all of {', '.join(ENTRY_POINTS)}).")
+    parser.add_argument("-n", type=int, default=5, help="Slowest modules to list per entry point.")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.entry if name not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"unknown entry point(s) {unknown}")
+
+    failures = 0
+    for name in args.entry or ENTRY_POINTS:
+        profile = measure(ENTRY_POINTS[name].code)
+        problems = check(name, profile)
+        failures += bool(problems)
+        heavy = [module for module in HEAVY_MODULES if module in profile.modules]
+        print(
+            f"{name:<30} {profile.total_us / 1000:8.1f} ms  (budget {ENTRY_POINTS[name].budget_ms:g} ms)  "
+            f"heavy: {', '.join(heavy) or '-'}"
+        )
+        for module, self_us, cum_us in profile.slowest(args.n):
+            print(f"    {module:<40} self {self_us / 1000:7.1f} ms   cumulative {cum_us / 1000:7.1f} ms")
+        for problem in problems:
+            print(f"  ! {problem}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
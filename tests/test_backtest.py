@@ -0,0 +1,95 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+import data_service
+import regularized
+from data_service import _FEATURES, load_merged_data
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("CO2_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_make_folds_expanding_and_rolling():
+    years = np.arange(1998, 2024)
+    expanding = backtest.make_folds(years, "expanding", horizon=4, min_train=10)
+    assert expanding[0].tolist() == [1998, 2007, 2011]
+    assert expanding[-1].tolist() == [1998, 2022, 2023]
+
+    rolling = backtest.make_folds(years, "rolling", horizon=2, window=5, cutoffs=[2005, 2010])
+    assert rolling.tolist() == [[2001, 2005, 2007], [2006, 2010, 2012]]
+
+    with pytest.raises(ValueError):
+        backtest.make_folds(years, "rolling")
+
+
+def test_readme_split_matches_manual_holdout(cache_dir):
+    """Cutoff 2019 / horizon 4 is the README's 1998–2019 train, 2020–2023 test."""
+    results = backtest.run_backtest(cutoffs=[2019], horizon=4)
+    wy = results[results["State"] == "WY"].iloc[0]
+    assert (wy["train_start"], wy["cutoff"], wy["test_end"]) == (1998, 2019, 2023)
+
+    df = load_merged_data()
+    df_wy = df[df["State"] == "WY"]
+    train, test = df_wy[df_wy["Year"] <= 2019], df_wy[df_wy["Year"] > 2019]
+    X = np.hstack([np.ones((len(train), 1)), train[_FEATURES].to_numpy(dtype=float)])
+    beta, *_ = np.linalg.lstsq(X, train["co2 per capita"].to_numpy(dtype=float), rcond=None)
+    pred = beta[0] + test[_FEATURES].to_numpy(dtype=float) @ beta[1:]
+    y = test["co2 per capita"].to_numpy(dtype=float)
+    rmse = np.sqrt(np.mean((y - pred) ** 2))
+
+    assert wy["n_train"] == 22 and wy["n_test"] == 4
+    assert wy["rmse"] == pytest.approx(rmse, rel=1e-6)
+    assert wy["nrmse"] == pytest.approx(rmse / y.mean(), rel=1e-6)
+    assert wy["range_rmse"] == pytest.approx(rmse / np.ptp(df_wy["co2 per capita"]), rel=1e-6)
+
+
+def test_process_pool_matches_serial(cache_dir):
+    serial = backtest.run_backtest(mode="rolling", window=8, use_cache=False)
+    pooled = backtest.run_backtest(mode="rolling", window=8, workers=2, use_cache=False)
+    pd.testing.assert_frame_equal(serial, pooled)
+    assert len(serial) == 50 * len(backtest.make_folds(np.arange(1998, 2024), "rolling", window=8))
+
+
+def test_rerun_with_unchanged_data_hits_cache(cache_dir, monkeypatch):
+    first = backtest.run_backtest(horizon=2)
+
+    def forbidden(*args):
+        raise AssertionError("folds were recomputed despite a cached result")
+
+    monkeypatch.setattr(backtest, "_score_folds", forbidden)
+    pd.testing.assert_frame_equal(backtest.run_backtest(horizon=2), first)
+    assert list(backtest.summarize(first, by="cutoff").columns) == ["rmse", "range_rmse", "nrmse"]
+
+
+def test_folds_use_the_configured_model_family(cache_dir):
+    ols = backtest.run_backtest(cutoffs=[2015], horizon=4, use_cache=False)
+    data_service.configure_models("ridge", per_state={"WY": "ols"})
+    try:
+        mixed = backtest.run_backtest(cutoffs=[2015], horizon=4, use_cache=False)
+    finally:
+        data_service.configure_models()
+
+    assert (ols["method"] == "ols").all()
+    assert mixed.set_index("State")["method"].to_dict() == {
+        state: "ols" if state == "WY" else "ridge" for state in mixed["State"]
+    }
+    by_state = mixed.set_index("State")
+    assert by_state.loc["WY", "rmse"] == pytest.approx(ols.set_index("State").loc["WY", "rmse"], rel=1e-12)
+
+    # Ridge is tuned on the training years alone, exactly as a stand-alone fit
+    states, X3, y2, mask, years2 = data_service.stack_panel()
+    g = states.index("ND")
+    train = mask[g:g + 1] & (years2[g:g + 1] <= 2015)
+    fit = regularized.fit("ridge", X3[g:g + 1], y2[g:g + 1], train)
+    test = mask[g] & (years2[g] > 2015) & (years2[g] <= 2019)
+    rmse = np.sqrt(np.mean((y2[g, test] - X3[g, test] @ fit.coef[0]) ** 2))
+    assert by_state.loc["ND", "rmse"] == pytest.approx(rmse, rel=1e-9)
+    assert by_state.loc["ND", "rmse"] != pytest.approx(ols.set_index("State").loc["ND", "rmse"], rel=1e-6)
@@ -0,0 +1,119 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import io
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bulk_scoring
+import data_service
+from schema import SchemaError
+
+BASE = [6611.0, 26831408.0, 4052911.0, 20184.0, 322110.0]
+
+
+def scenarios(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Scenario rows around the WY base case, under the predict_co2 keyword aliases."""
+    rng = np.random.default_rng(seed)
+    X = np.asarray(BASE) * rng.uniform(0.5, 1.5, size=(n_rows, 5))
+    frame = pd.DataFrame(X, columns=["renewable_energy", "coal_elec", "gas_elec", "PCE", "urban_pop"])
+    frame.insert(0, "state_code", np.array(["WY", "ND", "AK", "VT"])[rng.integers(0, 4, n_rows)])
+    frame.insert(0, "scenario", np.arange(n_rows))
+    return frame
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_round_trip_matches_batched_predictions(tmp_path, fmt):
+    df = scenarios(500)
+    source, output = str(tmp_path / f"in.{fmt}"), str(tmp_path / f"out.{fmt}")
+    getattr(df, f"to_{fmt}")(source, index=False)
+
+    report = bulk_scoring.score_file(source, output, chunk_rows=64)
+    out = pd.read_csv(output) if fmt == "csv" else pd.read_parquet(output)
+
+    assert (report.rows, report.scored, report.skipped, report.chunks) == (500, 500, 0, 8)
+    assert out["scenario"].tolist() == list(range(500))
+    X = df[["renewable_energy", "coal_elec", "gas_elec", "PCE", "urban_pop"]].to_numpy()
+    expected = data_service.predict_co2_batch(df["state_code"].to_numpy(), X)
+    np.testing.assert_allclose(out[bulk_scoring.PREDICTION], expected, rtol=1e-12)
+
+
+def test_intervals_and_open_files(tmp_path):
+    buf = io.BytesIO()
+    scenarios(50).to_csv(buf, index=False)
+    buf.seek(0)
+    output = io.BytesIO()
+
+    bulk_scoring.score_file(buf, output, level=0.9, source_format="csv", output_format="csv")
+    out = pd.read_csv(io.BytesIO(output.getvalue()))
+
+    low, high = bulk_scoring.INTERVAL
+    assert (out[low] < out[bulk_scoring.PREDICTION]).all() and (out[bulk_scoring.PREDICTION] < out[high]).all()
+    row = out.iloc[0]
+    expected = data_service.predict_co2_intervals(row["state_code"], [row.iloc[2:7].to_numpy(float)], 0.9)
+    assert row[high] == pytest.approx(expected.pred_high[0], rel=1e-12)
+
+
+def test_unknown_states_and_missing_drivers_are_skipped(tmp_path):
+    df = scenarios(6)
+    df.loc[1, "state_code"] = "ZZ"
+    df.loc[4, "coal_elec"] = np.nan
+    source, output = str(tmp_path / "in.csv"), str(tmp_path / "out.csv")
+    df.to_csv(source, index=False)
+
+    report = bulk_scoring.score_file(source, output)
+    out = pd.read_csv(output)
+
+    assert (report.scored, report.skipped) == (4, 2)
+    assert out[bulk_scoring.PREDICTION].isna().tolist() == [False, True, False, False, True, False]
+
+
+def test_missing_columns_and_text_values_are_reported(tmp_path):
+    source, output = str(tmp_path / "in.csv"), str(tmp_path / "out.csv")
+    scenarios(5).drop(columns="PCE").to_csv(source, index=False)
+    with pytest.raises(SchemaError, match="PCE per capita"):
+        bulk_scoring.score_file(source, output)
+
+    df = scenarios(200)
+    df["gas_elec"] = df["gas_elec"].astype(object)
+    df.loc[150, "gas_elec"] = "twelve"
+    df.to_csv(source, index=False)
+    with pytest.raises(ValueError, match=r"'gas_elec', row 151: expected a number, got 'twelve'"):
+        bulk_scoring.score_file(source, output, chunk_rows=64)
+
+
+def test_memory_stays_flat(tmp_path):
+    source, output = str(tmp_path / "big.csv"), str(tmp_path / "out.csv")
+    scenarios(200_000).to_csv(source, index=False)
+
+    tracemalloc.start()
+    bulk_scoring.score_file(source, output, chunk_rows=5_000)
+    _, chunked_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    pd.read_csv(source)
+    _, full_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert chunked_peak < full_peak / 4
+    assert len(pd.read_csv(output)) == 200_000
+
+
+def test_pass_through_columns_keep_one_type_across_chunks(tmp_path):
+    df = scenarios(9)
+    df["note"] = [None] * 3 + ["x"] + [None] * 5
+    df["tag"] = ["007"] * 9
+    df.loc[7, "renewable_energy"] = 6611
+    for fmt in ("csv", "parquet"):
+        source, output = str(tmp_path / f"in.{fmt}"), str(tmp_path / f"out.{fmt}")
+        getattr(df, f"to_{fmt}")(source, index=False)
+
+        report = bulk_scoring.score_file(source, output, chunk_rows=3)
+        out = pd.read_csv(output, dtype={"tag": str}) if fmt == "csv" else pd.read_parquet(output)
+        assert report.chunks == 3 and report.scored == 9
+        assert out["note"].isna().sum() == 8 and out.loc[3, "note"] == "x"
+        assert (out["tag"] == "007").all()
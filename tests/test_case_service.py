@@ -11,10 +11,13 @@ sys.path.insert(
     )
 )
 
+import numpy as np
 import pandas as pd
 import pytest
 
-from case_service import load_merged_data, get_state_co2_series
+import case_service
+import dataset_registry
+from case_service import load_merged_data, get_state_co2_series, get_states_data
 
 REQUIRED_COLUMNS = ["State", "Year", "co2 per capita"]
 
@@ -62,3 +65,120 @@ def test_get_state_co2_series_unknown_state():
     # Must have only Year & co2 per capita
     assert list(df_unknown.columns) == ["Year", "co2 per capita"]
     assert df_unknown.empty
+
+
+def test_get_states_data_matches_filter_and_sort(merged_df):
+    """
+    get_states_data should return the same rows as filtering the full frame
+    with isin() and sorting by (State, Year), without doing either itself.
+    """
+    cols = ["State", "Year", "co2 per capita"]
+    df_states = get_states_data(["AK", "ND", "WY"], cols)
+
+    expected = (
+        merged_df[merged_df["State"].isin(["WY", "ND", "AK"])][cols]
+        .sort_values(["State", "Year"])
+        .reset_index(drop=True)
+    )
+    pd.testing.assert_frame_equal(df_states, expected, check_categorical=False)
+
+
+def test_presentation_matches_per_state_queries(merged_df):
+    """Precomputed charts and stats agree with filtering the full frame."""
+    presentation = case_service.get_presentation()
+    assert len(presentation.summary) == merged_df["State"].nunique() == 50
+
+    for state in ["WY", "ND", "AK"]:
+        series = get_state_co2_series(state).dropna()
+        chart = presentation.chart(state.lower())
+        assert chart.columns.tolist() == ["Year", case_service.CHART_COLUMN]
+        assert chart["Year"].tolist() == series["Year"].tolist()
+        np.testing.assert_array_equal(chart[case_service.CHART_COLUMN], series["co2 per capita"])
+
+        stats = presentation.summary.loc[state]
+        values = series.set_index("Year")["co2 per capita"]
+        assert stats["max"] == values.max() and stats["max_year"] == values.idxmax()
+        assert stats["min"] == values.min() and stats["min_year"] == values.idxmin()
+        span = values.index[-1] - values.index[0]
+        assert stats["cagr"] == pytest.approx((values.iloc[-1] / values.iloc[0]) ** (1 / span) - 1)
+
+    latest = merged_df.sort_values("Year").groupby("State", observed=True)["co2 per capita"].last()
+    assert presentation.summary["rank"].idxmin() == latest.idxmax()
+    # Tied states share no rank: the summary agrees with the national ranking
+    year = int(presentation.summary["last_year"].max())
+    current = presentation.summary[presentation.summary["last_year"] == year]
+    assert current["rank"].to_dict() == {state: presentation.ranking.rank(state, year) for state in current.index}
+
+    comparison = presentation.comparison(["WY", "zz", "ak"])
+    assert comparison.columns.tolist() == ["Year", "Wyoming", "Alaska"]
+    assert presentation.chart("ZZ").empty
+
+
+def test_presentation_is_built_once_per_dataset_generation():
+    first = case_service.get_presentation()
+    assert case_service.get_presentation() is first
+    dataset_registry.invalidate()
+    rebuilt = case_service.get_presentation()
+    assert rebuilt is not first and rebuilt.generation == dataset_registry.generation()
+
+
+def test_presentation_handles_gaps_and_non_positive_values():
+    frame = pd.DataFrame({
+        "State": ["AA", "AA", "AA", "BB", "BB", "CC"],
+        "Year": [2000, 2001, 2002, 2000, 2004, 2003],
+        "co2 per capita": [2.0, np.nan, 8.0, 0.0, 5.0, 3.0],
+    })
+    presentation = case_service.build_presentation(dataset_registry.build_dataset(frame))
+    summary = presentation.summary
+
+    assert summary.loc["AA", "cagr"] == pytest.approx(1.0)     # 2 → 8 over two years
+    assert np.isnan(summary.loc["BB", "cagr"])                 # starts at zero
+    assert np.isnan(summary.loc["CC", "cagr"])                 # a single year
+    assert summary["rank"].to_dict() == {"AA": 1, "BB": 2, "CC": 3}
+    assert presentation.chart("AA")["Year"].tolist() == [2000, 2002]
+    assert np.isnan(presentation.wide.loc[2004, "AA"])
+
+
+def test_ranking_matches_groupby_rank(merged_df):
+    ranking = case_service.get_ranking()
+    assert ranking is case_service.get_presentation().ranking
+    assert ranking.metrics[0] == "co2 per capita" and len(ranking.metrics) == 6
+
+    for metric in ["co2 per capita", "Coal Electricity Consumption"]:
+        expected = merged_df.groupby("Year")[metric].rank(ascending=False, method="first")
+        for year in [1998, 2015, 2023]:
+            rows = merged_df[merged_df["Year"] == year]
+            for state, rank in zip(rows["State"].astype(str), expected[rows.index]):
+                assert ranking.rank(state, year, metric) == rank
+            top = rows.sort_values(metric, ascending=False)["State"].astype(str).head(3).tolist()
+            assert ranking.top_k(year, 3, metric) == top
+
+
+def test_ranking_handles_missing_values_and_changes():
+    frame = pd.DataFrame({
+        "State": ["AA", "AA", "BB", "BB", "CC", "CC"],
+        "Year": [2000, 2001, 2000, 2001, 2000, 2001],
+        "co2 per capita": [3.0, 1.0, 2.0, 5.0, np.nan, 4.0],
+    })
+    ranking = case_service.build_ranking(frame)
+
+    assert ranking.metrics == ("co2 per capita",)
+    assert ranking.top_k(2000, k=5) == ["AA", "BB"]
+    assert ranking.rank("cc", 2000) == 0 and ranking.rank("CC", 2001) == 2 and ranking.rank("ZZ", 2001) == 0
+
+    table = ranking.year_table(2001)
+    assert table.index.tolist() == ["BB", "CC", "AA"]
+    assert table["rank"].tolist() == [1, 2, 3]
+    assert table["change"].tolist()[::2] == [1.0, -2.0] and np.isnan(table["change"].iloc[1])
+
+    changes = ranking.rank_changes(2000, 2001)
+    assert changes.loc["AA", "change"] == -2 and changes.loc["BB", "change"] == 1
+    assert ranking.history("bb").tolist() == [2, 1]
+    with pytest.raises(KeyError, match="No data for 1999"):
+        ranking.top_k(1999)
+
+    # A year with drivers but no CO₂ yet is not the latest ranked year
+    later = pd.DataFrame({"State": ["AA"], "Year": [2002], "co2 per capita": [np.nan], "PCE per capita": [1.0]})
+    ranking = case_service.build_ranking(pd.concat([frame, later]))
+    assert ranking.years[-1] == 2002 and ranking.latest_year() == 2001 and ranking.latest_year("PCE per capita") == 2002
+    assert ranking.top_k(ranking.latest_year()) == ["BB", "CC", "AA"]
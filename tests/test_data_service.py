@@ -3,13 +3,20 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 import pytest
 
+import numpy as np
 import pandas as pd
 
 from data_service import (
     load_merged_data,
     fit_state_models,
     predict_co2,
+    predict_co2_batch,
+    predict_co2_intervals,
+    explain_co2_batch,
+    model_summary,
+    conditioning_report,
 )
+from ols_engine import t_quantile
 
 # List of all feature columns we expect in the Excel
 EXPECTED_FEATURES = [
@@ -36,12 +43,15 @@ def test_load_merged_data_returns_dataframe_with_required_columns():
 
 def test_fit_state_models_structure_and_types():
     """
-    fit_state_models() should return a dict with keys 'WY','ND','AK',
-    each mapping to a dict of float coefficients including 'intercept'.
+    fit_state_models() should return a dict keyed by every state in the
+    panel (including 'WY','ND','AK'), each mapping to a dict of float
+    coefficients including 'intercept'.
     """
     models = fit_state_models()
-    # Must have exactly our three case studies
-    assert set(models.keys()) == {"WY", "ND", "AK"}
+    # One model per state in the panel, our three case studies among them
+    assert set(models.keys()) == set(load_merged_data()["State"].unique())
+    assert len(models) == 50
+    assert {"WY", "ND", "AK"} <= set(models.keys())
 
     for state, coefs in models.items():
         # Each state must have an 'intercept'
@@ -67,3 +77,178 @@ def test_predict_co2_at_zero_equals_intercept(state):
     pred = predict_co2(state, 0, 0, 0, 0, 0)
     assert pytest.approx(intercept, rel=1e-6) == pred
 
+
+def _term_by_term(coefs, row):
+    """The original scalar formula: intercept + Σ slope_i × feature_i."""
+    pred = coefs["intercept"]
+    for feat, value in zip(EXPECTED_FEATURES, row):
+        pred += coefs[feat] * value
+    return pred
+
+
+def test_predict_co2_batch_mixed_states_matches_scalar():
+    """
+    predict_co2_batch() over mixed states must agree with predict_co2() and
+    with the term-by-term formula row by row, for array and DataFrame input.
+    """
+    models = fit_state_models()
+    rng = np.random.default_rng(0)
+    X = rng.random((60, 5)) * np.array([3e5, 1e8, 2e9, 1e5, 5e5])
+    states = np.array(["WY", "nd", "AK"] * 20)
+
+    batch = predict_co2_batch(states, X)
+    batch_df = predict_co2_batch(states, pd.DataFrame(X, columns=EXPECTED_FEATURES))
+    assert batch.shape == (60,)
+    np.testing.assert_array_equal(batch, batch_df)
+
+    for state, row, pred in zip(states, X, batch):
+        assert pytest.approx(predict_co2(state, *row), rel=1e-12) == pred
+        assert pytest.approx(_term_by_term(models[state.upper()], row), rel=1e-12) == pred
+
+
+def test_predict_co2_batch_rejects_bad_input():
+    """Unknown states, mismatched lengths and missing columns raise ValueError."""
+    X = np.zeros((2, 5))
+    with pytest.raises(ValueError, match="ZZ"):
+        predict_co2_batch(["WY", "ZZ"], X)
+    with pytest.raises(ValueError):
+        predict_co2_batch(["WY"], X)
+    with pytest.raises(ValueError, match="missing feature columns"):
+        predict_co2_batch("WY", pd.DataFrame({"renewable energy": [1.0]}))
+
+
+@pytest.mark.parametrize("state", ["WY", "ND", "AK", "CA", "NY"])
+def test_batched_fit_matches_per_state_lstsq(state):
+    """The batched solve must reproduce a per-state np.linalg.lstsq fit."""
+    df = load_merged_data()
+    df_s = df[df["State"] == state]
+    X = np.hstack([np.ones((len(df_s), 1)), df_s[EXPECTED_FEATURES].to_numpy(dtype=float)])
+    beta, *_ = np.linalg.lstsq(X, df_s["co2 per capita"].to_numpy(dtype=float), rcond=None)
+
+    coefs = fit_state_models()[state]
+    fitted = [coefs["intercept"]] + [coefs[feat] for feat in EXPECTED_FEATURES]
+    np.testing.assert_allclose(fitted, beta, rtol=1e-8)
+
+
+def test_model_summary_reports_adjusted_r2_and_standard_errors():
+    """
+    model_summary() should carry per-state adjusted R² and standard errors;
+    the case-study values match the README (0.98 / 0.84 / 0.81).
+    """
+    summary = model_summary()
+    assert len(summary) == 50
+    assert summary.loc["WY", "adj_r2"] == pytest.approx(0.98, abs=0.005)
+    assert summary.loc["ND", "adj_r2"] == pytest.approx(0.84, abs=0.005)
+    assert summary.loc["AK", "adj_r2"] == pytest.approx(0.81, abs=0.005)
+    for feat in EXPECTED_FEATURES:
+        assert (summary[f"se {feat}"] > 0).all()
+
+
+def test_prediction_intervals_match_textbook_formula():
+    """
+    Batched intervals must equal ŷ ± t·σ·sqrt(x̃ᵀ(XᵀX)⁻¹x̃ [+ 1]) computed
+    directly from one state's rows, and agree with predict_co2_batch().
+    """
+    df = load_merged_data()
+    df_s = df[df["State"] == "WY"]
+    Xs = np.hstack([np.ones((len(df_s), 1)), df_s[EXPECTED_FEATURES].to_numpy(dtype=float)])
+    ys = df_s["co2 per capita"].to_numpy(dtype=float)
+    beta, *_ = np.linalg.lstsq(Xs, ys, rcond=None)
+    dof = len(ys) - Xs.shape[1]
+    sigma2 = np.sum((ys - Xs @ beta) ** 2) / dof
+    inv = np.linalg.inv(Xs.T @ Xs)
+
+    rng = np.random.default_rng(1)
+    X = Xs[:, 1:][rng.integers(0, len(ys), 8)] * rng.uniform(0.8, 1.2, size=(8, 5))
+    result = predict_co2_intervals("WY", X, level=0.9)
+    np.testing.assert_array_equal(result.estimate, predict_co2_batch("WY", X))
+
+    t = float(t_quantile(0.95, dof))
+    for i, x in enumerate(X):
+        x1 = np.concatenate([[1.0], x])
+        q = x1 @ inv @ x1
+        assert result.se_mean[i] == pytest.approx(np.sqrt(sigma2 * q), rel=1e-6)
+        assert result.pred_low[i] == pytest.approx(x1 @ beta - t * np.sqrt(sigma2 * (1 + q)), rel=1e-6)
+        assert result.mean_high[i] == pytest.approx(x1 @ beta + t * np.sqrt(sigma2 * q), rel=1e-6)
+
+
+def test_prediction_intervals_nest_and_widen_with_level():
+    X = np.array([[6611, 26831408, 4052911, 20184, 322110]] * 3, dtype=float)
+    states = ["WY", "ND", "AK"]
+    narrow = predict_co2_intervals(states, X, level=0.8)
+    wide = predict_co2_intervals(states, X, level=0.99)
+
+    assert np.all(narrow.pred_low < narrow.mean_low)
+    assert np.all(narrow.mean_low < narrow.estimate)
+    assert np.all(narrow.estimate < narrow.mean_high)
+    assert np.all(narrow.mean_high < narrow.pred_high)
+    assert np.all(wide.pred_high > narrow.pred_high)
+    assert list(narrow.to_frame().columns)[:3] == ["estimate", "se_mean", "se_pred"]
+    with pytest.raises(ValueError):
+        predict_co2_intervals("WY", X[:1], level=1.5)
+
+
+def test_relative_scaling_reports_conditioning_and_keeps_predictions():
+    """Scaled solves must predict like a raw lstsq fit while cutting the condition number."""
+    report = conditioning_report()
+    assert (report["cond scaled"] <= report["cond raw"]).all()
+    assert report["cond scaled"].median() < 1e3 < 1e9 < report["cond raw"].median()
+    np.testing.assert_allclose(model_summary()["cond"], report["cond scaled"], rtol=1e-10)
+
+    df = load_merged_data()
+    df_s = df[df["State"] == "ND"]
+    Xs = np.hstack([np.ones((len(df_s), 1)), df_s[EXPECTED_FEATURES].to_numpy(dtype=float)])
+    beta, *_ = np.linalg.lstsq(Xs, df_s["co2 per capita"].to_numpy(dtype=float), rcond=None)
+    np.testing.assert_allclose(predict_co2_batch("ND", Xs[:, 1:]), Xs @ beta, rtol=1e-9)
+
+
+def test_contributions_add_up_to_the_batched_prediction():
+    """Each row's driver terms plus its baseline must reproduce the prediction."""
+    rng = np.random.default_rng(3)
+    states = rng.choice(["WY", "ND", "AK", "TX"], size=50)
+    X = rng.uniform(0.5, 1.5, size=(50, 5)) * np.array([6611, 26831408, 4052911, 20184, 322110])
+    models = fit_state_models()
+
+    explained = explain_co2_batch(states, X)
+    assert explained.contributions.shape == (50, 5)
+    np.testing.assert_allclose(explained.estimate, predict_co2_batch(states, X), rtol=1e-12)
+    for i in (0, 17, 49):
+        coefs = models[states[i]]
+        assert explained.baseline[i] == coefs["intercept"]
+        np.testing.assert_allclose(explained.contributions[i], [coefs[f] * x for f, x in zip(EXPECTED_FEATURES, X[i])])
+
+    # Against a reference row, the baseline is the reference's own prediction
+    reference = X[0]
+    relative = explain_co2_batch(states, X, reference=reference)
+    np.testing.assert_allclose(relative.baseline, predict_co2_batch(states, np.tile(reference, (50, 1))), rtol=1e-12)
+    np.testing.assert_allclose(relative.estimate, explained.estimate, rtol=1e-12)
+    assert relative.contributions[states == states[0]][0] == pytest.approx(np.zeros(5), abs=1e-9)
+    assert list(relative.to_frame().columns) == ["baseline"] + EXPECTED_FEATURES + ["estimate"]
+    with pytest.raises(ValueError):
+        explain_co2_batch(states, X, reference=[1.0, 2.0])
+
+
+def test_prediction_reads_one_model_bundle_across_a_swap(monkeypatch):
+    """A bundle published mid-call (states reordered) must not mix into the running prediction."""
+    import dataclasses
+    import data_service
+
+    X = np.array([[6611, 26831408, 4052911, 20184, 322110]] * 2, dtype=float)
+    expected = predict_co2_batch(["WY", "ND"], X)
+    current = data_service._models
+    coerce = data_service._as_feature_matrix
+
+    def swap_then_coerce(values):
+        # Same fits with the state rows reversed, as a swapped panel could order them
+        order = np.arange(len(current.states))[::-1]
+        fit = dataclasses.replace(current.fit, coef=current.fit.coef[order], xtx_inv=current.fit.xtx_inv[order],
+                                  x_scale=current.fit.x_scale[order])
+        data_service._install_models(current.states[::-1], fit, "swapped", current.generation)
+        return coerce(values)
+
+    monkeypatch.setattr(data_service, "_as_feature_matrix", swap_then_coerce)
+    try:
+        np.testing.assert_allclose(predict_co2_batch(["WY", "ND"], X), expected, rtol=1e-12)
+        assert data_service.model_version() == "swapped"
+    finally:
+        data_service._models = None
@@ -0,0 +1,83 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pandas as pd
+import pytest
+
+import dataset_cache
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    """A tiny two-state workbook and an isolated cache directory."""
+    monkeypatch.setenv("CO2_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("CO2_DATA_CACHE", raising=False)
+    path = str(tmp_path / "book.xlsx")
+    df = pd.DataFrame({
+        "State": ["WY", "WY", "ND"],
+        "Year": [1998, 1999, 1998],
+        "co2 per capita": [130.4, 128.0, 74.9],
+    })
+    df.to_excel(path, sheet_name="merged", index=False)
+    return path
+
+
+def _forbid_excel(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("workbook was parsed despite a fresh cache")
+    monkeypatch.setattr(dataset_cache, "read_excel_sheet", fail)
+
+
+def test_second_load_is_served_from_cache(workbook, monkeypatch):
+    """The first load writes the store; the next one must not parse Excel."""
+    first = dataset_cache.load_sheet(workbook)
+    assert dataset_cache.is_fresh(workbook)
+
+    _forbid_excel(monkeypatch)
+    second = dataset_cache.load_sheet(workbook)
+    pd.testing.assert_frame_equal(first, second, check_dtype=False)
+    assert second["State"].tolist() == ["WY", "WY", "ND"]
+
+
+def test_touch_with_same_content_reuses_cache(workbook, monkeypatch):
+    """A new mtime alone falls back to the content hash, which still matches."""
+    dataset_cache.load_sheet(workbook)
+    st = os.stat(workbook)
+    os.utime(workbook, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    _forbid_excel(monkeypatch)
+    assert len(dataset_cache.load_sheet(workbook)) == 3
+
+
+def test_touch_on_a_read_only_cache_still_reuses_it(workbook, monkeypatch):
+    """A manifest that cannot be refreshed must not turn a matching hash into an error."""
+    dataset_cache.load_sheet(workbook)
+    st = os.stat(workbook)
+    os.utime(workbook, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    def read_only(store, manifest):
+        raise PermissionError(13, "Read-only file system")
+    monkeypatch.setattr(dataset_cache, "_write_manifest", read_only)
+    _forbid_excel(monkeypatch)
+    assert dataset_cache.is_fresh(workbook)
+    assert len(dataset_cache.load_sheet(workbook)) == 3
+
+
+def test_changed_workbook_triggers_rebuild(workbook):
+    """Editing the workbook invalidates the cache and the new rows appear."""
+    dataset_cache.load_sheet(workbook)
+    pd.DataFrame({
+        "State": ["AK"], "Year": [1998], "co2 per capita": [68.4],
+    }).to_excel(workbook, sheet_name="merged", index=False)
+
+    assert not dataset_cache.is_fresh(workbook)
+    df = dataset_cache.load_sheet(workbook)
+    assert df["State"].tolist() == ["AK"]
+    assert dataset_cache.is_fresh(workbook)
+
+
+def test_env_switch_disables_cache(workbook, monkeypatch):
+    """CO2_DATA_CACHE=off reads the workbook directly and writes nothing."""
+    monkeypatch.setenv("CO2_DATA_CACHE", "off")
+    dataset_cache.load_sheet(workbook)
+    assert not os.path.exists(dataset_cache.store_path(workbook))
@@ -0,0 +1,92 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import case_service
+import data_service
+import dataset_registry
+
+
+@pytest.fixture
+def counting_loader(monkeypatch):
+    """Replace the disk load with a slow stub that counts its calls."""
+    calls = []
+
+    def slow_load(path, sheet):
+        calls.append(sheet)
+        time.sleep(0.05)
+        return pd.DataFrame({
+            "State": ["WY"], "Year": [1998], "co2 per capita": [130.4],
+            "renewable energy": [6611], "Coal Electricity Consumption": [26831408.0],
+            "Natural Gas Electricity Consumption": [4052911.0], "PCE per capita": [20184],
+            "Estimated Urban Population": [322110.0],
+        })
+
+    monkeypatch.setattr(dataset_registry, "load_sheet", slow_load)
+    dataset_registry.invalidate()
+    yield calls
+    dataset_registry.invalidate()
+
+
+def test_concurrent_first_access_loads_once(counting_loader):
+    """Threads racing on a cold registry must share a single load."""
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(dataset_registry.get_merged_data()))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(counting_loader) == 1
+    assert all(df is results[0] for df in results)
+
+
+def test_services_share_one_frame(counting_loader):
+    """case_service and data_service hand out the very same object."""
+    assert case_service.load_merged_data() is data_service.load_merged_data()
+    assert len(counting_loader) == 1
+
+
+def test_invalidate_forces_reload_and_bumps_generation(counting_loader):
+    first = dataset_registry.get_merged_data()
+    generation = dataset_registry.generation()
+
+    dataset_registry.invalidate()
+    assert not dataset_registry.is_loaded()
+    assert dataset_registry.generation() == generation + 1
+
+    assert dataset_registry.get_merged_data() is not first
+    assert len(counting_loader) == 2
+
+
+def test_memory_usage_reports_loaded_frame(counting_loader):
+    assert dataset_registry.memory_usage()["loaded"] is False
+    dataset_registry.get_merged_data()
+    usage = dataset_registry.memory_usage()
+    assert usage["loaded"] is True
+    assert usage["rows"] == 1 and usage["columns"] == 8
+    assert usage["bytes"] > 0
+
+
+def test_build_dataset_indexes_sorted_state_slices():
+    """Rows are sorted by (State, Year) and each slice covers one state."""
+    raw = pd.DataFrame({
+        "State": ["WY", "AK", "WY", "AK", "ND"],
+        "Year": [1999, 1999, 1998, 1998, 1998],
+        "co2 per capita": [128.0, 68.9, 130.4, 68.4, 74.9],
+    })
+    dataset = dataset_registry.build_dataset(raw)
+
+    assert isinstance(dataset.frame["State"].dtype, pd.CategoricalDtype)
+    assert dataset.states == ["AK", "ND", "WY"]
+    assert dataset.rows("WY")["Year"].tolist() == [1998, 1999]
+    assert dataset.rows("AK")["co2 per capita"].tolist() == [68.4, 68.9]
+    assert dataset.rows("ZZ").empty
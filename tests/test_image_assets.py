@@ -0,0 +1,47 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import io
+
+import pytest
+from PIL import Image
+
+import image_assets
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """A 400×300 test image and an empty cache directory."""
+    monkeypatch.setenv("CO2_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(image_assets, "_resized", {})
+    path = tmp_path / "logo.png"
+    Image.new("RGB", (400, 300), (200, 30, 30)).save(path)
+    return str(path)
+
+
+def _size(data: bytes) -> tuple[int, int]:
+    return Image.open(io.BytesIO(data)).size
+
+
+def test_resized_once_then_served_from_memory(source, monkeypatch):
+    data = image_assets.resized_png(source, 200)
+    assert _size(data) == (200, 150)
+
+    monkeypatch.setattr(image_assets, "_render", lambda *a: pytest.fail("re-rendered"))
+    assert image_assets.resized_png(source, 200) is data
+
+
+def test_disk_copy_survives_a_restart(source, monkeypatch):
+    data = image_assets.resized_png(source, 200)
+    monkeypatch.setattr(image_assets, "_resized", {})
+    monkeypatch.setattr(image_assets, "_render", lambda *a: pytest.fail("re-rendered"))
+    assert image_assets.resized_png(source, 200) == data
+
+
+def test_edited_source_is_resized_again_and_never_upscaled(source):
+    image_assets.resized_png(source, 200)
+    Image.new("RGB", (100, 50)).save(source)
+    os.utime(source, ns=(0, 10**18))
+
+    assert _size(image_assets.resized_png(source, 200)) == (100, 50)
+    assert len(image_assets._resized) == 1
@@ -0,0 +1,121 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import functools
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset_cache
+import ingest
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("CO2_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("CO2_DATA_CACHE", raising=False)
+    return tmp_path / "cache"
+
+
+def panel(n_rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "State": np.array(["WY", "ND", "AK", "VT"])[rng.integers(0, 4, n_rows)],
+        "Year": 1998 + np.arange(n_rows) % 26,
+        "co2 per capita": rng.normal(50, 10, n_rows),        # needs float64
+        "renewable energy": rng.integers(0, 10**6, n_rows) * 0.5,   # exact in float32
+    })
+
+
+def test_csv_chunks_round_trip_with_narrowed_dtypes(tmp_path):
+    df = panel(1000)
+    path = str(tmp_path / "panel.csv")
+    df.to_csv(path, index=False)
+
+    manifest = ingest.ingest(path, "panel", chunk_rows=64)
+    out = dataset_cache.load_sheet(path, "panel")
+
+    assert manifest["n_rows"] == 1000
+    assert isinstance(out["State"].dtype, pd.CategoricalDtype)
+    assert out["renewable energy"].dtype == np.float32
+    assert out["co2 per capita"].dtype == np.float64
+    pd.testing.assert_frame_equal(out, pd.read_csv(path), check_dtype=False, check_categorical=False)
+
+
+def test_later_chunks_widen_earlier_ones(tmp_path):
+    path = str(tmp_path / "mixed.csv")
+    with open(path, "w") as fh:
+        # Year: an int chunk, then a missing year; x: float32-exact, then not
+        fh.write("State,Year,x\nWY,1998,1.0\nND,1999,2.0\nAK,,0.1\n,2001,4.0\n")
+
+    ingest.ingest(path, "mixed", chunk_rows=2)
+    out = dataset_cache.load_sheet(path, "mixed")
+    assert out["Year"].dtype == np.float64 and np.isnan(out["Year"][2])
+    assert out["x"].dtype == np.float64 and out["x"].tolist() == [1.0, 2.0, 0.1, 4.0]
+    assert out["State"].isna().tolist() == [False, False, False, True]
+
+
+def test_workbook_is_streamed_row_by_row(tmp_path):
+    df = panel(300)
+    path = str(tmp_path / "book.xlsx")
+    df.to_excel(path, sheet_name="merged", index=False)
+
+    chunks = list(ingest.iter_chunks(path, "merged", chunk_rows=128))
+    assert [len(c) for c in chunks] == [128, 128, 44]
+
+    ingest.ingest(path, chunk_rows=128)
+    out = dataset_cache.load_sheet(path)
+    pd.testing.assert_frame_equal(out, pd.read_excel(path), check_dtype=False, check_categorical=False)
+
+
+def test_parquet_source(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = panel(500)
+    path = str(tmp_path / "panel.parquet")
+    df.to_parquet(path)
+
+    ingest.ingest(path, "panel", chunk_rows=100)
+    out = dataset_cache.load_sheet(path, "panel")
+    pd.testing.assert_frame_equal(out, df, check_dtype=False, check_categorical=False)
+
+
+def test_bad_value_reports_row_and_leaves_no_store(tmp_path, cache_dir):
+    path = str(tmp_path / "bad.csv")
+    with open(path, "w") as fh:
+        fh.write("State,Year\nWY,1998\nWY,1999\nWY,unknown\nWY,2001\n")
+    # First chunk establishes Year as numeric; the second holds the bad value
+    with pytest.raises(ValueError, match=r"'Year', row 3"):
+        ingest.ingest(path, "bad", chunk_rows=2)
+    assert not os.path.exists(dataset_cache.store_path(path, "bad"))
+    assert os.listdir(cache_dir) == []
+
+
+def test_load_sheet_falls_back_when_chunks_disagree(tmp_path, cache_dir, monkeypatch):
+    path = str(tmp_path / "mixed.csv")
+    with open(path, "w") as fh:
+        fh.write("State,Year\nWY,1998\nWY,1999\nWY,unknown\nWY,2001\n")
+    monkeypatch.setattr(ingest, "ingest", functools.partial(ingest.ingest, chunk_rows=2))
+
+    df = dataset_cache.load_sheet(path, "mixed", use_cache=True)
+    assert df["Year"].astype(str).tolist() == ["1998", "1999", "unknown", "2001"]
+    assert not os.path.exists(dataset_cache.store_path(path, "mixed"))
+
+
+def test_peak_memory_is_bounded_by_chunk_size(tmp_path):
+    path = str(tmp_path / "big.csv")
+    panel(200_000).to_csv(path, index=False)
+
+    tracemalloc.start()
+    ingest.ingest(path, "big", chunk_rows=5_000)
+    _, chunked_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    pd.read_csv(path)
+    _, full_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert chunked_peak < full_peak / 4
+    assert len(dataset_cache.load_sheet(path, "big")) == 200_000
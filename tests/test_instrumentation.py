@@ -0,0 +1,106 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+
+import pytest
+
+import case_service
+import data_service
+import dataset_registry
+import instrumentation
+
+
+@pytest.fixture
+def metrics():
+    """Collect metrics for one test, starting from empty registries."""
+    instrumentation.reset()
+    instrumentation.set_enabled(True)
+    yield instrumentation
+    instrumentation.set_enabled(False)
+    instrumentation.set_log(None)
+    instrumentation.reset()
+
+
+def test_disabled_hooks_record_nothing():
+    instrumentation.set_enabled(False)
+    instrumentation.reset()
+
+    @instrumentation.timed("noop")
+    def add(a, b):
+        return a + b
+
+    with instrumentation.span("outer"):
+        assert add(1, 2) == 3
+    instrumentation.cache_hit("x")
+    instrumentation.count("y")
+    snap = instrumentation.snapshot()
+    assert snap["spans"] == {} and snap["caches"] == {} and snap["counters"] == {}
+
+
+def test_nested_spans_are_logged_with_parent(metrics, tmp_path):
+    log = tmp_path / "spans.jsonl"
+    metrics.set_log(str(log))
+
+    @metrics.timed("inner")
+    def work():
+        return 42
+
+    with metrics.span("outer"):
+        work()
+        work()
+    with pytest.raises(RuntimeError):
+        with metrics.span("failing"):
+            raise RuntimeError
+
+    lines = [json.loads(line) for line in log.read_text().splitlines()]
+    assert [(l["span"], l["parent"]) for l in lines] == [
+        ("inner", "outer"), ("inner", "outer"), ("outer", None), ("failing", None)
+    ]
+    snap = metrics.snapshot()
+    assert snap["spans"]["inner"]["count"] == 2
+    assert snap["spans"]["outer"]["total_s"] >= snap["spans"]["inner"]["total_s"]
+    assert snap["counters"]["failing.errors"] == 1
+
+
+def test_services_report_spans_caches_and_memory(metrics):
+    dataset_registry.invalidate()
+    data_service._models = None
+    case_service.get_state_co2_series("WY")
+    case_service.get_state_co2_series("ND")
+    data_service.fit_state_models()
+    data_service.fit_state_models()
+    data_service.predict_co2_batch(["WY", "ND"], [[0.0] * 5, [1.0] * 5])
+
+    snap = metrics.snapshot()
+    assert {"dataset.load", "dataset.validate", "case.series", "predict.batch"} <= set(snap["spans"])
+    assert snap["caches"]["dataset"] == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+    assert snap["caches"]["models"] == {"hits": 2, "misses": 1, "hit_ratio": pytest.approx(2 / 3)}
+    assert snap["counters"]["predict.rows"] == 2
+    assert snap["gauges"]["dataset_rows"] == 1300 and snap["gauges"]["dataset_bytes"] > 0
+
+
+def test_prometheus_dump(metrics):
+    with metrics.span("models.fit"):
+        pass
+    metrics.cache_hit("prediction")
+    metrics.cache_miss("prediction")
+    text = metrics.render_prometheus()
+    assert 'co2_span_seconds_count{span="models.fit"} 1' in text
+    assert 'co2_cache_requests_total{cache="prediction",result="hit"} 1' in text
+    assert "# TYPE co2_dataset_bytes gauge" in text
+
+
+def test_streamlit_control_flow_is_not_counted_as_an_error(metrics):
+    from streamlit.runtime.scriptrunner import RerunException, StopException
+
+    for exc in [RerunException(None), StopException()]:
+        with pytest.raises(type(exc)):
+            with metrics.span("page.x"):
+                raise exc
+    with pytest.raises(KeyError):
+        with metrics.span("page.x"):
+            raise KeyError
+    snap = metrics.snapshot()
+    assert snap["spans"]["page.x"]["count"] == 3
+    assert snap["counters"]["page.x.errors"] == 1
@@ -0,0 +1,107 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import data_service
+import dataset_registry
+import model_store
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    """Point the artifact store at an empty directory and drop cached models."""
+    monkeypatch.setenv("CO2_MODEL_DIR", str(tmp_path / "models"))
+    monkeypatch.setattr(data_service, "_models", None)
+    return tmp_path / "models"
+
+
+def test_artifact_key_depends_on_data_features_and_options():
+    base = model_store.artifact_key("abc", ["a", "b"], {"method": "ols"})
+    assert base == model_store.artifact_key("abc", ["a", "b"], {"method": "ols"})
+    assert base != model_store.artifact_key("abd", ["a", "b"], {"method": "ols"})
+    assert base != model_store.artifact_key("abc", ["b", "a"], {"method": "ols"})
+    assert base != model_store.artifact_key("abc", ["a", "b"], {"method": "ridge"})
+
+
+def test_first_fit_writes_artifact_that_round_trips(model_dir):
+    models = data_service.fit_state_models()
+    key = data_service.model_version()
+    assert os.path.exists(model_store.artifact_path(key))
+
+    artifact = model_store.load(key)
+    assert artifact.features == data_service._FEATURES
+    for row, state in enumerate(artifact.states):
+        assert artifact.fit.coef[row, 0] == models[state]["intercept"]
+    assert [meta["key"] for meta in model_store.list_artifacts()] == [key]
+
+
+def test_prediction_from_artifact_never_loads_dataset(model_dir, monkeypatch):
+    """A fresh process with a prebuilt artifact must not touch the dataset."""
+    model_store.main(["build"])
+    expected = data_service.predict_co2("WY", 6611, 26831408, 4052911, 20184, 322110)
+
+    def forbidden():
+        raise AssertionError("dataset was loaded despite a stored artifact")
+
+    monkeypatch.setattr(data_service, "_models", None)
+    monkeypatch.setattr(dataset_registry, "get_dataset", forbidden)
+    pred = data_service.predict_co2("WY", 6611, 26831408, 4052911, 20184, 322110)
+    assert pred == expected
+
+
+def test_unreadable_artifact_is_ignored(model_dir):
+    key = model_store.artifact_key("abc", ["a"], {})
+    os.makedirs(model_dir)
+    with open(model_store.artifact_path(key), "wb") as fh:
+        fh.write(b"not an npz archive")
+    assert model_store.load(key) is None
+    assert model_store.load("missing") is None
+
+
+@pytest.fixture
+def ridge_models(model_dir):
+    """Ridge for every state but WY, restoring the OLS default afterwards."""
+    data_service.configure_models("ridge", per_state={"WY": "ols"})
+    yield model_dir
+    data_service.configure_models()
+
+
+def test_model_families_mix_per_state_and_round_trip(ridge_models):
+    ols_key = model_store.artifact_key(model_store.dataset_fingerprint(), data_service._FEATURES,
+                                       data_service._fit_options("ols"))
+    states, fit = data_service.get_model_fit()
+    assert data_service.model_version() != ols_key
+
+    summary = data_service.model_summary()
+    assert summary.loc["WY", "method"] == "ols" and summary.loc["WY", "penalty"] == 0
+    assert (summary.drop(index="WY")["method"] == "ridge").all()
+    assert (summary.drop(index="WY")["penalty"] > 0).all()
+
+    artifact = model_store.load(data_service.model_version())
+    assert artifact.fit.penalty.tolist() == fit.penalty.tolist()
+
+    intervals = data_service.predict_co2_intervals(["WY", "ND"], [[6611, 26831408, 4052911, 20184, 322110]] * 2)
+    assert intervals.estimate[0] == pytest.approx(129.566, abs=1e-3)
+    assert (intervals.pred_low < intervals.estimate).all() and (intervals.estimate < intervals.pred_high).all()
+
+    with pytest.raises(ValueError):
+        data_service.update_state_models(dataset_registry.get_dataset().frame.head(1))
+
+
+def test_unknown_model_family_is_rejected():
+    with pytest.raises(ValueError, match="Unknown model method"):
+        data_service.configure_models("elastic")
+    with pytest.raises(ValueError, match="Unknown model method"):
+        data_service.configure_models("ols", per_state={"WY": "svm"})
+    assert data_service._parse_method_switch("ridge, wy=ols") == {
+        "method": "ridge", "solver": "batched-svd", "scaling": "relative", "per_state": {"WY": "ols"},
+    }
+
+
+def test_artifact_keeps_relative_scale_and_conditioning(model_dir):
+    _, fit = data_service.get_model_fit()
+    artifact = model_store.load(data_service.model_version())
+    assert data_service._FIT_OPTIONS["scaling"] == "relative"
+    assert artifact.fit.x_scale.tolist() == fit.x_scale.tolist()
+    assert artifact.fit.cond.tolist() == fit.cond.tolist()
@@ -0,0 +1,122 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_service
+import dataset_registry
+from ols_engine import batched_ols, stack_groups
+from online_ols import OnlineOLS
+
+
+@pytest.fixture
+def panel():
+    """Two states × 40 periods of badly scaled drivers, like the real sheet."""
+    rng = np.random.default_rng(7)
+    states = np.repeat(["AA", "BB"], 40)
+    X = rng.random((80, 3)) * np.array([1e3, 1e8, 1e9])
+    y = 5 + X @ np.array([1e-3, 2e-7, -3e-9]) + rng.normal(scale=0.5, size=80)
+    return states, X, y
+
+
+def _full_refit(states, X, y):
+    codes, group_ids = np.unique(states, return_inverse=True)
+    return batched_ols(*stack_groups(group_ids, X, y, len(codes)))
+
+
+def test_incremental_updates_match_full_refit(panel):
+    """Adding rows in chunks must equal one fit over all rows."""
+    states, X, y = panel
+    model = OnlineOLS([], 3)
+    order = np.argsort(np.tile(np.arange(40), 2), kind="stable")
+    for chunk in np.array_split(order, 8):
+        model.update(states[chunk], X[chunk], y[chunk])
+
+    online, full = model.fit(), _full_refit(states, X, y)
+    np.testing.assert_allclose(online.coef, full.coef, rtol=1e-7)
+    np.testing.assert_allclose(online.stderr, full.stderr, rtol=1e-6)
+    np.testing.assert_allclose(online.adj_r2, full.adj_r2, rtol=1e-9)
+    np.testing.assert_array_equal(online.n_obs, full.n_obs)
+
+
+def test_downdate_slides_a_rolling_window(panel):
+    """Removing the oldest rows must equal a fit on the remaining window."""
+    states, X, y = panel
+    model = OnlineOLS([], 3)
+    model.update(states, X, y)
+    oldest = np.tile(np.arange(40) < 10, 2)
+    model.downdate(states[oldest], X[oldest], y[oldest])
+
+    window = ~oldest
+    np.testing.assert_allclose(
+        model.fit().coef, _full_refit(states[window], X[window], y[window]).coef, rtol=1e-6
+    )
+    # Removing more rows than a state holds is refused and changes nothing
+    before, known = model.xtx.copy(), list(model.states)
+    with pytest.raises(ValueError, match="more rows"):
+        model.downdate(states, X, y)
+    np.testing.assert_array_equal(model.xtx, before)
+
+    # So is downdating a state that was never added, without registering it
+    with pytest.raises(ValueError, match="never added"):
+        model.downdate(np.array(["ZZ"]), X[:1], y[:1])
+    assert model.states == known and len(model.n) == len(known)
+    np.testing.assert_array_equal(model.xtx, before)
+
+
+@pytest.fixture
+def fresh_models():
+    """Reload the workbook-fitted models after a test replaces them."""
+    yield
+    data_service._models = None
+    data_service._online = None
+
+
+def test_update_state_models_with_new_year_matches_refit(monkeypatch, fresh_models):
+    """
+    Seeding with 1998–2020 and ingesting 2021–2023 through
+    update_state_models() must give the same fitted values as the full fit.
+    """
+    full = data_service.fit_state_models()
+    version = data_service.model_version()
+    df = data_service.load_merged_data()
+
+    # The statistics are seeded from a panel that ends in 2020
+    seed = dataset_registry.build_dataset(df[df["Year"] < 2021])
+    monkeypatch.setattr(dataset_registry, "get_dataset", lambda: seed)
+    updated = data_service.update_state_models(df[df["Year"] >= 2021])
+    assert data_service.model_version() != version
+
+    for state in ["WY", "ND", "AK", "CA"]:
+        rows = df[df["State"] == state][data_service._FEATURES].to_numpy(dtype=float)
+        coefs_a, coefs_b = updated[state], full[state]
+        pred_a = coefs_a["intercept"] + rows @ [coefs_a[f] for f in data_service._FEATURES]
+        pred_b = coefs_b["intercept"] + rows @ [coefs_b[f] for f in data_service._FEATURES]
+        np.testing.assert_allclose(pred_a, pred_b, rtol=1e-9)
+
+
+def test_update_state_models_refuses_rows_already_counted(monkeypatch, fresh_models):
+    """A (State, Year) from the panel or an earlier update must not be added twice."""
+    df = data_service.load_merged_data()
+    seed = dataset_registry.build_dataset(df[df["Year"] < 2021])
+    monkeypatch.setattr(dataset_registry, "get_dataset", lambda: seed)
+    year_2021 = df[df["Year"] == 2021]
+    data_service.update_state_models(year_2021)
+    version, models = data_service.model_version(), data_service.fit_state_models()
+
+    for rows in [year_2021, df[(df["Year"] == 2010) & (df["State"] == "WY")]]:
+        with pytest.raises(ValueError, match="already in the models"):
+            data_service.update_state_models(rows)
+    with pytest.raises(ValueError, match="repeat"):
+        data_service.update_state_models(pd.concat([df[df["Year"] == 2022]] * 2))
+    with pytest.raises(ValueError, match="never added"):
+        data_service.update_state_models(df[df["Year"] == 2022], expired_rows=df[df["Year"] == 2023])
+    assert data_service.model_version() == version
+    assert data_service.fit_state_models() == models
+
+    # An expired year may come back, once
+    oldest = df[df["Year"] == 1998]
+    data_service.update_state_models(df[df["Year"] == 2022], expired_rows=oldest)
+    data_service.update_state_models(oldest)
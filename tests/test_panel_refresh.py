@@ -0,0 +1,159 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_service
+import dataset_cache
+import dataset_registry
+import panel_refresh
+from schema import SchemaError
+
+
+@pytest.fixture(scope="module")
+def workbook_extracts(tmp_path_factory):
+    """The workbook's per-source sheets as CSV extracts (written once)."""
+    directory = tmp_path_factory.mktemp("extracts")
+    panel_refresh.export_workbook_sources(str(directory))
+    return directory
+
+
+@pytest.fixture
+def sources(workbook_extracts, tmp_path, monkeypatch):
+    """A private copy of the extracts, an empty cache and a clean registry."""
+    directory = tmp_path / "sources"
+    directory.mkdir()
+    for path in workbook_extracts.iterdir():
+        (directory / path.name).write_bytes(path.read_bytes())
+    monkeypatch.setenv("CO2_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("CO2_MODEL_DIR", str(tmp_path / "models"))
+    monkeypatch.setattr(panel_refresh, "_tables", {})
+    dataset_registry.invalidate()
+    yield directory
+    dataset_registry.invalidate()
+
+
+def _pointer() -> dict:
+    with open(os.path.join(dataset_cache.panel_dir(), "CURRENT.json"), encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def test_refresh_rebuilds_the_workbook_panel_and_hot_swaps_it(sources):
+    workbook = dataset_registry.get_dataset().frame
+    before = data_service.predict_co2_batch("WY", [[6611, 26831408, 4052911, 20184, 322110]])
+    old_version = data_service.model_version()
+
+    report = panel_refresh.refresh(str(sources))
+    assert report.published and len(report.reprocessed) == 6 and report.rows == len(workbook)
+    assert report.generation == dataset_registry.generation()
+    assert dataset_registry.source() == report.path == _pointer()["path"]
+
+    panel = dataset_registry.get_dataset().frame
+    assert list(panel.columns) == list(workbook.columns)
+    assert (panel["State"].astype(str) == workbook["State"].astype(str)).all()
+    for column in workbook.columns[1:]:
+        assert str(panel[column].dtype) == str(workbook[column].dtype)
+        np.testing.assert_allclose(panel[column].astype(float), workbook[column].astype(float), rtol=1e-15)
+
+    # Models follow the new version without a restart
+    assert data_service.model_version() != old_version
+    after = data_service.predict_co2_batch("WY", [[6611, 26831408, 4052911, 20184, 322110]])
+    np.testing.assert_allclose(after, before, rtol=1e-12)
+
+
+def test_only_changed_sources_are_reprocessed(sources):
+    first = panel_refresh.refresh(str(sources))
+
+    unchanged = panel_refresh.refresh(str(sources))
+    assert not unchanged.published and unchanged.reprocessed == []
+    assert unchanged.version == first.version
+
+    # A touched file is hashed, found identical and not re-read
+    os.utime(sources / "coal.csv")
+    assert not panel_refresh.refresh(str(sources)).published
+
+    coal = pd.read_csv(sources / "coal.csv")
+    coal.loc[(coal["State"] == "WY") & (coal["Year"] == 2023), "Coal Electricity Consumption"] += 1000
+    coal.to_csv(sources / "coal.csv", index=False)
+    changed = panel_refresh.refresh(str(sources))
+    assert changed.published and changed.reprocessed == ["coal.csv"] and len(changed.reused) == 5
+    assert changed.version != first.version and os.path.exists(first.path)
+
+    wy = dataset_registry.get_dataset().rows("WY")
+    value = wy.loc[wy["Year"] == 2023, "Coal Electricity Consumption"].item()
+    assert value == coal.loc[(coal["State"] == "WY") & (coal["Year"] == 2023), "Coal Electricity Consumption"].item()
+
+
+def test_old_panels_are_pruned_with_their_cache_stores(sources):
+    coal = pd.read_csv(sources / "coal.csv")
+    paths = []
+    for step in range(panel_refresh.KEEP_PANELS + 1):
+        coal["Coal Electricity Consumption"] += 1
+        coal.to_csv(sources / "coal.csv", index=False)
+        paths.append(panel_refresh.refresh(str(sources)).path)
+        assert os.path.isdir(dataset_cache.store_path(paths[-1]))
+        os.utime(paths[-1], (step, step))
+
+    assert not os.path.exists(paths[0]) and not os.path.exists(dataset_cache.store_path(paths[0]))
+    for path in paths[1:]:
+        assert os.path.exists(path) and os.path.isdir(dataset_cache.store_path(path))
+
+
+def test_fresh_process_loads_the_published_panel(sources):
+    report = panel_refresh.refresh(str(sources), swap=False)
+    assert dataset_registry.source() == report.path
+
+    dataset_registry.invalidate()
+    assert dataset_registry.get_dataset().frame.shape == (report.rows, 8)
+    assert dataset_registry.memory_usage()["source"] == report.path
+
+
+def test_invalid_sources_never_replace_the_published_version(sources):
+    published = panel_refresh.refresh(str(sources))
+    generation = dataset_registry.generation()
+
+    extra = pd.read_csv(sources / "coal.csv").rename(columns={"Coal Electricity Consumption": "coal_elec"})
+    extra.to_csv(sources / "coal_copy.csv", index=False)
+    with pytest.raises(SchemaError, match="comes from both"):
+        panel_refresh.refresh(str(sources))
+    os.remove(sources / "coal_copy.csv")
+
+    pce = pd.read_csv(sources / "PCE_per_capita.csv")
+    pd.concat([pce, pce.head(1)]).to_csv(sources / "PCE_per_capita.csv", index=False)
+    with pytest.raises(SchemaError, match="repeats"):
+        panel_refresh.refresh(str(sources))
+    pce.to_csv(sources / "PCE_per_capita.csv", index=False)
+
+    os.remove(sources / "co2_per_capita.csv")
+    with pytest.raises(SchemaError, match="co2 per capita"):
+        panel_refresh.refresh(str(sources))
+
+    assert _pointer()["path"] == published.path
+    assert dataset_registry.generation() == generation
+
+
+def test_merge_outer_joins_on_state_and_year(tmp_path, monkeypatch):
+    monkeypatch.setenv("CO2_CACHE_DIR", str(tmp_path / "cache"))
+    (tmp_path / "a.csv").write_text("State,Year,co2 per capita\nWY,2000,1.5\nAK,2000,2.5\n")
+    (tmp_path / "b.csv").write_text("state_code,Year,urban_pop\nWY,2000,10\nWY,2001,11\n")
+    tables, flags = panel_refresh.read_sources(panel_refresh.list_extracts(str(tmp_path)), workers=2)
+    assert flags == [True, True]
+
+    merged = panel_refresh.merge_sources(tables)
+    assert merged[["State", "Year"]].values.tolist() == [["AK", 2000], ["WY", 2000], ["WY", 2001]]
+    np.testing.assert_array_equal(merged["co2 per capita"], [2.5, 1.5, np.nan])
+    np.testing.assert_array_equal(merged["Estimated Urban Population"], [np.nan, 10, 11])
+
+
+def test_refresh_async_and_empty_directory(sources, tmp_path):
+    report = asyncio.run(panel_refresh.refresh_async(str(sources)))
+    assert report.published
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    with pytest.raises(FileNotFoundError):
+        panel_refresh.refresh(str(empty))
@@ -0,0 +1,86 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import data_service
+from prediction_cache import PredictionCache, quantize
+
+INPUTS = [6611.0, 26831408.0, 4052911.0, 20184.0, 322110.0]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_repeated_inputs_hit_and_match_predict_co2():
+    cache = PredictionCache()
+    first = cache.predict("wy", INPUTS)
+    # Float noise below the quantum maps onto the same entry
+    second = cache.predict("WY", [v * (1 + 1e-12) for v in INPUTS])
+
+    assert first == second == data_service.predict_co2("WY", *INPUTS)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_intervals_are_cached_per_level_apart_from_points():
+    cache = PredictionCache()
+    point = cache.predict("WY", INPUTS)
+    first = cache.predict_interval("WY", INPUTS, 0.95)
+    again = cache.predict_interval("wy", INPUTS, 0.95)
+    other = cache.predict_interval("WY", INPUTS, 0.8)
+
+    assert first == again and first["estimate"] == point
+    assert first["level"] == 0.95 and other["pred_high"] < first["pred_high"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+
+    # Callers get their own copy of a cached result
+    first["estimate"] = 0.0
+    assert cache.predict_interval("WY", INPUTS, 0.95)["estimate"] == point
+
+
+def test_lru_eviction_keeps_most_recent():
+    cache = PredictionCache(maxsize=2)
+    cache.predict("WY", INPUTS)
+    cache.predict("ND", INPUTS)
+    cache.predict("WY", INPUTS)     # refresh WY
+    cache.predict("AK", INPUTS)     # evicts ND
+
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1
+    cache.predict("WY", INPUTS)
+    assert cache.stats()["hits"] == 2
+    cache.predict("ND", INPUTS)
+    assert cache.stats()["misses"] == 4
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(ttl=10.0, clock=clock)
+    cache.predict("WY", INPUTS)
+    clock.now = 9.0
+    cache.predict("WY", INPUTS)
+    clock.now = 20.0
+    cache.predict("WY", INPUTS)
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
+
+
+def test_new_model_version_is_a_miss(monkeypatch):
+    cache = PredictionCache()
+    cache.predict("WY", INPUTS)
+    monkeypatch.setattr(data_service, "model_version", lambda: "another-version")
+    cache.predict("WY", INPUTS)
+    assert cache.stats()["misses"] == 2
+
+
+@pytest.mark.parametrize("value, digits, expected", [
+    (26831408.4, 9, 26831408.4),
+    (26831408.4, 6, 26831400.0),
+    (0.0, 9, 0.0),
+])
+def test_quantize_significant_digits(value, digits, expected):
+    assert quantize(value, digits) == expected
@@ -0,0 +1,109 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pytest
+
+import ols_engine
+import regularized
+
+
+def collinear_panel(n_groups: int = 4, n_obs: int = 26, seed: int = 0):
+    """Groups of wildly scaled, strongly collinear drivers, like the state panel."""
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=(n_groups, n_obs, 1))
+    X = base + 0.05 * rng.normal(size=(n_groups, n_obs, 5))
+    X = X * np.array([1e3, 1e7, 1e9, 1e4, 1e5]) + np.array([5e3, 2e7, 4e9, 3e4, 3e5])
+    beta = rng.normal(size=(n_groups, 5)) / np.array([1e3, 1e7, 1e9, 1e4, 1e5])
+    y = 20 + np.einsum("gtp,gp->gt", X, beta) + rng.normal(scale=0.5, size=(n_groups, n_obs))
+    groups = np.repeat(np.arange(n_groups), n_obs)
+    return ols_engine.stack_groups(groups, X.reshape(-1, 5), y.reshape(-1))
+
+
+def test_ridge_loo_matches_refitting_without_each_row():
+    X3, y2, mask = collinear_panel(n_groups=2)
+    alphas = np.array([1e-3, 1e-1, 10.0])
+    _, path = regularized.ridge_cv(X3, y2, mask, alphas=alphas)
+
+    # Brute force for group 0: drop each row, refit with an unpenalized
+    # intercept on the group's (fixed) standardized drivers
+    X, y = X3[0, :, 1:], y2[0]
+    n = len(y)
+    Z = (X - X.mean(axis=0)) / X.std(axis=0)
+    for i, alpha in enumerate(alphas):
+        errors = []
+        for t in range(n):
+            keep = np.arange(n) != t
+            A = np.hstack([np.ones((n - 1, 1)), Z[keep]])
+            penalty = np.diag([0.0] + [alpha * n] * 5)
+            coef = np.linalg.solve(A.T @ A + penalty, A.T @ y[keep])
+            errors.append(y[t] - coef[0] - Z[t] @ coef[1:])
+        assert path.error[0, i] == pytest.approx(np.mean(np.square(errors)), rel=1e-8)
+
+
+def test_ridge_spans_ols_to_intercept_only():
+    X3, y2, mask = collinear_panel()
+    ols = ols_engine.batched_ols(X3, y2, mask)
+
+    tiny, _ = regularized.ridge_cv(X3, y2, mask, alphas=[1e-12])
+    np.testing.assert_allclose(tiny.coef, ols.coef, rtol=1e-5, atol=1e-12)
+    np.testing.assert_allclose(tiny.xtx_inv, ols.xtx_inv, rtol=1e-5, atol=1e-18)
+    assert (tiny.rank == ols.rank).all()
+
+    huge, _ = regularized.ridge_cv(X3, y2, mask, alphas=[1e12])
+    assert np.abs(huge.coef[:, 1:]).max() < 1e-9
+    np.testing.assert_allclose(huge.coef[:, 0], y2.mean(axis=1), rtol=1e-6)
+    assert (huge.rank == 1).all()
+
+
+def test_cross_validation_picks_an_interior_penalty():
+    X3, y2, mask = collinear_panel(n_groups=6)
+    for fit_cv in (regularized.ridge_cv, regularized.lasso_cv):
+        fit, path = fit_cv(X3, y2, mask)
+        assert path.error.shape == path.grid.shape == (6, path.grid.shape[1])
+        assert (path.error[np.arange(6), path.best] == path.error.min(axis=1)).all()
+        np.testing.assert_array_equal(fit.penalty, path.penalty)
+        assert np.isfinite(fit.sigma2).all() and (fit.r2 > 0.5).all()
+
+
+def test_lasso_path_satisfies_kkt_conditions():
+    rng = np.random.default_rng(3)
+    Z = rng.normal(size=(8, 40, 1)) + 0.1 * rng.normal(size=(8, 40, 5))
+    Z = (Z - Z.mean(axis=1, keepdims=True)) / Z.std(axis=1, keepdims=True)
+    y = Z @ rng.normal(size=5) + rng.normal(size=(8, 40))
+    Q = np.einsum("btp,btq->bpq", Z, Z) / 40
+    c = np.einsum("btp,bt->bp", Z, y) / 40
+    lambdas = np.abs(c).max(axis=1)[:, None] * regularized.LASSO_RATIOS[None, :]
+
+    coefs = regularized.lasso_path(Q, c, lambdas)
+    grad = c[:, None, :] - np.einsum("bpq,blq->blp", Q, coefs)
+    active = coefs != 0
+    lam = lambdas[..., None]
+    np.testing.assert_allclose(np.where(active, grad, 0), np.where(active, lam * np.sign(coefs), 0), atol=1e-8)
+    assert (np.abs(np.where(active, 0, grad)) <= lam + 1e-8).all()
+    assert not active[:, 0].any() and active[:, -1].all()
+
+
+def test_lasso_zeroes_irrelevant_drivers_and_reports_their_df():
+    rng = np.random.default_rng(5)
+    X = rng.normal(size=(3 * 60, 5)) * np.array([1.0, 1e6, 1.0, 1e-3, 10.0])
+    y = 2.0 + 3.0 * X[:, 0] - 2e-6 * X[:, 1] + rng.normal(scale=0.1, size=len(X))
+    X3, y2, mask = ols_engine.stack_groups(np.repeat([0, 1, 2], 60), X, y)
+
+    fit, _ = regularized.lasso_cv(X3, y2, mask)
+    assert fit.coef[:, 1] == pytest.approx(3.0, rel=0.02)
+    assert fit.coef[:, 2] == pytest.approx(-2e-6, rel=0.02)
+    np.testing.assert_array_equal(fit.rank, 1 + (fit.coef[:, 1:] != 0).sum(axis=1))
+    # The interval covariance is that of OLS on the selected drivers, zero elsewhere
+    dropped = fit.coef[:, 1:] == 0
+    assert (fit.stderr[:, 1:][dropped] == 0).all()
+
+
+def test_input_validation():
+    X3, y2, mask = collinear_panel(n_groups=1)
+    with pytest.raises(ValueError, match="criterion"):
+        regularized.ridge_cv(X3, y2, mask, criterion="aic")
+    with pytest.raises(ValueError, match="2 folds"):
+        regularized.lasso_cv(X3, y2, mask, folds=1)
+    with pytest.raises(ValueError, match="'ridge' or 'lasso'"):
+        regularized.fit("elastic", X3, y2, mask)
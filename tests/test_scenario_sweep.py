@@ -0,0 +1,63 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pytest
+
+import data_service
+import scenario_sweep
+from scenario_sweep import axis, sweep
+
+BASE = [6611.0, 26831408.0, 4052911.0, 20184.0, 322110.0]
+COAL, GAS = "Coal Electricity Consumption", "Natural Gas Electricity Consumption"
+
+
+def test_one_driver_sweep_matches_batched_predictions():
+    coal = axis(COAL, 0, 5e7, 101)
+    result = sweep("wy", BASE, [coal], level=0.9)
+
+    X = np.tile(BASE, (101, 1))
+    X[:, 1] = coal.values
+    expected = data_service.predict_co2_intervals("WY", X, 0.9)
+    assert result.state == "WY" and result.estimate.shape == (101,)
+    np.testing.assert_allclose(result.estimate, expected.estimate, rtol=1e-12)
+    np.testing.assert_allclose(result.low, expected.pred_low, rtol=1e-12)
+    np.testing.assert_allclose(result.high, expected.pred_high, rtol=1e-12)
+
+
+def test_two_driver_grid_is_row_major_and_chunk_independent():
+    axes = [axis(COAL, 1e6, 4e7, 37), axis(GAS, 0, 1e7, 23)]
+    whole = sweep("ND", BASE, axes)
+    chunked = sweep("ND", BASE, axes, chunk_rows=100)
+
+    assert whole.estimate.shape == (37, 23) and whole.low is None
+    np.testing.assert_allclose(chunked.estimate, whole.estimate, rtol=1e-12)
+    row = list(BASE)
+    row[1], row[2] = axes[0].values[5], axes[1].values[17]
+    assert whole.estimate[5, 17] == pytest.approx(data_service.predict_co2("ND", *row), rel=1e-12)
+
+
+def test_to_frame_thins_evenly():
+    axes = [axis(COAL, 0, 5e7, 1000), axis(GAS, 0, 1e7, 500)]
+    result = sweep("AK", BASE, axes)
+
+    assert len(result.to_frame()) == result.points == 500_000
+    frame = result.to_frame(max_points=2_500)
+    assert len(frame) <= 2_500
+    assert list(frame.columns) == [COAL, GAS, "estimate"]
+    assert frame[COAL].iloc[0] == 0 and frame[GAS].nunique() == 50
+
+
+def test_rejects_bad_sweeps(monkeypatch):
+    coal = axis(COAL, 0, 1, 10)
+    with pytest.raises(ValueError, match="one or two"):
+        sweep("WY", BASE, [])
+    with pytest.raises(ValueError, match="only once"):
+        sweep("WY", BASE, [coal, coal])
+    with pytest.raises(ValueError, match="driver values"):
+        sweep("WY", BASE[:3], [coal])
+    with pytest.raises(ValueError, match="Unknown driver"):
+        axis("coal", 0, 1, 10)
+    monkeypatch.setattr(scenario_sweep, "MAX_POINTS", 50)
+    with pytest.raises(ValueError, match="limit"):
+        sweep("WY", BASE, [coal, axis(GAS, 0, 1, 10)])
@@ -0,0 +1,96 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_service
+import dataset_registry
+import schema
+
+
+def sheet(**overrides) -> pd.DataFrame:
+    """A small valid merged sheet, with columns optionally replaced."""
+    df = pd.DataFrame({
+        "State": ["WY", "WY", "ND", "ND"],
+        "Year": [1998, 1999, 1998, 1999],
+        "co2 per capita": [130.4, 128.0, 74.9, 75.3],
+        "renewable energy": [6611, 6500, 3000, 3100],
+        "Coal Electricity Consumption": [26831408.0, 26500000.0, 2.5e7, 2.4e7],
+        "Natural Gas Electricity Consumption": [4052911.0, 4.1e6, 1.0e6, 1.1e6],
+        "PCE per capita": [20184, 20500, 19000, 19300],
+        "Estimated Urban Population": [322110.0, 323000.5, 350000.0, 351000.0],
+    })
+    for name, values in overrides.items():
+        df[name.replace("_", " ")] = values
+    return df
+
+
+def test_workbook_sheet_is_valid():
+    report = dataset_registry.validation_report()
+    assert report.ok and report.rows == 1300
+    assert dataset_registry.get_merged_data()["Year"].dtype == np.int16
+
+
+def test_aliases_are_renamed_to_canonical_names():
+    raw = sheet().rename(columns={"State": "state_code", "PCE per capita": "PCE", "co2 per capita": "CO2_per_capita"})
+    frame, report = schema.apply_schema(raw)
+    assert list(frame.columns) == list(sheet().columns)
+    assert report.renamed == {"state_code": "State", "PCE": "PCE per capita", "CO2_per_capita": "co2 per capita"}
+
+
+def test_missing_column_fails_fast_with_its_name():
+    raw = sheet().drop(columns=["Coal Electricity Consumption"])
+    with pytest.raises(schema.SchemaError, match="Coal Electricity Consumption"):
+        schema.apply_schema(raw)
+
+
+def test_text_in_numeric_column_reports_row():
+    raw = sheet().astype({"PCE per capita": object})
+    raw.loc[2, "PCE per capita"] = "n.a."
+    with pytest.raises(schema.SchemaError, match="'PCE per capita' row 3"):
+        schema.apply_schema(raw)
+
+
+def test_dtypes_are_narrowed_losslessly():
+    frame, report = schema.apply_schema(sheet())
+    assert frame["Year"].dtype == np.int16
+    assert frame["PCE per capita"].dtype == np.int16               # 20184 fits
+    assert frame["co2 per capita"].dtype == np.float64              # 130.4 is not a float32
+    assert frame["Estimated Urban Population"].dtype == np.float32  # halves are exact
+    assert isinstance(frame["State"].dtype, pd.CategoricalDtype)
+    np.testing.assert_array_equal(frame["Estimated Urban Population"], sheet()["Estimated Urban Population"])
+    assert report.dtypes["Year"] == "int64 → int16"
+    assert report.bytes_after < report.bytes_before
+
+
+def test_missing_and_out_of_range_values_are_reported_not_dropped():
+    raw = sheet(**{"co2_per_capita": [130.4, -1.0, np.nan, 75.3]})
+    raw.loc[3, "State"] = "north dakota"
+    frame, report = schema.apply_schema(raw)
+    assert len(frame) == 4 and not report.ok
+    assert report.missing == {"co2 per capita": 1}
+    assert report.out_of_range == {"co2 per capita": 1, "State": 1}
+    assert any("out-of-range" in line for line in report.issues())
+
+
+def test_model_arrays_hold_only_complete_rows():
+    frame, _ = schema.apply_schema(sheet(**{"renewable_energy": [6611, np.nan, 3000, 3100]}))
+    dataset = dataset_registry.build_dataset(frame)
+
+    assert len(dataset.frame) == 4
+    model = dataset.model
+    assert model.X.shape == (3, len(schema.FEATURES)) and not model.X.flags.writeable
+    assert [dataset.states[g] for g in model.group_ids] == ["ND", "ND", "WY"]
+    assert model.years.tolist() == [1998, 1999, 1998]
+
+    states, X3, y2, mask, years2 = data_service.stack_panel(dataset)
+    assert states == ["ND", "WY"] and mask.sum(axis=1).tolist() == [2, 1]
+
+
+def test_partial_frame_has_no_model_arrays():
+    dataset = dataset_registry.build_dataset(pd.DataFrame({"State": ["WY"], "Year": [1998]}))
+    assert dataset.model is None
+    with pytest.raises(schema.SchemaError):
+        data_service.stack_panel(dataset)
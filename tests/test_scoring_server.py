@@ -0,0 +1,153 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import json
+
+import pytest
+
+import data_service
+from scoring_server import ScoringApp, serve
+
+ROW = {
+    "state": "wy",
+    "renewable_energy": 6611.0,
+    "coal_elec": 26831408.0,
+    "gas_elec": 4052911.0,
+    "pce_per_capita": 20184.0,
+    "urban_pop": 322110.0,
+}
+ARGS = [ROW[k] for k in ["renewable_energy", "coal_elec", "gas_elec", "pce_per_capita", "urban_pop"]]
+
+
+async def call(app, method, path, body=b"", content_type="application/json"):
+    """Drive the ASGI app directly and return (status, headers, body)."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path,
+             "headers": [(b"content-type", content_type.encode())]}
+    await app(scope, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"]), sent[1]["body"]
+
+
+def test_single_row_matches_predict_co2():
+    status, _, body = asyncio.run(call(ScoringApp(), "POST", "/predict", json.dumps(ROW).encode()))
+    payload = json.loads(body)
+    assert status == 200
+    assert payload["state"] == "WY"
+    assert payload["prediction"] == pytest.approx(data_service.predict_co2("WY", *ARGS), rel=1e-12)
+    assert payload["model_version"] == data_service.model_version()
+
+
+def test_batch_and_ndjson_requests():
+    app = ScoringApp()
+    rows = [ROW, dict(ROW, state="ND"), dict(ROW, state="AK")]
+    status, _, body = asyncio.run(call(app, "POST", "/predict", json.dumps({"rows": rows}).encode()))
+    assert status == 200 and len(json.loads(body)["predictions"]) == 3
+
+    ndjson = "\n".join(json.dumps(r) for r in rows).encode()
+    status, headers, body = asyncio.run(call(app, "POST", "/predict", ndjson, "application/x-ndjson"))
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert headers[b"content-type"] == b"application/x-ndjson"
+    assert [line["state"] for line in lines] == ["WY", "ND", "AK"]
+    assert lines[1]["prediction"] == pytest.approx(data_service.predict_co2("ND", *ARGS), rel=1e-12)
+
+
+def test_bad_requests_get_400():
+    app = ScoringApp()
+    for body in [json.dumps(dict(ROW, state="ZZ")), json.dumps({"state": "WY"}), "{not json"]:
+        status, _, payload = asyncio.run(call(app, "POST", "/predict", body.encode()))
+        assert status == 400 and "error" in json.loads(payload)
+    assert asyncio.run(call(app, "GET", "/nope"))[0] == 404
+
+
+def test_non_finite_values_and_oversized_bodies_are_refused():
+    app = ScoringApp(max_body=1024)
+    for body in ['{"state": "WY", "renewable_energy": NaN}', json.dumps(dict(ROW, coal_elec=float("inf")))]:
+        status, _, payload = asyncio.run(call(app, "POST", "/predict", body.encode()))
+        assert status == 400 and "finite" in json.loads(payload)["error"]
+
+    rows = json.dumps({"rows": [ROW] * 20}).encode()
+    status, _, payload = asyncio.run(call(app, "POST", "/predict", rows))
+    assert status == 413 and "1,024 bytes" in json.loads(payload)["error"]
+
+
+def test_known_states_follow_the_model_version(monkeypatch):
+    app = ScoringApp()
+    app.warm()
+    assert "AK" in app.known_states()
+
+    states, fit = data_service.get_model_fit()
+    monkeypatch.setattr(data_service, "model_version", lambda: "refit")
+    monkeypatch.setattr(data_service, "get_model_fit", lambda: ([s for s in states if s != "AK"], fit))
+    status, _, _ = asyncio.run(call(app, "POST", "/predict", json.dumps(dict(ROW, state="AK")).encode()))
+    assert status == 400
+    status, _, body = asyncio.run(call(app, "POST", "/predict", json.dumps(ROW).encode()))
+    assert status == 200 and json.loads(body)["model_version"] == "refit"
+
+
+def test_concurrent_requests_are_micro_batched():
+    app = ScoringApp(max_delay=0.05)
+
+    async def burst():
+        return await asyncio.gather(*[
+            call(app, "POST", "/predict", json.dumps(ROW).encode()) for _ in range(20)
+        ])
+
+    results = asyncio.run(burst())
+    assert all(status == 200 for status, _, _ in results)
+    # 20 single-row requests, far fewer vectorized batches
+    assert app.batcher.batch_sizes.n < 20
+    assert app.batcher.batch_sizes.total == 20
+
+    _, _, metrics = asyncio.run(call(app, "GET", "/metrics"))
+    text = metrics.decode()
+    assert 'co2_requests_total{route="POST /predict",status="200"} 20' in text
+    assert 'co2_request_latency_seconds_count{route="POST /predict"} 20' in text
+
+
+def test_a_failing_request_gets_500_without_failing_its_batch():
+    """A state that vanished from the models after validation fails alone, with a counted 500."""
+    app = ScoringApp(max_delay=0.05)
+    app.known_states = lambda: frozenset(data_service.get_model_fit()[0]) | {"ZZ"}
+
+    async def burst():
+        return await asyncio.gather(*[
+            call(app, "POST", "/predict", json.dumps(dict(ROW, state=state)).encode())
+            for state in ["WY", "ZZ", "ND", "WY"]
+        ])
+
+    results = asyncio.run(burst())
+    assert [status for status, _, _ in results] == [200, 500, 200, 200]
+    assert "ZZ" in json.loads(results[1][2])["error"]
+    assert app.batcher.batch_sizes.n == 1
+    assert app.requests[("POST /predict", 500)] == 1 and app.requests[("POST /predict", 200)] == 3
+
+
+def test_builtin_http_server_round_trip():
+    async def scenario():
+        server = await serve("127.0.0.1", 0, ScoringApp())
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps(ROW).encode()
+        writer.write(
+            b"POST /predict HTTP/1.1\r\nHost: x\r\nContent-Type: application/json\r\n"
+            b"Connection: close\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+        )
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    response = asyncio.run(scenario())
+    head, _, body = response.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200")
+    assert json.loads(body)["state"] == "WY"
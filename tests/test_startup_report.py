@@ -0,0 +1,52 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import dataset_registry
+import lazy_import
+import startup_report
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.mark.parametrize("name", list(startup_report.ENTRY_POINTS))
+def test_entry_point_within_import_budget(name):
+    """Each entry point stays under its time budget and skips forbidden modules."""
+    assert startup_report.check(name) == []
+
+
+def test_parse_importtime_sums_top_level_imports():
+    text = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |   _io",
+        "import time:       300 |        400 | site",
+        "import time:        50 |         50 |     json.decoder",
+        "import time:       200 |        250 |   json",
+        "import time:      1000 |       1250 | mymodule",
+        "a warning line on stderr",
+    ])
+    profile = startup_report.parse_importtime(text, startup=frozenset({"site"}))
+    assert profile.total_us == 1250
+    assert profile.modules["json"] == (200, 250)
+    assert profile.slowest(1) == [("mymodule", 1000, 1250)]
+
+
+def test_lazy_module_imports_on_first_attribute_access():
+    sys.modules.pop("colorsys", None)
+    colorsys = lazy_import.module("colorsys")
+    assert "colorsys" not in sys.modules and lazy_import.loaded("colorsys") is None
+
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert lazy_import.loaded("colorsys") is sys.modules["colorsys"]
+    assert lazy_import.module("colorsys") is sys.modules["colorsys"]
+
+
+@pytest.mark.parametrize("page", ["Home.py", "pages/04_HASS_Reflection.py"])
+def test_static_pages_never_load_the_dataset(page):
+    from streamlit.testing.v1 import AppTest
+
+    dataset_registry.invalidate()
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=30).run()
+    assert not at.exception
+    assert not dataset_registry.is_loaded()